@@ -4,8 +4,27 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.typing import ConfigType
 
-from .automation import async_setup_entry as async_setup_automation_entry
-from .coordinator import AmpsterDataUpdateCoordinator
+from .automation import ThresholdSnapshot, async_setup_entry as async_setup_automation_entry
+from .const import (
+    DEFAULT_UPLOAD_ATTRIBUTE_MAX_BYTES,
+    DEFAULT_UPLOAD_ATTRIBUTES,
+    DEFAULT_UPLOAD_COMPRESSION,
+    DEFAULT_UPLOAD_ENCODING,
+    DEFAULT_UPLOAD_EXCLUDE_ATTRIBUTES,
+    DEFAULT_UPLOAD_EXTRA_ENDPOINTS,
+    DEFAULT_UPLOAD_MODE,
+    DEFAULT_UPLOAD_SAMPLE_INTERVAL,
+    DEFAULT_UPLOAD_VALUES_ONLY,
+)
+from .coordinator import (
+    AmpsterDataUpdateCoordinator,
+    AmpsterMultiCountryCoordinator,
+    feed_url,
+    get_coordinator_registry,
+    multi_country_feed_key,
+    resolve_country,
+)
+from .services import async_setup_services
 from .uploader import AmpsterDataUploader
 
 DOMAIN = "ampster"
@@ -16,6 +35,7 @@ _LOGGER = logging.getLogger(__name__)
 
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     """Set up the Ampster integration via configuration.yaml (not used)."""
+    await async_setup_services(hass)
     return True
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
@@ -24,12 +44,22 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     country_prefix = entry.options.get("country_prefix") if entry.options.get("country_prefix") is not None else entry.data.get("country_prefix")
     minute = entry.options.get("minute") if entry.options.get("minute") is not None else entry.data.get("minute", 2)
     base_url = entry.options.get("base_url") if entry.options.get("base_url") is not None else entry.data.get("base_url", None)
+    compare_countries = entry.options.get("compare_countries") if entry.options.get("compare_countries") is not None else entry.data.get("compare_countries", [])
     
     # Get upload configuration
     upload_url = entry.options.get("upload_url") if entry.options.get("upload_url") is not None else entry.data.get("upload_url", "")
     api_key = entry.options.get("api_key") if entry.options.get("api_key") is not None else entry.data.get("api_key", "")
     upload_sensors = entry.options.get("upload_sensors") if entry.options.get("upload_sensors") is not None else entry.data.get("upload_sensors", "")
     upload_interval = entry.options.get("upload_interval") if entry.options.get("upload_interval") is not None else entry.data.get("upload_interval", 15)
+    upload_mode = entry.options.get("upload_mode") if entry.options.get("upload_mode") is not None else entry.data.get("upload_mode", DEFAULT_UPLOAD_MODE)
+    upload_encoding = entry.options.get("upload_encoding") if entry.options.get("upload_encoding") is not None else entry.data.get("upload_encoding", DEFAULT_UPLOAD_ENCODING)
+    upload_sample_interval = entry.options.get("upload_sample_interval") if entry.options.get("upload_sample_interval") is not None else entry.data.get("upload_sample_interval", DEFAULT_UPLOAD_SAMPLE_INTERVAL)
+    upload_attributes = entry.options.get("upload_attributes") if entry.options.get("upload_attributes") is not None else entry.data.get("upload_attributes", DEFAULT_UPLOAD_ATTRIBUTES)
+    upload_exclude_attributes = entry.options.get("upload_exclude_attributes") if entry.options.get("upload_exclude_attributes") is not None else entry.data.get("upload_exclude_attributes", DEFAULT_UPLOAD_EXCLUDE_ATTRIBUTES)
+    upload_values_only = entry.options.get("upload_values_only") if entry.options.get("upload_values_only") is not None else entry.data.get("upload_values_only", DEFAULT_UPLOAD_VALUES_ONLY)
+    upload_attribute_max_bytes = entry.options.get("upload_attribute_max_bytes") if entry.options.get("upload_attribute_max_bytes") is not None else entry.data.get("upload_attribute_max_bytes", DEFAULT_UPLOAD_ATTRIBUTE_MAX_BYTES)
+    upload_compression = entry.options.get("upload_compression") if entry.options.get("upload_compression") is not None else entry.data.get("upload_compression", DEFAULT_UPLOAD_COMPRESSION)
+    upload_extra_endpoints = entry.options.get("upload_extra_endpoints") if entry.options.get("upload_extra_endpoints") is not None else entry.data.get("upload_extra_endpoints", DEFAULT_UPLOAD_EXTRA_ENDPOINTS)
     
     _LOGGER.debug(f"[Ampster] Upload config: url={bool(upload_url)}, key={bool(api_key)}, sensors='{upload_sensors}', interval={upload_interval}")
     _LOGGER.debug(f"[Ampster] Entry data: {entry.data}")
@@ -39,15 +69,44 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     if not base_url:
         base_url = DEFAULT_BASE_URL
         
-    coordinator = AmpsterDataUpdateCoordinator(hass, country_prefix=country_prefix, minute=minute, url=None, base_url=base_url)
-    await coordinator.async_config_entry_first_refresh()
-    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = coordinator
+    # Entries watching the same feed URL share one coordinator (and one timer) via the registry.
+    # A cached snapshot is served right away and revalidated against S3 in the background.
+    registry = get_coordinator_registry(hass)
+    coordinator = await registry.async_acquire(
+        feed_url(base_url, resolve_country(hass, country_prefix)),
+        lambda: AmpsterDataUpdateCoordinator(hass, country_prefix=country_prefix, minute=minute, url=None, base_url=base_url),
+        minute=minute,
+    )
+    hass.data[DOMAIN][entry.entry_id] = coordinator
+
+    # Optionally fetch several countries concurrently with one coordinator for price comparison
+    if compare_countries:
+        countries_coordinator = await registry.async_acquire(
+            multi_country_feed_key(compare_countries, base_url),
+            lambda: AmpsterMultiCountryCoordinator(hass, countries=compare_countries, minute=minute, base_url=base_url),
+            minute=minute,
+            require_data=False,
+        )
+        hass.data[DOMAIN][f"{entry.entry_id}_countries"] = countries_coordinator
     
+    # Category thresholds are read once and refreshed when one of the input_number helpers changes
+    thresholds = ThresholdSnapshot(hass)
+    thresholds.async_start()
+    entry.async_on_unload(thresholds.async_stop)
+    hass.data[DOMAIN][f"{entry.entry_id}_thresholds"] = thresholds
+
     # Set up data uploader if configured
     uploader = None
     if upload_url and api_key and upload_sensors:
         _LOGGER.info(f"[Ampster] Creating uploader with url={upload_url}, sensors={upload_sensors}, interval={upload_interval}")
-        uploader = AmpsterDataUploader(hass, upload_url, api_key, upload_sensors, upload_interval)
+        uploader = AmpsterDataUploader(
+            hass, upload_url, api_key, upload_sensors, upload_interval,
+            upload_mode=upload_mode, encoding=upload_encoding, compression=upload_compression,
+            sample_interval=upload_sample_interval,
+            attributes=upload_attributes, exclude_attributes=upload_exclude_attributes,
+            values_only=upload_values_only, attribute_max_bytes=upload_attribute_max_bytes,
+            slot_seed=entry.entry_id, extra_endpoints=upload_extra_endpoints,
+        )
         await uploader.async_start()
         hass.data[DOMAIN][f"{entry.entry_id}_uploader"] = uploader
         _LOGGER.info(f"[Ampster] Uploader stored in hass.data[{DOMAIN}][{entry.entry_id}_uploader]")
@@ -89,8 +148,13 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     
     # Unload platforms first
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
-    # Remove coordinator and shut it down
+    hass.data[DOMAIN].pop(f"{entry.entry_id}_thresholds", None)
+    # Release coordinators; the registry shuts them down once no other entry uses them
+    registry = get_coordinator_registry(hass)
     coordinator = hass.data[DOMAIN].pop(entry.entry_id, None)
     if coordinator:
-        await coordinator.async_shutdown()
+        await registry.async_release(coordinator)
+    countries_coordinator = hass.data[DOMAIN].pop(f"{entry.entry_id}_countries", None)
+    if countries_coordinator:
+        await registry.async_release(countries_coordinator)
     return unload_ok
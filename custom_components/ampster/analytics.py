@@ -0,0 +1,102 @@
+"""
+Rolling-window price analytics over a PriceSeries.
+
+Everything is precomputed once per series in O(n) per window size: monotonic
+deques give the min/max of the next N periods for every start index, prefix
+sums give window means, and a suffix scan over block sums gives the cheapest
+(and most expensive) contiguous block starting at or after every index. A
+period rollover then only needs O(1) lookups.
+"""
+from collections import deque
+
+
+def prefix_sums(values):
+    sums = [0.0]
+    for value in values:
+        sums.append(sums[-1] + value)
+    return sums
+
+
+def sliding_extreme_indices(values, size: int, maximum: bool):
+    """For every start i, the index of the min/max of values[i:i + size] (truncated at the end)."""
+    result = [0] * len(values)
+    window = deque()
+    for i in range(len(values) - 1, -1, -1):
+        # Drop indices that can no longer be the extreme because values[i] beats them
+        while window and (values[window[-1]] <= values[i] if maximum else values[window[-1]] >= values[i]):
+            window.pop()
+        window.append(i)
+        while window[0] >= i + size:
+            window.popleft()
+        result[i] = window[0]
+    return result
+
+
+def best_block_starts(sums, size: int, cheapest: bool):
+    """For every start i, the start of the cheapest/most expensive full block of size periods at or after i (-1 if none)."""
+    count = len(sums) - 1
+    result = [-1] * count
+    best = -1
+    for start in range(count - size, -1, -1):
+        total = sums[start + size] - sums[start]
+        if best < 0:
+            best = start
+        else:
+            best_total = sums[best + size] - sums[best]
+            if (total <= best_total) if cheapest else (total >= best_total):
+                best = start
+        result[start] = best
+    return result
+
+
+class PriceAnalytics:
+    """Window statistics and block searches for one PriceSeries."""
+
+    def __init__(self, series, windows, block_sizes):
+        self.series = series
+        prices = list(series.prices)
+        self._sums = prefix_sums(prices)
+        self._min = {size: sliding_extreme_indices(prices, size, False) for size in windows}
+        self._max = {size: sliding_extreme_indices(prices, size, True) for size in windows}
+        self._cheapest = {size: best_block_starts(self._sums, size, True) for size in block_sizes}
+        self._dearest = {size: best_block_starts(self._sums, size, False) for size in block_sizes}
+
+    def _mean(self, start, size):
+        return (self._sums[start + size] - self._sums[start]) / size
+
+    def window(self, index: int, size: int):
+        """Min, max and mean of the next size periods from index, or None outside the series."""
+        if index < 0 or index >= len(self.series):
+            return None
+        length = min(size, len(self.series) - index)
+        low, high = self._min[size][index], self._max[size][index]
+        return {
+            "min": self.series.prices[low],
+            "min_index": low,
+            "max": self.series.prices[high],
+            "max_index": high,
+            "mean": self._mean(index, length),
+        }
+
+    def block(self, index: int, size: int, cheapest: bool = True):
+        """Start index and mean price of the cheapest (or most expensive) block at or after index."""
+        if index < 0 or index >= len(self.series):
+            return None
+        start = (self._cheapest if cheapest else self._dearest)[size][index]
+        if start < 0:
+            return None
+        return {"start_index": start, "mean": self._mean(start, size)}
+
+
+class AnalyticsCache:
+    """Keeps the PriceAnalytics of the latest series; rebuilt only when the series object changes."""
+
+    def __init__(self, windows, block_sizes):
+        self.windows = tuple(windows)
+        self.block_sizes = tuple(block_sizes)
+        self._analytics = None
+
+    def get(self, series) -> PriceAnalytics:
+        if self._analytics is None or self._analytics.series is not series:
+            self._analytics = PriceAnalytics(series, self.windows, self.block_sizes)
+        return self._analytics
@@ -9,9 +9,9 @@ If you leave it active and the referenced entity_id (e.g., 'switch.inverter') do
 This automation is triggered whenever new data is fetched (on the hour at the configured minute, or when manually refreshed).
 """
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_state_change_event
 import datetime
-import json
 import logging
 
 from .const import DOMAIN
@@ -37,17 +37,16 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
             tz = COUNTRY_TZ.get(country, DEFAULT_TZ)
 
             now = datetime.datetime.now(tz)
-            try:
-                period_dt = datetime.datetime.fromisoformat(current_period)
-                if period_dt.tzinfo is None:
-                    period_dt = tz.localize(period_dt)
-                if (period_dt.year == now.year and period_dt.month == now.month and
-                    period_dt.day == now.day and period_dt.hour == now.hour):
+            # current_period is parsed once per fetch into the coordinator's price series
+            series = coordinator.series
+            if series.current_period_start is None:
+                _LOGGER.debug(f"[Ampster] Could not parse or compare current_period: {current_period!r}")
+            else:
+                period_dt = datetime.datetime.fromtimestamp(series.current_period_start, tz)
+                if series.current_period_start <= now.timestamp() < series.current_period_start + series.period_seconds:
                     _LOGGER.info(f"[Ampster] Data is current (current_period: {period_dt}, now: {now} in {tz})")
                 else:
                     _LOGGER.info(f"[Ampster] Data is NOT current (current_period: {period_dt}, now: {now} in {tz})")
-            except Exception as e:
-                _LOGGER.debug(f"[Ampster] Could not parse or compare current_period: {e}")
         else:
             _LOGGER.info("[Ampster] Data fetched, but no data found!")
 
@@ -61,23 +60,28 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     # Call once at startup to fetch/process data immediately
     await handle_data_update()
 
-async def categorise(hass, in_price):
-    """Replicates the Jinja categorise macro in Python."""
-    try:
-        price = float(in_price)
-    except (TypeError, ValueError):
-        return "Average"
-
+def read_thresholds(hass):
+    """Current category thresholds (negative, very_low, low, high, very_high) from the input_number helpers."""
     def get_input_number(name):
         entity = hass.states.get(f"input_number.{name}")
         return float(entity.state) if entity and entity.state not in (None, "", "unknown", "unavailable") else None
 
-    negative = get_input_number("negative")
-    very_low = get_input_number("very_low")
-    low = get_input_number("low")
-    high = get_input_number("high")
-    very_high = get_input_number("very_high")
+    return (
+        get_input_number("negative"),
+        get_input_number("very_low"),
+        get_input_number("low"),
+        get_input_number("high"),
+        get_input_number("very_high"),
+    )
 
+def categorise_with(thresholds, in_price):
+    """Categorise a price against already-read thresholds (see read_thresholds)."""
+    try:
+        price = float(in_price)
+    except (TypeError, ValueError):
+        return "Average"
+
+    negative, very_low, low, high, very_high = thresholds
     if negative is not None and price < negative:
         return "Negative"
     elif very_low is not None and price < very_low:
@@ -91,55 +95,116 @@ async def categorise(hass, in_price):
     else:
         return "Average"
 
-async def calculate_hoarding_periods_remaining(hass):
-    """Calculate hoarding periods remaining."""
-    # Get current_period as float
-    current_hour_attr = hass.states.get("sensor.price_datafeed_12")
-    if not current_hour_attr:
-        return None
-    current_period_str = current_hour_attr.attributes.get("current_hour", "")
-    if len(current_period_str) < 13:
-        return None
-    try:
-        current_period = float(current_period_str[11:13])
-    except Exception:
-        return None
-
-    # Get period_prices as dict
-    period_prices_raw = hass.states.get("sensor.hourly_prices_next_12")
-    if not period_prices_raw:
-        return None
-    period_prices_json = period_prices_raw.state.replace("'", '"')
-    try:
-        period_prices = json.loads(period_prices_json)
-    except Exception:
+async def categorise(hass, in_price):
+    """Replicates the Jinja categorise macro in Python."""
+    return categorise_with(read_thresholds(hass), in_price)
+
+THRESHOLD_ENTITIES = [f"input_number.{name}" for name in ("negative", "very_low", "low", "high", "very_high")]
+
+class ThresholdSnapshot:
+    """Category thresholds read once and re-read only after one of the input_number helpers changed.
+
+    Stored per config entry in hass.data[DOMAIN][f"{entry_id}_thresholds"]. Listeners
+    are called when the thresholds change so category-based sensors can update.
+    """
+
+    def __init__(self, hass: HomeAssistant):
+        self.hass = hass
+        self._thresholds = None
+        self._listeners = []
+        self._unsub_state = None
+
+    @callback
+    def async_start(self):
+        self._unsub_state = async_track_state_change_event(self.hass, THRESHOLD_ENTITIES, self._handle_state_change)
+
+    @callback
+    def async_stop(self):
+        if self._unsub_state:
+            self._unsub_state()
+            self._unsub_state = None
+        self._listeners.clear()
+
+    @callback
+    def async_add_listener(self, update_callback):
+        """Call update_callback when a threshold changes. Returns a function that removes it."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def remove_listener():
+            if update_callback in self._listeners:
+                self._listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def _handle_state_change(self, event):
+        self._thresholds = None
+        for update_callback in list(self._listeners):
+            update_callback()
+
+    @property
+    def thresholds(self):
+        if self._thresholds is None:
+            self._thresholds = read_thresholds(self.hass)
+        return self._thresholds
+
+    def categorise(self, price):
+        return categorise_with(self.thresholds, price)
+
+    def categorise_many(self, prices):
+        """Categorise a whole horizon of prices in one pass over the cached thresholds."""
+        negative, very_low, low, high, very_high = self.thresholds
+        # Missing thresholds never match, same as the None checks in categorise_with
+        negative = float("-inf") if negative is None else negative
+        very_low = float("-inf") if very_low is None else very_low
+        low = float("-inf") if low is None else low
+        very_high = float("inf") if very_high is None else very_high
+        high = float("inf") if high is None else high
+        categories = []
+        append = categories.append
+        for price in prices:
+            if price < negative:
+                append("Negative")
+            elif price < very_low:
+                append("Very Low")
+            elif price < low:
+                append("Low")
+            elif price > very_high:
+                append("Very High")
+            elif price > high:
+                append("High")
+            else:
+                append("Average")
+        return categories
+
+HOARDING_HORIZON = 12
+
+def calculate_hoarding_periods_remaining(series, thresholds, now, tz, horizon: int = HOARDING_HORIZON):
+    """Hours until the first High (or Very High) period after 12:00 within the next horizon periods.
+
+    Falls back to the hours until the most expensive of those periods. Reads the
+    coordinator's price series directly; thresholds is a ThresholdSnapshot or a
+    tuple as returned by read_thresholds.
+    """
+    periods = series.upcoming(now, horizon)
+    if not periods:
         return None
-
-    ns_hour = -1
-    for i in range(12):
-        hour = round(i + current_period)
-        if hour > 23:
-            hour = hour - 24
-        price_key = f"{hour:02d}:00"
-        cat = await categorise(hass, period_prices.get(price_key))
-        if hour > 12 and "High" in cat:
-            ns_hour = hour
-            break
-
-    if ns_hour < 0:
-        max_12_period = hass.states.get("sensor.max_12_period")
-        if max_12_period:
-            ns_hour = max_12_period.state[10:16]
-        else:
-            ns_hour = None
+    if isinstance(thresholds, ThresholdSnapshot):
+        categories = thresholds.categorise_many([period.price for period in periods])
     else:
-        ns_hour = ns_hour - current_period
-        now = datetime.datetime.now()
-        if ns_hour > 0:
-            ns_hour = ns_hour - (now.minute / 60)
-    if ns_hour is not None:
-        try:
-            ns_hour = round(float(ns_hour), 1)
-        except Exception:
-            pass
-    return ns_hour
\ No newline at end of file
+        categories = [categorise_with(thresholds, period.price) for period in periods]
+    current = periods[0]
+    target = None
+    for period, category in zip(periods, categories):
+        hour = datetime.datetime.fromtimestamp(period.start, tz).hour
+        if hour > 12 and "High" in category:
+            target = period
+            break
+    if target is None:
+        target = max(periods, key=lambda period: period.price)
+    remaining = (target.start - current.start) / 3600
+    if remaining > 0:
+        # Part of the current period has already passed
+        remaining -= max(0.0, now.timestamp() - current.start) / 3600
+    return round(remaining, 1)
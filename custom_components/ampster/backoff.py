@@ -0,0 +1,74 @@
+"""
+Helpers for spreading and backing off remote requests: jittered exponential
+backoff, stable per-install offsets and a small circuit breaker.
+"""
+import hashlib
+import random
+import time
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with equal jitter: a delay in [d/2, d] where d = min(cap, base * 2**attempt)."""
+    delay = min(cap, base * (2 ** max(attempt, 0)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def stable_offset(seed: str, span: int) -> int:
+    """Deterministic offset in [0, span) derived from seed, evenly spread across installs."""
+    if span <= 0:
+        return 0
+    return int(hashlib.sha256(seed.encode()).hexdigest(), 16) % span
+
+
+def next_slot(now: float, interval: float, offset: float) -> float:
+    """The first time after now that is offset seconds into a wall-clock slot of interval seconds."""
+    slot = (now - offset) // interval * interval + offset
+    return slot + interval if slot <= now else slot
+
+
+class CircuitBreaker:
+    """Stops calling a failing endpoint for a while after repeated failures.
+
+    closed: requests flow normally. After failure_threshold consecutive failures the
+    breaker opens and rejects requests for reset_timeout seconds. It then goes
+    half_open and lets one trial request through; success closes it again,
+    failure re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 1800, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.consecutive_failures = 0
+        self._opened_at = None
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    @property
+    def retry_in(self) -> float:
+        """Seconds until an open breaker lets a trial request through (0 if not open)."""
+        if self._opened_at is None:
+            return 0
+        return max(0.0, self._opened_at + self.reset_timeout - self._clock())
+
+    def allow_request(self) -> bool:
+        return self.state != self.OPEN
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self._opened_at = None
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self._opened_at = self._clock()
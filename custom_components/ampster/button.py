@@ -59,6 +59,16 @@ class AmpsterUploadNowButton(ButtonEntity):
             "entry_type": "service",
         }
 
+    async def async_added_to_hass(self) -> None:
+        """Write the state after every upload so the statistics stay current."""
+        if self.uploader:
+            self.async_on_remove(self.uploader.async_add_listener(self.async_write_ha_state))
+
+    @property
+    def extra_state_attributes(self):
+        """Upload session statistics (requests and new vs. reused connections)."""
+        return dict(self.uploader.stats) if self.uploader else {}
+
     async def async_press(self) -> None:
         _LOGGER.info("[Ampster] Upload Now button pressed!")
         if self.uploader:
@@ -3,7 +3,12 @@ from homeassistant import config_entries
 from homeassistant.core import callback
 from .const import (
     DOMAIN, DEFAULT_COUNTRY, DEFAULT_MINUTE, DEFAULT_BASE_URL, SUPPORTED_COUNTRIES,
-    DEFAULT_UPLOAD_URL, DEFAULT_UPLOAD_INTERVAL, DEFAULT_UPLOAD_SENSORS, DEFAULT_API_KEY
+    DEFAULT_UPLOAD_URL, DEFAULT_UPLOAD_INTERVAL, DEFAULT_UPLOAD_SENSORS, DEFAULT_API_KEY,
+    DEFAULT_COMPARE_COUNTRIES, DEFAULT_SUMMARY_SIZE, DEFAULT_ANALYTICS_WINDOWS, DEFAULT_BLOCK_SIZES,
+    DEFAULT_UPLOAD_MODE, UPLOAD_MODES, DEFAULT_UPLOAD_ENCODING, UPLOAD_ENCODINGS,
+    DEFAULT_UPLOAD_COMPRESSION, UPLOAD_COMPRESSIONS, DEFAULT_UPLOAD_SAMPLE_INTERVAL, DEFAULT_UPLOAD_ATTRIBUTES,
+    DEFAULT_UPLOAD_EXCLUDE_ATTRIBUTES, DEFAULT_UPLOAD_VALUES_ONLY, DEFAULT_UPLOAD_ATTRIBUTE_MAX_BYTES,
+    DEFAULT_UPLOAD_EXTRA_ENDPOINTS
 )
 
 class AmpsterConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
@@ -32,19 +37,45 @@ class AmpsterConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         current_country = entry.data.get("country_prefix", DEFAULT_COUNTRY)
         current_minute = entry.data.get("minute", DEFAULT_MINUTE)
         current_base_url = entry.data.get("base_url", DEFAULT_BASE_URL)
+        current_compare_countries = entry.options.get("compare_countries", entry.data.get("compare_countries", DEFAULT_COMPARE_COUNTRIES))
+        current_summary_size = entry.options.get("summary_size", entry.data.get("summary_size", DEFAULT_SUMMARY_SIZE))
+        current_analytics_windows = entry.options.get("analytics_windows", entry.data.get("analytics_windows", DEFAULT_ANALYTICS_WINDOWS))
+        current_block_sizes = entry.options.get("block_sizes", entry.data.get("block_sizes", DEFAULT_BLOCK_SIZES))
         current_upload_url = entry.options.get("upload_url", entry.data.get("upload_url", DEFAULT_UPLOAD_URL))
         current_api_key = entry.options.get("api_key", entry.data.get("api_key", DEFAULT_API_KEY))
         current_upload_sensors = entry.options.get("upload_sensors", entry.data.get("upload_sensors", DEFAULT_UPLOAD_SENSORS))
         current_upload_interval = entry.options.get("upload_interval", entry.data.get("upload_interval", DEFAULT_UPLOAD_INTERVAL))
+        current_upload_mode = entry.options.get("upload_mode", entry.data.get("upload_mode", DEFAULT_UPLOAD_MODE))
+        current_upload_encoding = entry.options.get("upload_encoding", entry.data.get("upload_encoding", DEFAULT_UPLOAD_ENCODING))
+        current_upload_compression = entry.options.get("upload_compression", entry.data.get("upload_compression", DEFAULT_UPLOAD_COMPRESSION))
+        current_upload_sample_interval = entry.options.get("upload_sample_interval", entry.data.get("upload_sample_interval", DEFAULT_UPLOAD_SAMPLE_INTERVAL))
+        current_upload_attributes = entry.options.get("upload_attributes", entry.data.get("upload_attributes", DEFAULT_UPLOAD_ATTRIBUTES))
+        current_upload_exclude_attributes = entry.options.get("upload_exclude_attributes", entry.data.get("upload_exclude_attributes", DEFAULT_UPLOAD_EXCLUDE_ATTRIBUTES))
+        current_upload_values_only = entry.options.get("upload_values_only", entry.data.get("upload_values_only", DEFAULT_UPLOAD_VALUES_ONLY))
+        current_upload_attribute_max_bytes = entry.options.get("upload_attribute_max_bytes", entry.data.get("upload_attribute_max_bytes", DEFAULT_UPLOAD_ATTRIBUTE_MAX_BYTES))
+        current_upload_extra_endpoints = entry.options.get("upload_extra_endpoints", entry.data.get("upload_extra_endpoints", DEFAULT_UPLOAD_EXTRA_ENDPOINTS))
         return self.async_show_form(
             step_id="options",
             data_schema=self._get_schema(
                 minute=current_minute, 
                 base_url=current_base_url,
+                compare_countries=current_compare_countries,
+                summary_size=current_summary_size,
+                analytics_windows=current_analytics_windows,
+                block_sizes=current_block_sizes,
                 upload_url=current_upload_url,
                 api_key=current_api_key,
                 upload_sensors=current_upload_sensors,
-                upload_interval=current_upload_interval
+                upload_interval=current_upload_interval,
+                upload_mode=current_upload_mode,
+                upload_encoding=current_upload_encoding,
+                upload_compression=current_upload_compression,
+                upload_sample_interval=current_upload_sample_interval,
+                upload_attributes=current_upload_attributes,
+                upload_exclude_attributes=current_upload_exclude_attributes,
+                upload_values_only=current_upload_values_only,
+                upload_attribute_max_bytes=current_upload_attribute_max_bytes,
+                upload_extra_endpoints=current_upload_extra_endpoints
             ),
             errors=errors,
             description_placeholders={
@@ -53,8 +84,14 @@ class AmpsterConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         )
 
     @callback
-    def _get_schema(self, minute=DEFAULT_MINUTE, base_url=DEFAULT_BASE_URL, upload_url=DEFAULT_UPLOAD_URL, 
-                   api_key=DEFAULT_API_KEY, upload_sensors=DEFAULT_UPLOAD_SENSORS, upload_interval=DEFAULT_UPLOAD_INTERVAL):
+    def _get_schema(self, minute=DEFAULT_MINUTE, base_url=DEFAULT_BASE_URL, compare_countries=DEFAULT_COMPARE_COUNTRIES, summary_size=DEFAULT_SUMMARY_SIZE,
+                   analytics_windows=DEFAULT_ANALYTICS_WINDOWS, block_sizes=DEFAULT_BLOCK_SIZES, upload_url=DEFAULT_UPLOAD_URL, 
+                   api_key=DEFAULT_API_KEY, upload_sensors=DEFAULT_UPLOAD_SENSORS, upload_interval=DEFAULT_UPLOAD_INTERVAL,
+                   upload_mode=DEFAULT_UPLOAD_MODE, upload_encoding=DEFAULT_UPLOAD_ENCODING, upload_compression=DEFAULT_UPLOAD_COMPRESSION,
+                   upload_sample_interval=DEFAULT_UPLOAD_SAMPLE_INTERVAL, upload_attributes=DEFAULT_UPLOAD_ATTRIBUTES,
+                   upload_exclude_attributes=DEFAULT_UPLOAD_EXCLUDE_ATTRIBUTES, upload_values_only=DEFAULT_UPLOAD_VALUES_ONLY,
+                   upload_attribute_max_bytes=DEFAULT_UPLOAD_ATTRIBUTE_MAX_BYTES,
+                   upload_extra_endpoints=DEFAULT_UPLOAD_EXTRA_ENDPOINTS):
         from homeassistant.helpers import config_validation as cv
         import voluptuous as vol
         # Guess country prefix from locale
@@ -72,10 +109,23 @@ class AmpsterConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             vol.Required("country_prefix", default=guessed_prefix): vol.In(country_options),
             vol.Required("minute", default=minute): vol.All(vol.Coerce(int), vol.Range(min=0, max=59)),
             vol.Required("base_url", default=base_url): str,
+            vol.Optional("compare_countries", default=compare_countries): cv.multi_select(country_options),
+            vol.Optional("summary_size", default=summary_size): vol.All(vol.Coerce(int), vol.Range(min=0, max=96)),
+            vol.Optional("analytics_windows", default=analytics_windows): str,
+            vol.Optional("block_sizes", default=block_sizes): str,
             vol.Optional("upload_url", default=upload_url): str,
             vol.Optional("api_key", default=api_key): str,
             vol.Optional("upload_sensors", default=upload_sensors): str,
             vol.Optional("upload_interval", default=upload_interval): vol.All(vol.Coerce(int), vol.Range(min=1, max=1440)),
+            vol.Optional("upload_mode", default=upload_mode): vol.In(UPLOAD_MODES),
+            vol.Optional("upload_encoding", default=upload_encoding): vol.In(UPLOAD_ENCODINGS),
+            vol.Optional("upload_compression", default=upload_compression): vol.In(UPLOAD_COMPRESSIONS),
+            vol.Optional("upload_sample_interval", default=upload_sample_interval): vol.All(vol.Coerce(int), vol.Range(min=0, max=3600)),
+            vol.Optional("upload_attributes", default=upload_attributes): str,
+            vol.Optional("upload_exclude_attributes", default=upload_exclude_attributes): str,
+            vol.Optional("upload_values_only", default=upload_values_only): bool,
+            vol.Optional("upload_attribute_max_bytes", default=upload_attribute_max_bytes): vol.All(vol.Coerce(int), vol.Range(min=0, max=1048576)),
+            vol.Optional("upload_extra_endpoints", default=upload_extra_endpoints): str,
         })
 
     @staticmethod
@@ -98,10 +148,23 @@ class AmpsterOptionsFlowHandler(config_entries.OptionsFlow):
         current_country = self.config_entry.options.get("country_prefix", self.config_entry.data.get("country_prefix", DEFAULT_COUNTRY))
         current_minute = self.config_entry.options.get("minute", self.config_entry.data.get("minute", DEFAULT_MINUTE))
         current_base_url = self.config_entry.options.get("base_url", self.config_entry.data.get("base_url", DEFAULT_BASE_URL))
+        current_compare_countries = self.config_entry.options.get("compare_countries", self.config_entry.data.get("compare_countries", DEFAULT_COMPARE_COUNTRIES))
+        current_summary_size = self.config_entry.options.get("summary_size", self.config_entry.data.get("summary_size", DEFAULT_SUMMARY_SIZE))
+        current_analytics_windows = self.config_entry.options.get("analytics_windows", self.config_entry.data.get("analytics_windows", DEFAULT_ANALYTICS_WINDOWS))
+        current_block_sizes = self.config_entry.options.get("block_sizes", self.config_entry.data.get("block_sizes", DEFAULT_BLOCK_SIZES))
         current_upload_url = self.config_entry.options.get("upload_url", self.config_entry.data.get("upload_url", DEFAULT_UPLOAD_URL))
         current_api_key = self.config_entry.options.get("api_key", self.config_entry.data.get("api_key", DEFAULT_API_KEY))
         current_upload_sensors = self.config_entry.options.get("upload_sensors", self.config_entry.data.get("upload_sensors", DEFAULT_UPLOAD_SENSORS))
         current_upload_interval = self.config_entry.options.get("upload_interval", self.config_entry.data.get("upload_interval", DEFAULT_UPLOAD_INTERVAL))
+        current_upload_mode = self.config_entry.options.get("upload_mode", self.config_entry.data.get("upload_mode", DEFAULT_UPLOAD_MODE))
+        current_upload_encoding = self.config_entry.options.get("upload_encoding", self.config_entry.data.get("upload_encoding", DEFAULT_UPLOAD_ENCODING))
+        current_upload_compression = self.config_entry.options.get("upload_compression", self.config_entry.data.get("upload_compression", DEFAULT_UPLOAD_COMPRESSION))
+        current_upload_sample_interval = self.config_entry.options.get("upload_sample_interval", self.config_entry.data.get("upload_sample_interval", DEFAULT_UPLOAD_SAMPLE_INTERVAL))
+        current_upload_attributes = self.config_entry.options.get("upload_attributes", self.config_entry.data.get("upload_attributes", DEFAULT_UPLOAD_ATTRIBUTES))
+        current_upload_exclude_attributes = self.config_entry.options.get("upload_exclude_attributes", self.config_entry.data.get("upload_exclude_attributes", DEFAULT_UPLOAD_EXCLUDE_ATTRIBUTES))
+        current_upload_values_only = self.config_entry.options.get("upload_values_only", self.config_entry.data.get("upload_values_only", DEFAULT_UPLOAD_VALUES_ONLY))
+        current_upload_attribute_max_bytes = self.config_entry.options.get("upload_attribute_max_bytes", self.config_entry.data.get("upload_attribute_max_bytes", DEFAULT_UPLOAD_ATTRIBUTE_MAX_BYTES))
+        current_upload_extra_endpoints = self.config_entry.options.get("upload_extra_endpoints", self.config_entry.data.get("upload_extra_endpoints", DEFAULT_UPLOAD_EXTRA_ENDPOINTS))
         from homeassistant.helpers import config_validation as cv
         import voluptuous as vol
         country_options = SUPPORTED_COUNTRIES
@@ -111,10 +174,23 @@ class AmpsterOptionsFlowHandler(config_entries.OptionsFlow):
                 vol.Required("country_prefix", default=current_country): vol.In(country_options),
                 vol.Required("minute", default=current_minute): vol.All(vol.Coerce(int), vol.Range(min=0, max=59)),
                 vol.Required("base_url", default=current_base_url): str,
+                vol.Optional("compare_countries", default=current_compare_countries): cv.multi_select(country_options),
+                vol.Optional("summary_size", default=current_summary_size): vol.All(vol.Coerce(int), vol.Range(min=0, max=96)),
+                vol.Optional("analytics_windows", default=current_analytics_windows): str,
+                vol.Optional("block_sizes", default=current_block_sizes): str,
                 vol.Optional("upload_url", default=current_upload_url): str,
                 vol.Optional("api_key", default=current_api_key): str,
                 vol.Optional("upload_sensors", default=current_upload_sensors): str,
                 vol.Optional("upload_interval", default=current_upload_interval): vol.All(vol.Coerce(int), vol.Range(min=1, max=1440)),
+                vol.Optional("upload_mode", default=current_upload_mode): vol.In(UPLOAD_MODES),
+                vol.Optional("upload_encoding", default=current_upload_encoding): vol.In(UPLOAD_ENCODINGS),
+                vol.Optional("upload_compression", default=current_upload_compression): vol.In(UPLOAD_COMPRESSIONS),
+                vol.Optional("upload_sample_interval", default=current_upload_sample_interval): vol.All(vol.Coerce(int), vol.Range(min=0, max=3600)),
+                vol.Optional("upload_attributes", default=current_upload_attributes): str,
+                vol.Optional("upload_exclude_attributes", default=current_upload_exclude_attributes): str,
+                vol.Optional("upload_values_only", default=current_upload_values_only): bool,
+                vol.Optional("upload_attribute_max_bytes", default=current_upload_attribute_max_bytes): vol.All(vol.Coerce(int), vol.Range(min=0, max=1048576)),
+                vol.Optional("upload_extra_endpoints", default=current_upload_extra_endpoints): str,
             }),
             errors=errors,
             description_placeholders={
@@ -6,12 +6,101 @@ DEFAULT_COUNTRY = "NL"
 DEFAULT_MINUTE = 5
 DEFAULT_BASE_URL = "https://ampster.s3.us-east-1.amazonaws.com/electricity_prices/"
 
+# On-disk snapshot of the last good payload (see coordinator.async_load_snapshot)
+SNAPSHOT_STORAGE_VERSION = 1
+SNAPSHOT_SAVE_DELAY = 10  # seconds
+
+# Key in hass.data[DOMAIN] holding the shared, reference-counted coordinators
+COORDINATOR_REGISTRY = "coordinator_registry"
+
+# Retry/backoff and circuit breaker for feed fetches (see backoff.py)
+FETCH_RETRY_BASE_DELAY = 30  # seconds
+FETCH_RETRY_MAX_DELAY = 900  # seconds
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_TIMEOUT = 1800  # seconds
+
+# Publication-aware polling (see scheduler.py)
+PUBLICATION_WINDOW = 1800  # seconds after the expected publication to keep polling densely
+DENSE_POLL_INTERVAL = 60  # seconds
+IDLE_POLL_INTERVAL = 3 * 3600  # seconds, longest gap between polls once the cadence is known
+PUBLICATION_GRACE = 30  # seconds after the expected publication before the first poll
+
+# Feed payload limits (see decoder.py)
+MAX_PAYLOAD_BYTES = 5 * 1024 * 1024
+DECODE_EXECUTOR_THRESHOLD = 256 * 1024  # decode larger bodies off the event loop
+
+# Number of leading values shown in the attributes of list/dict sensors (full values via the ampster.get_value service)
+DEFAULT_SUMMARY_SIZE = 5
+
+# Consecutive payloads a key must be missing from before its sensor is removed (until then it is unavailable)
+KEY_SENSOR_REMOVE_AFTER = 3
+
+# ampster.plan_battery limits; the solver runs in the executor, in time roughly periods x steps^2
+PLAN_MAX_SOC_STEPS = 100
+PLAN_MAX_HORIZON = 192  # periods, two days of quarter hours
+
+# Rolling-window analytics (see analytics.py): comma separated period counts
+DEFAULT_ANALYTICS_WINDOWS = "12,24"
+DEFAULT_BLOCK_SIZES = "3"
+
+# Multi-country fetching (see coordinator.AmpsterMultiCountryCoordinator)
+DEFAULT_COMPARE_COUNTRIES = []
+MAX_PARALLEL_FETCHES = 4
+COUNTRY_FETCH_TIMEOUT = 20  # seconds
+
 # Upload configuration defaults
 DEFAULT_UPLOAD_URL = "https://yv3l9alv8g.execute-api.us-east-1.amazonaws.com/prod/data"
 DEFAULT_UPLOAD_INTERVAL = 15
 DEFAULT_UPLOAD_SENSORS = ""
 DEFAULT_API_KEY = ""
 
+# Pooled upload session (see transport.UploadTransport)
+UPLOAD_CONNECT_TIMEOUT = 10  # seconds
+UPLOAD_READ_TIMEOUT = 30  # seconds
+UPLOAD_CONNECTION_LIMIT = 4
+UPLOAD_KEEPALIVE_TIMEOUT = 90  # seconds, long enough to reuse connections at a 1 minute interval
+UPLOAD_REQUEST_DEADLINE = 60  # seconds for a whole request, including the response
+UPLOAD_CONCURRENCY = 1  # requests in flight per endpoint; more would let replays and live uploads arrive out of order
+
+# Upload backoff after failures, 429 and 5xx responses (see transport.py)
+UPLOAD_RETRY_BASE_DELAY = 30  # seconds
+UPLOAD_RETRY_MAX_DELAY = 1800  # seconds
+UPLOAD_RETRY_AFTER_MAX = 3600  # seconds, cap on a server supplied Retry-After
+
+# Upload modes: full snapshot every interval, or only the entities that changed plus periodic keyframes
+UPLOAD_MODE_SNAPSHOT = "snapshot"
+UPLOAD_MODE_DELTA = "delta"
+UPLOAD_MODES = [UPLOAD_MODE_SNAPSHOT, UPLOAD_MODE_DELTA]
+DEFAULT_UPLOAD_MODE = UPLOAD_MODE_SNAPSHOT
+DELTA_FLUSH_SIZE = 200  # changed entities buffered before flushing ahead of the interval
+DELTA_KEYFRAME_INTERVAL = 6 * 3600  # seconds between full keyframes in delta mode
+
+# On-disk spool for undelivered upload batches (see spool.py)
+SPOOL_SEGMENT_BYTES = 256 * 1024
+SPOOL_MAX_BYTES = 20 * 1024 * 1024
+SPOOL_MAX_AGE = 48 * 3600  # seconds
+SPOOL_REPLAY_BATCH = 8  # spooled batches read from disk per step; they are sent one at a time
+
+# Upload body encoding and compression (see encoding.py)
+UPLOAD_ENCODINGS = ["json", "columnar"]
+DEFAULT_UPLOAD_ENCODING = "json"
+UPLOAD_COMPRESSIONS = ["none", "gzip", "zstd"]
+DEFAULT_UPLOAD_COMPRESSION = "none"
+COMPRESS_EXECUTOR_THRESHOLD = 256 * 1024  # compress larger bodies off the event loop
+
+# Attribute projection for uploaded entities (see projection.py)
+DEFAULT_UPLOAD_ATTRIBUTES = ""  # allow-list, empty uploads all attributes
+DEFAULT_UPLOAD_EXCLUDE_ATTRIBUTES = ""  # deny-list
+DEFAULT_UPLOAD_VALUES_ONLY = False
+DEFAULT_UPLOAD_ATTRIBUTE_MAX_BYTES = 0  # 0 disables the size cap
+
+# Multi-sample uploads (see sampling.py): seconds between samples, 0 disables sampling
+DEFAULT_UPLOAD_SAMPLE_INTERVAL = 0
+MAX_SAMPLES_PER_UPLOAD = 1440  # ring buffer capacity cap
+
+# Extra endpoints that receive every upload batch too, "url|api_key[|encoding[|compression]]" comma separated
+DEFAULT_UPLOAD_EXTRA_ENDPOINTS = ""
+
 # For backward compatibility, provide BASE_URL as an alias for DEFAULT_BASE_URL
 BASE_URL = DEFAULT_BASE_URL
 
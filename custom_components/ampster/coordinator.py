@@ -1,13 +1,34 @@
 """
 Ampster DataUpdateCoordinator for periodic JSON fetching.
 """
+import asyncio
+import hashlib
+import json
 import logging
+import time
 from datetime import timedelta
-import aiohttp
+from email.utils import parsedate_to_datetime
 import pytz
+from homeassistant.config_entries import current_entry
+from homeassistant.core import callback
+from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
-from homeassistant.helpers.event import async_track_time_change
-from .const import DOMAIN, DEFAULT_COUNTRY, DEFAULT_MINUTE, BASE_URL, SUPPORTED_COUNTRIES
+from homeassistant.helpers import instance_id
+from homeassistant.helpers.event import async_call_later, async_track_time_change
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+from .const import (
+    DOMAIN, DEFAULT_COUNTRY, DEFAULT_MINUTE, BASE_URL, SUPPORTED_COUNTRIES,
+    SNAPSHOT_STORAGE_VERSION, SNAPSHOT_SAVE_DELAY, MAX_PARALLEL_FETCHES, COUNTRY_FETCH_TIMEOUT,
+    COORDINATOR_REGISTRY, FETCH_RETRY_BASE_DELAY, FETCH_RETRY_MAX_DELAY,
+    CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT, MAX_PAYLOAD_BYTES, DECODE_EXECUTOR_THRESHOLD,
+    PUBLICATION_WINDOW, DENSE_POLL_INTERVAL, IDLE_POLL_INTERVAL, PUBLICATION_GRACE,
+)
+from .backoff import CircuitBreaker, backoff_delay, stable_offset
+from .decoder import DECODER_NAME, async_decode_json, async_read_body
+from .prices import PriceSeries
+from .scheduler import PublicationScheduler
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -20,52 +41,488 @@ COUNTRY_TZ = {
 }
 DEFAULT_TZ = pytz.UTC
 
+def summarize_value(value):
+    """Short sensor state for a payload value (max 255 chars; counts for lists/dicts)."""
+    if isinstance(value, (str, int, float)) and len(str(value)) <= 255:
+        return value
+    elif isinstance(value, dict):
+        return f"dict ({len(value)})"
+    elif isinstance(value, list):
+        return f"list ({len(value)})"
+    else:
+        return str(value)[:255]
+
+def resolve_country(hass, country_prefix=None) -> str:
+    """The configured country, else one guessed from Home Assistant's language."""
+    if country_prefix:
+        return country_prefix
+    lang = (hass.config.language or "en").lower()
+    lang_map = {
+        "nl": "NL",
+        "fr": "FR",
+        "be": "BE",
+        "de": "AT",  # Example: map 'de' to 'AT', adjust as needed
+        "at": "AT",
+    }
+    return lang_map.get(lang, DEFAULT_COUNTRY)
+
+def feed_url(base_url, country) -> str:
+    return f"{base_url or BASE_URL}{country}.json"
+
+def multi_country_feed_key(countries, base_url=None) -> str:
+    """Feed key of an AmpsterMultiCountryCoordinator, known before it is built."""
+    return ",".join(feed_url(base_url, country) for country in SUPPORTED_COUNTRIES if country in countries)
+
+def _value_hash(value):
+    """Structural hash of a payload value, used to detect which top-level keys changed."""
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return (type(value).__name__, value)
+    return hash(json.dumps(value, sort_keys=True, default=str))
+
 class AmpsterDataUpdateCoordinator(DataUpdateCoordinator):
     def __init__(self, hass, url: str = None, country_prefix: str = None, minute: int = DEFAULT_MINUTE, base_url: str = None):
         self.hass = hass
-        self.country_prefix = country_prefix
+        # Determine country prefix from locale if not provided
+        self.country_prefix = resolve_country(hass, country_prefix)
         self.minute = minute
         self.base_url = base_url or BASE_URL
-        # Determine country prefix from locale if not provided
-        if not self.country_prefix:
-            lang = (hass.config.language or "en").lower()
-            lang_map = {
-                "nl": "NL",
-                "fr": "FR",
-                "be": "BE",
-                "de": "AT",  # Example: map 'de' to 'AT', adjust as needed
-                "at": "AT",
-            }
-            self.country_prefix = lang_map.get(lang, DEFAULT_COUNTRY)
-        self.url = url or f"{self.base_url}{self.country_prefix}.json"
+        self.url = url or feed_url(self.base_url, self.country_prefix)
+        # Reuse Home Assistant's shared pooled session instead of opening a new one per fetch
+        self._session = async_get_clientsession(hass)
+        # Validators from the last successful response per URL, sent back as a conditional GET
+        self._validators = {}
+        # When the current payload was last confirmed by the server (or restored from disk)
+        self.last_fetched = None
+        # Set while the data comes from the on-disk snapshot and no live fetch has succeeded yet
+        self._serving_snapshot = False
+        # Last good payload persisted to .storage so setup does not have to wait for S3
+        url_hash = hashlib.sha1(self.feed_key.encode()).hexdigest()[:12]
+        self._store = Store(hass, SNAPSHOT_STORAGE_VERSION, f"{DOMAIN}.snapshot_{url_hash}")
         super().__init__(
             hass,
             _LOGGER,
             name="Ampster Data Coordinator",
             update_interval=None,  # We'll schedule updates manually
+            always_update=False,  # Skip the listener fan-out when the payload is unchanged (e.g. on 304)
         )
-        self._unsub_timer = async_track_time_change(
-            hass,
-            self._scheduled_refresh,
-            minute=self.minute,
-            second=0,
-        )
+        # Hourly timer is started in async_initialize so unused instances cost nothing
+        self._unsub_timer = None
+        # Second within the fetch minute, derived from the install id so the fleet doesn't hit S3 in lockstep
+        self.second = 0
+        # Follow-up refresh scheduled with jittered backoff after a failed fetch
+        self._unsub_retry = None
+        self.circuit_breaker = CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+        # Structures derived once per payload (see _parse_payload) so consumers don't re-walk the JSON
+        self.series = PriceSeries([], [])
+        self.values = {}
+        # Per-key hashes of the current payload and listeners that only care about one key
+        self._key_hashes = {}
+        self._key_listeners = {}
+        self.changed_keys = set()
+        self._key_listeners_saw_success = True
+        # Learned publish cadence per fetched URL; once known it drives polling instead of the hourly timer
+        self.schedulers = {}
+        self._unsub_adaptive = None
+        # Size and decode time of the last downloaded payload
+        self.last_payload_bytes = None
+        self.last_decode_ms = None
+
+    @property
+    def feed_key(self) -> str:
+        """Identity of the feed(s) this coordinator fetches."""
+        return self.url
+
+    def _scheduler(self, url) -> PublicationScheduler:
+        """The publication scheduler for one URL, created on first use."""
+        scheduler = self.schedulers.get(url)
+        if scheduler is None:
+            scheduler = PublicationScheduler(PUBLICATION_WINDOW, DENSE_POLL_INTERVAL, IDLE_POLL_INTERVAL, PUBLICATION_GRACE)
+            self.schedulers[url] = scheduler
+        return scheduler
+
+    async def _async_fetch_json(self, url):
+        """Conditionally GET one JSON file. Returns None if the server answered 304."""
+        headers = {}
+        validators = self._validators.get(url) if self.data is not None else None
+        if validators:
+            if validators.get("etag"):
+                headers["If-None-Match"] = validators["etag"]
+            if validators.get("last_modified"):
+                headers["If-Modified-Since"] = validators["last_modified"]
+        async with self._session.get(url, headers=headers) as response:
+            if response.status == 304:
+                _LOGGER.debug(f"[Ampster] {url} not modified, keeping cached data")
+                return None
+            response.raise_for_status()
+            raw = await async_read_body(response, MAX_PAYLOAD_BYTES)
+            validators = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
+        data, decode_ms = await async_decode_json(self.hass, raw, DECODE_EXECUTOR_THRESHOLD)
+        self.last_payload_bytes = len(raw)
+        self.last_decode_ms = round(decode_ms, 2)
+        _LOGGER.debug(f"[Ampster] Decoded {len(raw)} bytes from {url} with {DECODER_NAME} in {decode_ms:.1f} ms")
+        # Only remember the validators once the body decoded, so a corrupt download is refetched in full
+        self._validators[url] = validators
+        published = self._publication_time(validators["last_modified"], data)
+        scheduler = self._scheduler(url)
+        if published is not None and scheduler.record(published):
+            _LOGGER.debug(f"[Ampster] New publication of {url} at {published} (cadence {scheduler.interval})")
+        return data
+
+    def _publication_time(self, last_modified, data):
+        """When this version of the file was published: Last-Modified, else the payload timestamp."""
+        try:
+            if last_modified:
+                return parsedate_to_datetime(last_modified).timestamp()
+            published = dt_util.parse_datetime(str(data.get("timestamp"))) if isinstance(data, dict) else None
+        except (TypeError, ValueError):
+            return None
+        if published is None:
+            return None
+        if published.tzinfo is None:
+            published = COUNTRY_TZ.get(data.get("country") or self.country_prefix, DEFAULT_TZ).localize(published)
+        return published.timestamp()
+
+    async def _async_fetch_feed(self):
+        """Fetch the feed. Returns None if it is unchanged since the last fetch."""
+        return await self._async_fetch_json(self.url)
 
     async def _async_update_data(self):
+        """Fetch the feed; failures keep a restored snapshot while it still covers the current period."""
+        try:
+            return await self._async_fetch_update()
+        except UpdateFailed:
+            if self._serving_snapshot and self._snapshot_still_valid():
+                _LOGGER.warning(f"[Ampster] Fetch of {self.feed_key} failed, keeping the restored snapshot until a fetch succeeds")
+                return self.data
+            raise
+
+    def _snapshot_still_valid(self) -> bool:
+        """Whether the restored data still has a price for the current period."""
+        return self.series.index_at(time.time()) >= 0
+
+    async def _async_fetch_update(self):
+        if not self.circuit_breaker.allow_request():
+            raise UpdateFailed(f"Circuit open for {self.feed_key}, next attempt in {self.circuit_breaker.retry_in:.0f}s")
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.url) as response:
-                    response.raise_for_status()
-                    return await response.json()
+            data = await self._async_fetch_feed()
         except Exception as err:
             _LOGGER.error(f"[Ampster] Data fetch failed: {err}")
+            self.circuit_breaker.record_failure()
+            self._schedule_retry()
             raise UpdateFailed(f"Error fetching data: {err}")
+        self.circuit_breaker.record_success()
+        self._serving_snapshot = False
+        self._cancel_retry()
+        self._schedule_next_poll()
+        self.last_fetched = dt_util.utcnow()
+        if data is None:
+            return self.data
+        self._diff_keys(data)
+        self._parse_payload(data)
+        self._store.async_delay_save(self._snapshot_to_store, SNAPSHOT_SAVE_DELAY)
+        return data
+
+    def _diff_keys(self, data):
+        """Record which top-level keys differ from the previous payload."""
+        hashes = {key: _value_hash(value) for key, value in data.items()}
+        old_hashes = self._key_hashes
+        self.changed_keys = {key for key in hashes.keys() | old_hashes.keys() if hashes.get(key) != old_hashes.get(key)}
+        self._key_hashes = hashes
+
+    @callback
+    def async_add_key_listener(self, key, update_callback):
+        """Listen for changes of a single top-level key. Returns a function that removes the listener."""
+        listeners = self._key_listeners.setdefault(key, [])
+        listeners.append(update_callback)
+
+        @callback
+        def remove_listener():
+            listeners.remove(update_callback)
+            if not listeners and self._key_listeners.get(key) is listeners:
+                del self._key_listeners[key]
+
+        return remove_listener
+
+    @callback
+    def async_update_listeners(self):
+        """Notify general listeners, then only the key listeners whose key changed."""
+        super().async_update_listeners()
+        if self.last_update_success != self._key_listeners_saw_success:
+            # Availability flipped, so every keyed entity has to write its state
+            keys = list(self._key_listeners)
+        else:
+            keys = [key for key in self.changed_keys if key in self._key_listeners]
+        self._key_listeners_saw_success = self.last_update_success
+        self.changed_keys = set()
+        for key in keys:
+            for update_callback in list(self._key_listeners.get(key, ())):
+                update_callback()
+
+    def _parse_payload(self, data):
+        """Build the indexed price series and per-key sensor states from a new payload."""
+        tz = COUNTRY_TZ.get(data.get("country") or self.country_prefix, DEFAULT_TZ)
+        self.series = PriceSeries.from_payload(data, tz)
+        self.values = {key: summarize_value(value) for key, value in data.items()}
+
+    def _schedule_retry(self):
+        """Schedule a follow-up refresh instead of waiting for the next hourly tick."""
+        self._cancel_retry()
+        if self.circuit_breaker.state == CircuitBreaker.OPEN:
+            delay = self.circuit_breaker.retry_in
+        else:
+            delay = backoff_delay(self.circuit_breaker.consecutive_failures - 1, FETCH_RETRY_BASE_DELAY, FETCH_RETRY_MAX_DELAY)
+        _LOGGER.info(f"[Ampster] Retrying {self.feed_key} in {delay:.0f}s (circuit {self.circuit_breaker.state}, {self.circuit_breaker.consecutive_failures} consecutive failures)")
+        self._unsub_retry = async_call_later(self.hass, delay, self._retry_refresh)
+
+    def _schedule_next_poll(self):
+        """Poll around the earliest expected publication of any URL whose cadence is known."""
+        self._cancel_next_poll()
+        now = time.time()
+        polls = [poll for poll in (scheduler.next_poll(now) for scheduler in self.schedulers.values()) if poll is not None]
+        if not polls:
+            return
+        next_poll = min(polls)
+        delay = max(next_poll - now, DENSE_POLL_INTERVAL)
+        _LOGGER.debug(f"[Ampster] Next adaptive poll of {self.feed_key} in {delay:.0f}s")
+        self._unsub_adaptive = async_call_later(self.hass, delay, self._adaptive_refresh)
+
+    def _cancel_next_poll(self):
+        if self._unsub_adaptive:
+            self._unsub_adaptive()
+            self._unsub_adaptive = None
+
+    async def _adaptive_refresh(self, now):
+        self._unsub_adaptive = None
+        await self.async_request_refresh()
+
+    def _cancel_retry(self):
+        if self._unsub_retry:
+            self._unsub_retry()
+            self._unsub_retry = None
+
+    async def _retry_refresh(self, now):
+        self._unsub_retry = None
+        await self.async_request_refresh()
+
+    async def async_initialize(self, require_data: bool = True):
+        """Start the hourly timer and load initial data.
+
+        The on-disk snapshot is used if present (revalidated in the background), else a live fetch.
+        """
+        if self._unsub_timer is None:
+            install_id = await instance_id.async_get(self.hass)
+            self.second = stable_offset(f"{install_id}:{self.feed_key}", 60)
+            self._unsub_timer = async_track_time_change(
+                self.hass,
+                self._scheduled_refresh,
+                minute=self.minute,
+                second=self.second,
+            )
+        if await self.async_load_snapshot():
+            self.hass.async_create_background_task(self.async_refresh(), f"{DOMAIN}_refresh_{self.feed_key}")
+        elif require_data:
+            # Not async_config_entry_first_refresh: a shared coordinator belongs to no single entry
+            await self.async_refresh()
+            if not self.last_update_success:
+                raise ConfigEntryNotReady(f"Could not fetch {self.feed_key}") from self.last_exception
+        else:
+            await self.async_refresh()
+
+    async def async_load_snapshot(self) -> bool:
+        """Hydrate from the on-disk snapshot. Returns True if cached data was restored."""
+        try:
+            snapshot = await self._store.async_load()
+        except Exception as err:
+            _LOGGER.warning(f"[Ampster] Could not load cached snapshot for {self.feed_key}: {err}")
+            return False
+        if not snapshot or snapshot.get("feed") != self.feed_key or snapshot.get("data") is None:
+            return False
+        self.data = snapshot["data"]
+        self._diff_keys(self.data)
+        self._parse_payload(self.data)
+        self.last_update_success = True
+        self._serving_snapshot = True
+        self._validators = snapshot.get("validators") or {}
+        publications = snapshot.get("publications") or {}
+        if isinstance(publications, list):
+            # Older snapshots kept one list per coordinator; only a single-feed one can be attributed
+            publications = {self.url: publications} if self.feed_key == self.url else {}
+        for url, times in publications.items():
+            for published in times:
+                self._scheduler(url).record(published)
+        fetched_at = snapshot.get("fetched_at")
+        self.last_fetched = dt_util.parse_datetime(fetched_at) if fetched_at else None
+        _LOGGER.info(f"[Ampster] Restored cached snapshot for {self.feed_key} (fetched at {fetched_at})")
+        return True
+
+    def _snapshot_to_store(self):
+        return {
+            "feed": self.feed_key,
+            "fetched_at": self.last_fetched.isoformat() if self.last_fetched else None,
+            "validators": self._validators,
+            "publications": {url: scheduler.publications for url, scheduler in self.schedulers.items()},
+            "data": self.data,
+        }
 
     async def _scheduled_refresh(self, now):
-        _LOGGER.info(f"[Ampster] Scheduled refresh fired at {now.isoformat()} (should be every hour at minute={self.minute})")
+        if self._unsub_adaptive is not None:
+            _LOGGER.debug(f"[Ampster] Hourly refresh skipped, adaptive schedule is active for {self.feed_key}")
+            return
+        _LOGGER.info(f"[Ampster] Scheduled refresh fired at {now.isoformat()} (should be every hour at minute={self.minute}, second={self.second})")
         await self.async_request_refresh()
 
     async def async_shutdown(self):
         if self._unsub_timer:
             self._unsub_timer()
             self._unsub_timer = None
+        self._cancel_retry()
+        self._cancel_next_poll()
+        # The shared client session is owned by Home Assistant and must not be closed here
+        await super().async_shutdown()
+
+
+class AmpsterCoordinatorRegistry:
+    """Reference-counted coordinators shared by config entries that watch the same feed.
+
+    Stored in hass.data[DOMAIN][COORDINATOR_REGISTRY]; a coordinator is bound to no
+    config entry and is only shut down when the last entry using it releases it. The lock only guards the
+    bookkeeping: a coordinator's first refresh runs outside it, and entries sharing
+    that coordinator wait for it to finish.
+    """
+
+    def __init__(self):
+        self._coordinators = {}
+        self._refcounts = {}
+        # Feed key -> future resolved once the coordinator's first refresh has finished
+        self._ready = {}
+        self._lock = asyncio.Lock()
+
+    async def async_acquire(self, key, factory, minute=None, require_data: bool = True):
+        """Return the shared coordinator for feed key, building it with factory() only if needed."""
+        async with self._lock:
+            coordinator = self._coordinators.get(key)
+            if coordinator is not None:
+                self._refcounts[key] += 1
+                ready = self._ready[key]
+                _LOGGER.debug(f"[Ampster] Reusing coordinator for {key} ({self._refcounts[key]} users)")
+                if minute is not None and minute != coordinator.minute:
+                    _LOGGER.warning(f"[Ampster] {key} is already fetched at minute {coordinator.minute}, ignoring minute {minute}")
+            else:
+                # Build outside the calling entry's context, otherwise DataUpdateCoordinator ties its
+                # shutdown to that entry's unload and the other entries would keep a dead coordinator
+                token = current_entry.set(None)
+                try:
+                    coordinator = factory()
+                finally:
+                    current_entry.reset(token)
+                ready = asyncio.get_running_loop().create_future()
+                self._coordinators[key] = coordinator
+                self._refcounts[key] = 1
+                self._ready[key] = ready
+                ready = None
+        if ready is not None:
+            await ready
+            return coordinator
+        try:
+            await coordinator.async_initialize(require_data=require_data)
+        except Exception as err:
+            async with self._lock:
+                ready = self._ready.pop(key)
+                del self._coordinators[key]
+                del self._refcounts[key]
+            # Entries waiting for this coordinator fail the same way
+            ready.set_exception(err)
+            ready.exception()
+            await coordinator.async_shutdown()
+            raise
+        self._ready[key].set_result(None)
+        return coordinator
+
+    async def async_release(self, coordinator):
+        """Drop one reference; shut the coordinator down when nobody uses it any more."""
+        key = coordinator.feed_key
+        async with self._lock:
+            if self._coordinators.get(key) is not coordinator:
+                await coordinator.async_shutdown()
+                return
+            self._refcounts[key] -= 1
+            if self._refcounts[key] > 0:
+                return
+            del self._coordinators[key]
+            del self._refcounts[key]
+            del self._ready[key]
+        _LOGGER.debug(f"[Ampster] Shutting down coordinator for {key}")
+        await coordinator.async_shutdown()
+
+
+def get_coordinator_registry(hass) -> AmpsterCoordinatorRegistry:
+    """Return the domain-wide coordinator registry, creating it on first use."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if COORDINATOR_REGISTRY not in domain_data:
+        domain_data[COORDINATOR_REGISTRY] = AmpsterCoordinatorRegistry()
+    return domain_data[COORDINATOR_REGISTRY]
+
+
+class AmpsterMultiCountryCoordinator(AmpsterDataUpdateCoordinator):
+    """Fetches several country feeds concurrently into one result keyed by country.
+
+    Fetches run with bounded parallelism and a per-country timeout; a country that
+    fails or is too slow keeps its previous payload instead of failing the others.
+    The update only fails when every country failed.
+    """
+
+    def __init__(self, hass, countries, minute: int = DEFAULT_MINUTE, base_url: str = None):
+        base_url = base_url or BASE_URL
+        self.countries = [c for c in SUPPORTED_COUNTRIES if c in countries]
+        self.urls = {country: feed_url(base_url, country) for country in self.countries}
+        super().__init__(hass, url=base_url, country_prefix=self.countries[0] if self.countries else None, minute=minute, base_url=base_url)
+        self.name = "Ampster Multi-Country Coordinator"
+        self.series_by_country = {}
+
+    @property
+    def feed_key(self) -> str:
+        return multi_country_feed_key(self.countries, self.base_url)
+
+    def _snapshot_still_valid(self) -> bool:
+        now = time.time()
+        return any(series.index_at(now) >= 0 for series in self.series_by_country.values())
+
+    def _parse_payload(self, data):
+        self.series_by_country = {
+            country: PriceSeries.from_payload(payload, COUNTRY_TZ.get(country, DEFAULT_TZ))
+            for country, payload in data.items() if isinstance(payload, dict)
+        }
+
+    async def _async_fetch_country(self, semaphore, country):
+        async with semaphore:
+            return await asyncio.wait_for(self._async_fetch_json(self.urls[country]), COUNTRY_FETCH_TIMEOUT)
+
+    async def _async_fetch_feed(self):
+        semaphore = asyncio.Semaphore(MAX_PARALLEL_FETCHES)
+        results = await asyncio.gather(
+            *(self._async_fetch_country(semaphore, country) for country in self.countries),
+            return_exceptions=True,
+        )
+        previous = self.data or {}
+        data = {}
+        changed = False
+        failed = []
+        for country, result in zip(self.countries, results):
+            if isinstance(result, BaseException):
+                _LOGGER.warning(f"[Ampster] Data fetch for {country} failed: {result!r}")
+                failed.append(country)
+                if country in previous:
+                    data[country] = previous[country]
+            elif result is None:
+                if country in previous:
+                    data[country] = previous[country]
+            else:
+                data[country] = result
+                changed = True
+        if not data or len(failed) == len(self.countries):
+            # Falling back on every country's old payload would hide a total outage from the retry logic
+            raise UpdateFailed(f"Error fetching data for {', '.join(failed)}")
+        return data if changed else None
@@ -0,0 +1,56 @@
+"""
+JSON decoding for the Ampster feeds.
+
+Uses orjson when it is installed (Home Assistant ships it) and falls back to the
+stdlib decoder otherwise. Bodies are read with a hard size cap so an oversized
+feed is rejected before it is buffered, and large bodies are decoded in the
+executor to keep the event loop responsive on low-power hardware.
+"""
+import json
+import time
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+READ_CHUNK_SIZE = 64 * 1024
+
+DECODER_NAME = "orjson" if orjson is not None else "json"
+
+
+class PayloadTooLarge(Exception):
+    """Raised when a response body exceeds the configured size limit."""
+
+
+def loads(raw: bytes):
+    """Decode JSON bytes with the fastest available parser."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+async def async_read_body(response, max_bytes: int) -> bytes:
+    """Read a response body, refusing anything larger than max_bytes."""
+    length = response.content_length
+    if length is not None and length > max_bytes:
+        raise PayloadTooLarge(f"Content-Length {length} exceeds limit of {max_bytes} bytes")
+    body = bytearray()
+    async for chunk in response.content.iter_chunked(READ_CHUNK_SIZE):
+        body.extend(chunk)
+        if len(body) > max_bytes:
+            raise PayloadTooLarge(f"Body exceeds limit of {max_bytes} bytes")
+    return bytes(body)
+
+
+async def async_decode_json(hass, raw: bytes, executor_threshold: int):
+    """Decode raw JSON, in the executor when it is larger than executor_threshold.
+
+    Returns (data, decode_ms).
+    """
+    started = time.perf_counter()
+    if len(raw) > executor_threshold:
+        data = await hass.async_add_executor_job(loads, raw)
+    else:
+        data = loads(raw)
+    return data, (time.perf_counter() - started) * 1000
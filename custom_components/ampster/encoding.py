@@ -0,0 +1,99 @@
+"""
+Upload payload encoding and compression.
+
+The "json" encoding is the original {"timestamp", "sensors": {name: {"value",
+"attributes"}}} document. The "columnar" encoding carries the same batch as
+parallel arrays (entity names, values, attributes) with an epoch timestamp and
+numeric states sent as numbers, which removes the repeated per-sensor keys.
+Bodies can be gzip or zstd compressed (zstd needs the zstandard package and
+falls back to gzip without it).
+"""
+import datetime
+import gzip
+import json
+import math
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+ENCODING_JSON = "json"
+ENCODING_COLUMNAR = "columnar"
+
+COMPRESSION_NONE = "none"
+COMPRESSION_GZIP = "gzip"
+COMPRESSION_ZSTD = "zstd"
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def dumps(data) -> bytes:
+    """Compact JSON bytes with the fastest available serializer."""
+    if orjson is not None:
+        return orjson.dumps(data, default=str)
+    return json.dumps(data, separators=(",", ":"), default=str).encode()
+
+
+def _epoch(timestamp):
+    try:
+        return round(datetime.datetime.fromisoformat(timestamp).timestamp(), 3)
+    except (TypeError, ValueError):
+        return timestamp
+
+
+def _compact_value(value):
+    """Numeric states as numbers, everything else unchanged."""
+    if isinstance(value, str):
+        try:
+            number = float(value)
+        except ValueError:
+            return value
+        if math.isfinite(number):
+            return int(value) if value.strip().lstrip("+-").isdigit() else number
+    return value
+
+
+def to_columnar(data):
+    """Columnar form of an upload batch: parallel entity/value/attribute arrays."""
+    sensors = data.get("sensors", {})
+    columnar = {
+        "ts": _epoch(data.get("timestamp")),
+        "entities": list(sensors),
+        "values": [_compact_value(entry.get("value")) for entry in sensors.values()],
+    }
+    # Omitted when no entry has attributes; null for entries without them
+    if any("attributes" in entry for entry in sensors.values()):
+        columnar["attributes"] = [entry.get("attributes") for entry in sensors.values()]
+    for key, value in data.items():
+        if key not in ("timestamp", "sensors"):
+            columnar[key] = value
+    return columnar
+
+
+def compression_available(compression: str) -> bool:
+    return compression != COMPRESSION_ZSTD or zstandard is not None
+
+
+def encode_payload(data, encoding: str = ENCODING_JSON):
+    """Serialize an upload batch. Returns (body, headers)."""
+    headers = {"Content-Type": "application/json"}
+    if encoding == ENCODING_COLUMNAR:
+        data = to_columnar(data)
+        headers["X-Ampster-Encoding"] = ENCODING_COLUMNAR
+    return dumps(data), headers
+
+
+def compress(body: bytes, compression: str = COMPRESSION_NONE):
+    """Compress a body. Returns (body, content_encoding or None)."""
+    if compression == COMPRESSION_ZSTD and zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body), "zstd"
+    if compression in (COMPRESSION_GZIP, COMPRESSION_ZSTD):
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0), "gzip"
+    return body, None
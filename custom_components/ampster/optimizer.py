@@ -0,0 +1,77 @@
+"""
+Battery charge/discharge schedule optimizer.
+
+Dynamic programming over a discretized state of charge: for every period and
+every SoC level it keeps the cheapest cost-to-go, where moving between levels
+costs the energy bought (or earns the energy sold) at that period's price.
+Energy left in the battery at the end is valued at terminal_price, so the plan
+does not simply empty the battery on the last period.
+"""
+import math
+
+ACTION_CHARGE = "charge"
+ACTION_IDLE = "idle"
+ACTION_DISCHARGE = "discharge"
+
+
+def plan_battery(prices, period_hours: float, capacity_kwh: float, soc_kwh: float,
+                 max_charge_kw: float, max_discharge_kw: float, efficiency: float = 0.9,
+                 min_soc_kwh: float = 0.0, max_soc_kwh: float = None, steps: int = 20,
+                 terminal_price: float = None):
+    """Cheapest schedule over prices (per kWh, one per period).
+
+    efficiency is the round-trip efficiency, split evenly between charging and
+    discharging. Power limits apply on the grid side. Returns a dict with the
+    per-period "actions" (action, grid_kwh, soc_kwh) and the total "cost"
+    (energy bought minus energy sold minus the value of the final charge).
+    """
+    if max_soc_kwh is None:
+        max_soc_kwh = capacity_kwh
+    if not prices or steps < 1 or max_soc_kwh <= min_soc_kwh:
+        return {"actions": [], "cost": 0.0}
+    if terminal_price is None:
+        terminal_price = sum(prices) / len(prices)
+
+    step_kwh = (max_soc_kwh - min_soc_kwh) / steps
+    one_way = math.sqrt(efficiency)
+    # Largest SoC move per period allowed by the power limits
+    max_up = int(max_charge_kw * period_hours * one_way / step_kwh + 1e-9)
+    max_down = int(max_discharge_kw * period_hours / one_way / step_kwh + 1e-9)
+    start = min(steps, max(0, round((soc_kwh - min_soc_kwh) / step_kwh)))
+
+    # Grid energy for a move of k levels: buy k*step/eff when charging, sell k*step*eff when discharging
+    grid_for_move = {k: (k * step_kwh / one_way if k > 0 else k * step_kwh * one_way)
+                     for k in range(-max_down, max_up + 1)}
+
+    # cost_to_go[level] for the period after the last: minus the value of the stored energy
+    cost_to_go = [-(min_soc_kwh + level * step_kwh) * one_way * terminal_price for level in range(steps + 1)]
+    choices = []
+    for price in reversed(prices):
+        new_cost = [0.0] * (steps + 1)
+        choice = [0] * (steps + 1)
+        for level in range(steps + 1):
+            best_cost = math.inf
+            best_move = 0
+            low = max(-max_down, -level)
+            high = min(max_up, steps - level)
+            for move in range(low, high + 1):
+                cost = price * grid_for_move[move] + cost_to_go[level + move]
+                # Prefer idling on ties so the plan doesn't cycle the battery for nothing
+                if cost < best_cost - 1e-12 or (move == 0 and cost <= best_cost + 1e-12):
+                    best_cost = cost
+                    best_move = move
+            new_cost[level] = best_cost
+            choice[level] = best_move
+        cost_to_go = new_cost
+        choices.append(choice)
+    choices.reverse()
+
+    actions = []
+    level = start
+    for choice in choices:
+        move = choice[level]
+        level += move
+        action = ACTION_CHARGE if move > 0 else ACTION_DISCHARGE if move < 0 else ACTION_IDLE
+        actions.append((action, grid_for_move[move], min_soc_kwh + level * step_kwh))
+    cost = sum(price * grid for price, (_, grid, _) in zip(prices, actions))
+    return {"actions": actions, "cost": cost - (actions[-1][2] * one_way * terminal_price)}
@@ -0,0 +1,129 @@
+"""
+Compact, indexed price series parsed once per fetch from the Ampster payload.
+
+Period starts are kept as sorted epoch seconds in an array so "price at time t"
+and "current/next period" are O(log n) bisect lookups instead of re-walking the
+raw JSON and re-parsing ISO strings in every consumer.
+"""
+import datetime
+from array import array
+from bisect import bisect_right
+
+PRICE_SERIES_KEY = "hourly_prices"
+DEFAULT_PERIOD_SECONDS = 3600
+
+
+class PricePeriod:
+    """One period of the series: start/end as epoch seconds and its all-in price."""
+
+    __slots__ = ("start", "end", "price")
+
+    def __init__(self, start: float, end: float, price: float):
+        self.start = start
+        self.end = end
+        self.price = price
+
+    def start_datetime(self, tz=datetime.timezone.utc) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp(self.start, tz)
+
+    def __repr__(self):
+        return f"PricePeriod(start={self.start}, end={self.end}, price={self.price})"
+
+
+def _parse_timestamp(value, tz):
+    """Parse an ISO timestamp to epoch seconds; naive values are localized to tz."""
+    if not value:
+        return None
+    try:
+        dt = datetime.datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = tz.localize(dt) if hasattr(tz, "localize") else dt.replace(tzinfo=tz)
+    return dt.timestamp()
+
+
+def _to_timestamp(when) -> float:
+    return when.timestamp() if isinstance(when, datetime.datetime) else float(when)
+
+
+class PriceSeries:
+    """Sorted period starts and float prices with bisect-based lookups."""
+
+    __slots__ = ("starts", "prices", "period_seconds", "current_period_start")
+
+    def __init__(self, starts, prices, period_seconds: float = DEFAULT_PERIOD_SECONDS, current_period_start: float = None):
+        self.starts = array("d", starts)
+        self.prices = array("d", prices)
+        self.period_seconds = period_seconds
+        self.current_period_start = current_period_start
+
+    @classmethod
+    def from_payload(cls, payload, tz=datetime.timezone.utc) -> "PriceSeries":
+        """Build the series from the payload's hourly_prices list ({"period", "price": {"all_in_price"}})."""
+        pairs = []
+        entries = payload.get(PRICE_SERIES_KEY) if isinstance(payload, dict) else None
+        for entry in entries or []:
+            if not isinstance(entry, dict):
+                continue
+            start = _parse_timestamp(entry.get("period"), tz)
+            price = entry.get("price")
+            if isinstance(price, dict):
+                price = price.get("all_in_price")
+            try:
+                price = float(price)
+            except (TypeError, ValueError):
+                continue
+            if start is not None:
+                pairs.append((start, price))
+        pairs.sort()
+        period_seconds = DEFAULT_PERIOD_SECONDS
+        gaps = [b[0] - a[0] for a, b in zip(pairs, pairs[1:]) if b[0] > a[0]]
+        if gaps:
+            period_seconds = min(gaps)
+        current_period_start = _parse_timestamp(payload.get("current_period"), tz) if isinstance(payload, dict) else None
+        return cls(
+            [start for start, _ in pairs],
+            [price for _, price in pairs],
+            period_seconds,
+            current_period_start,
+        )
+
+    def __len__(self):
+        return len(self.starts)
+
+    def period(self, index: int) -> PricePeriod:
+        start = self.starts[index]
+        return PricePeriod(start, start + self.period_seconds, self.prices[index])
+
+    def index_at(self, when) -> int:
+        """Index of the period containing when, or -1 if it is outside the series."""
+        ts = _to_timestamp(when)
+        index = bisect_right(self.starts, ts) - 1
+        if index < 0 or ts >= self.starts[index] + self.period_seconds:
+            return -1
+        return index
+
+    def price_at(self, when):
+        index = self.index_at(when)
+        return self.prices[index] if index >= 0 else None
+
+    def current(self, when):
+        index = self.index_at(when)
+        return self.period(index) if index >= 0 else None
+
+    def next(self, when):
+        """The first period starting after when, or None."""
+        index = bisect_right(self.starts, _to_timestamp(when))
+        return self.period(index) if index < len(self.starts) else None
+
+    def start_index(self, when) -> int:
+        """Index of the period containing when, else of the next one (len(self) if none)."""
+        ts = _to_timestamp(when)
+        index = self.index_at(ts)
+        return index if index >= 0 else bisect_right(self.starts, ts)
+
+    def upcoming(self, when, count: int):
+        """Up to count periods starting with the one containing when (or the next one)."""
+        index = self.start_index(when)
+        return [self.period(i) for i in range(index, min(index + count, len(self.starts)))]
@@ -0,0 +1,85 @@
+"""
+Attribute projection for uploaded entities.
+
+Allow and deny lists are comma separated; an entry is either an attribute name
+(applies to every entity) or "sensor_name:attribute" (applies to that configured
+upload name only, and a per-entity allow-list replaces the global one). The rules
+are compiled once per name into frozensets, so projecting an entity's attributes
+is a set lookup per attribute. Attribute values larger than max_bytes (UTF-8
+encoded) are truncated (strings) or omitted and listed under "_omitted".
+"""
+from .encoding import dumps
+
+OMITTED_KEY = "_omitted"
+
+
+def parse_attribute_rules(text: str):
+    """Split "attr, name:attr" rules into (global set, {name: set})."""
+    global_rules = set()
+    per_entity = {}
+    for rule in (text or "").split(","):
+        rule = rule.strip()
+        if not rule:
+            continue
+        name, sep, attribute = rule.rpartition(":")
+        if sep and name.strip() and attribute.strip():
+            per_entity.setdefault(name.strip(), set()).add(attribute.strip())
+        else:
+            global_rules.add(rule)
+    return global_rules, per_entity
+
+
+class AttributeProjection:
+    """Precompiled allow/deny lists, value-only mode and size cap for a set of upload names."""
+
+    def __init__(self, names, allow: str = "", deny: str = "", values_only: bool = False, max_bytes: int = 0):
+        self.values_only = values_only
+        self.max_bytes = max_bytes
+        global_allow, entity_allow = parse_attribute_rules(allow)
+        global_deny, entity_deny = parse_attribute_rules(deny)
+        # name -> (allowed attributes or None for all, denied attributes)
+        self._rules = {}
+        for name in names:
+            allowed = entity_allow.get(name, global_allow) or None
+            denied = frozenset(global_deny | entity_deny.get(name, set()))
+            self._rules[name] = (frozenset(allowed - denied) if allowed is not None else None, denied)
+
+    def project(self, name, attributes):
+        """The attributes to upload for name, or None in value-only mode."""
+        if self.values_only:
+            return None
+        allowed, denied = self._rules.get(name, (None, frozenset()))
+        if allowed is not None:
+            projected = {key: attributes[key] for key in allowed if key in attributes}
+        elif denied:
+            projected = {key: value for key, value in attributes.items() if key not in denied}
+        else:
+            projected = dict(attributes)
+        if self.max_bytes:
+            self._cap(projected)
+        return projected
+
+    def _cap(self, attributes):
+        omitted = []
+        for key, value in list(attributes.items()):
+            if isinstance(value, str):
+                encoded = value.encode()
+                if len(encoded) > self.max_bytes:
+                    # Cut on the UTF-8 bytes, dropping a code point split at the cut
+                    attributes[key] = encoded[:self.max_bytes].decode(errors="ignore")
+            elif isinstance(value, (list, tuple, dict)) and len(dumps(value)) > self.max_bytes:
+                del attributes[key]
+                omitted.append(key)
+        if omitted:
+            attributes[OMITTED_KEY] = omitted
+
+    def attributes_changed(self, name, old_attributes, new_attributes) -> bool:
+        """Whether the uploaded attributes of name differ between two states."""
+        if self.values_only:
+            return False
+        if old_attributes == new_attributes:
+            return False
+        allowed, denied = self._rules.get(name, (None, frozenset()))
+        if allowed is None and not denied:
+            return True
+        return self.project(name, old_attributes) != self.project(name, new_attributes)
@@ -0,0 +1,64 @@
+"""
+Fixed-size ring buffer of numeric samples for the uploader.
+
+One array of epoch timestamps plus one float array per entity, all allocated up
+front, so memory is capacity * (entities + 1) * 8 bytes no matter how long
+shipping is delayed; when full the oldest sample is overwritten. Non-numeric or
+missing states are stored as NaN and shipped as null.
+"""
+import math
+from array import array
+
+NAN = float("nan")
+
+
+def numeric_state(value) -> float:
+    """A state as a float, NaN when it is not a finite number."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return NAN
+    return number if math.isfinite(number) else NAN
+
+
+class SampleBuffer:
+    """Ring buffer of (timestamp, one value per name) samples."""
+
+    def __init__(self, names, capacity: int):
+        self.names = list(names)
+        self.capacity = max(1, capacity)
+        self._timestamps = array("d", [0.0]) * self.capacity
+        self._values = [array("d", [NAN]) * self.capacity for _ in self.names]
+        self._start = 0
+        self._count = 0
+        self.overwritten = 0
+
+    def __len__(self):
+        return self._count
+
+    def add(self, timestamp: float, values):
+        """Append one sample; values are aligned with names."""
+        slot = (self._start + self._count) % self.capacity
+        if self._count == self.capacity:
+            # Full: overwrite the oldest sample
+            self._start = (self._start + 1) % self.capacity
+            self.overwritten += 1
+        else:
+            self._count += 1
+        self._timestamps[slot] = timestamp
+        for row, value in zip(self._values, values):
+            row[slot] = value
+
+    def drain(self):
+        """All samples, oldest first, as {"timestamps": [...], "values": {name: [...]}}; empties the buffer."""
+        slots = [(self._start + i) % self.capacity for i in range(self._count)]
+        samples = {
+            "timestamps": [round(self._timestamps[slot], 3) for slot in slots],
+            "values": {
+                name: [None if math.isnan(row[slot]) else row[slot] for slot in slots]
+                for name, row in zip(self.names, self._values)
+            },
+        }
+        self._start = 0
+        self._count = 0
+        return samples
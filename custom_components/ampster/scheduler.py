@@ -0,0 +1,62 @@
+"""
+Publication-aware polling for the Ampster feeds.
+
+Learns when the upstream file is published from the Last-Modified header (or the
+payload timestamp) of successive versions, then polls right after the expected
+publication, densely while a publication is due and rarely the rest of the time.
+Until the cadence is known the coordinator keeps its fixed hourly schedule.
+"""
+import statistics
+
+
+class PublicationScheduler:
+    """Estimates the publish cadence and decides when to poll next (all times epoch seconds)."""
+
+    def __init__(self, window: float = 1800, dense_interval: float = 60, idle_interval: float = 10800,
+                 grace: float = 30, max_history: int = 8, min_gap: float = 60):
+        self.window = window
+        self.dense_interval = dense_interval
+        self.idle_interval = idle_interval
+        self.grace = grace
+        self.max_history = max_history
+        self.min_gap = min_gap
+        self.publications = []
+
+    def record(self, published: float) -> bool:
+        """Record a publication time. Returns False if it is not newer than the last one."""
+        if self.publications and published < self.publications[-1] + self.min_gap:
+            return False
+        self.publications.append(published)
+        del self.publications[:-self.max_history]
+        return True
+
+    @property
+    def interval(self):
+        """Median gap between publications, or None until at least two gaps were seen."""
+        if len(self.publications) < 3:
+            return None
+        gaps = [b - a for a, b in zip(self.publications, self.publications[1:])]
+        return statistics.median(gaps)
+
+    def expected_publication(self, now: float):
+        """The next publication not yet seen whose dense window has not passed, or None."""
+        interval = self.interval
+        if interval is None:
+            return None
+        expected = self.publications[-1] + interval
+        if expected + self.window < now:
+            # Skip cycles whose window we already missed
+            expected += ((now - expected - self.window) // interval + 1) * interval
+        return expected
+
+    def next_poll(self, now: float):
+        """When to poll next, or None if the cadence is unknown."""
+        expected = self.expected_publication(now)
+        if expected is None:
+            return None
+        if now < expected + self.grace:
+            candidate = expected + self.grace
+        else:
+            # Inside the publication window and the new file has not shown up yet
+            candidate = now + self.dense_interval
+        return min(candidate, now + self.idle_interval)
@@ -1,79 +1,240 @@
 """
 Ampster sensor platform to expose fetched JSON data as sensors.
 """
-from homeassistant.components.sensor import SensorEntity
+import datetime
+import logging
+from homeassistant.components.sensor import SensorDeviceClass, SensorEntity
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.event import async_track_point_in_utc_time
+from homeassistant.util import dt as dt_util
 
-from .const import DOMAIN
+from .analytics import AnalyticsCache
+from .const import DOMAIN, DEFAULT_SUMMARY_SIZE, DEFAULT_ANALYTICS_WINDOWS, DEFAULT_BLOCK_SIZES, KEY_SENSOR_REMOVE_AFTER
+from .automation import calculate_hoarding_periods_remaining
+from .coordinator import COUNTRY_TZ, DEFAULT_TZ, summarize_value
+from .prices import PRICE_SERIES_KEY
+
+_LOGGER = logging.getLogger(__name__)
+
+def _item_number(item):
+    """Numeric value of a list item: the number itself or a price entry's all-in price."""
+    if isinstance(item, dict):
+        item = item.get("price", item.get("all_in_price"))
+        if isinstance(item, dict):
+            item = item.get("all_in_price")
+    if isinstance(item, bool):
+        return None
+    return item if isinstance(item, (int, float)) else None
+
+def project_value(value, summary_size, start: int = 0):
+    """Small, recorder-friendly summary of a list or dict payload value.
+
+    For lists "next" holds summary_size items from index start (the current period
+    for the price list). The full value is not stored as an attribute; fetch it on demand with the
+    ampster.get_value service.
+    """
+    if isinstance(value, list):
+        attributes = {"count": len(value)}
+        numbers = [n for n in map(_item_number, value) if n is not None]
+        if numbers:
+            attributes["min"] = min(numbers)
+            attributes["max"] = max(numbers)
+        if summary_size:
+            attributes["next"] = value[start:start + summary_size]
+        return attributes
+    if isinstance(value, dict):
+        attributes = {"count": len(value)}
+        if summary_size:
+            attributes["keys"] = list(value)[:summary_size]
+        return attributes
+    return {}
+
+def _parse_sizes(text):
+    """Parse a comma separated list of period counts, ignoring invalid entries."""
+    sizes = []
+    for part in str(text or "").split(","):
+        part = part.strip()
+        if part.isdigit() and int(part) > 0 and int(part) not in sizes:
+            sizes.append(int(part))
+    return sizes
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback):
     coordinator = hass.data[DOMAIN][entry.entry_id]
+    summary_size = entry.options.get("summary_size") if entry.options.get("summary_size") is not None else entry.data.get("summary_size", DEFAULT_SUMMARY_SIZE)
     entities = []
 
     # Expose all top-level keys in the fetched JSON as sensors
-    if coordinator.data:
-        for key, value in coordinator.data.items():
-            entities.append(AmpsterSensor(coordinator, key, value))
+    key_sensors = KeySensorManager(hass, coordinator, async_add_entities, summary_size)
+    entities.extend(key_sensors.sensors.values())
     
-    # Add the custom hoarding periods remaining sensor
-    entities.append(AmpsterHoardingPeriodsRemainingSensor(hass, coordinator)) # Pass coordinator
+    # Sensors derived from the price series and the cached category thresholds
+    thresholds = hass.data[DOMAIN][f"{entry.entry_id}_thresholds"]
+    entities.append(AmpsterHoardingPeriodsRemainingSensor(hass, coordinator, thresholds))
+    entities.append(AmpsterPriceCategorySensor(hass, coordinator, thresholds, summary_size))
+
+    # Rolling-window analytics, computed once per price series and shared by these sensors
+    analytics_windows = entry.options.get("analytics_windows") if entry.options.get("analytics_windows") is not None else entry.data.get("analytics_windows", DEFAULT_ANALYTICS_WINDOWS)
+    block_sizes = entry.options.get("block_sizes") if entry.options.get("block_sizes") is not None else entry.data.get("block_sizes", DEFAULT_BLOCK_SIZES)
+    analytics = AnalyticsCache(_parse_sizes(analytics_windows), _parse_sizes(block_sizes))
+    for size in analytics.windows:
+        entities.append(AmpsterPriceWindowSensor(hass, coordinator, thresholds, analytics, size))
+    for size in analytics.block_sizes:
+        entities.append(AmpsterCheapestBlockSensor(hass, coordinator, thresholds, analytics, size))
     entities.append(AmpsterStatic42Sensor(hass, coordinator))
+    entities.append(AmpsterFeedStatusSensor(coordinator))
+
+    # One current-price sensor per country when multi-country comparison is enabled
+    countries_coordinator = hass.data[DOMAIN].get(f"{entry.entry_id}_countries")
+    if countries_coordinator:
+        for country in countries_coordinator.countries:
+            entities.append(AmpsterCountryPriceSensor(countries_coordinator, country))
 
     async_add_entities(entities)
 
-class AmpsterSensor(SensorEntity):
-    def __init__(self, coordinator, key, value):
+    entry.async_on_unload(coordinator.async_add_listener(key_sensors.async_sync))
+
+class KeySensorManager:
+    """One AmpsterSensor per top-level payload key.
+
+    Sensors for new keys are added as they appear. A sensor whose key is missing is
+    unavailable, and is only removed (with its registry entry) once the key has been
+    absent from KEY_SENSOR_REMOVE_AFTER consecutive payloads.
+    """
+
+    def __init__(self, hass, coordinator, async_add_entities, summary_size=DEFAULT_SUMMARY_SIZE):
+        self.hass = hass
+        self.coordinator = coordinator
+        self._async_add_entities = async_add_entities
+        self._summary_size = summary_size
+        self.sensors = {
+            key: AmpsterSensor(coordinator, key, value, summary_size)
+            for key, value in (coordinator.data or {}).items()
+        }
+        # Key -> number of consecutive payloads it was missing from
+        self._missing = {}
+        self._last_data = coordinator.data
+
+    @callback
+    def async_sync(self):
+        """Add sensors for new payload keys and remove those gone for long enough, in one batch."""
+        data = self.coordinator.data or {}
+        if not self.coordinator.last_update_success or data is self._last_data:
+            return
+        self._last_data = data
+        added = [AmpsterSensor(self.coordinator, key, data[key], self._summary_size) for key in data if key not in self.sensors]
+        removed = []
+        for key in self.sensors:
+            if key in data:
+                self._missing.pop(key, None)
+                continue
+            self._missing[key] = self._missing.get(key, 0) + 1
+            if self._missing[key] >= KEY_SENSOR_REMOVE_AFTER:
+                removed.append(key)
+        registry = er.async_get(self.hass)
+        for key in removed:
+            sensor = self.sensors.pop(key)
+            del self._missing[key]
+            entity_id = registry.async_get_entity_id("sensor", DOMAIN, sensor.unique_id)
+            if entity_id:
+                # Removing the registry entry also removes the entity from the state machine
+                registry.async_remove(entity_id)
+            else:
+                self.hass.async_create_task(sensor.async_remove())
+        for sensor in added:
+            self.sensors[sensor._key] = sensor
+        if added:
+            self._async_add_entities(added)
+        if added or removed:
+            _LOGGER.info(f"[Ampster] Payload keys changed: added {[s._key for s in added]}, removed {removed}")
+
+class PeriodRolloverMixin:
+    """Calls _handle_update again when the next price period starts."""
+    _unsub_rollover = None
+
+    @callback
+    def _schedule_rollover(self, start):
+        """Schedule the rollover at start (epoch seconds), replacing any pending one; None just cancels."""
+        self._cancel_rollover()
+        if start is not None:
+            self._unsub_rollover = async_track_point_in_utc_time(
+                self.hass, self._handle_rollover, dt_util.utc_from_timestamp(start)
+            )
+
+    @callback
+    def _handle_rollover(self, now):
+        self._unsub_rollover = None
+        self._handle_update()
+
+    @callback
+    def _cancel_rollover(self):
+        if self._unsub_rollover:
+            self._unsub_rollover()
+            self._unsub_rollover = None
+
+class AmpsterSensor(PeriodRolloverMixin, SensorEntity):
+    _attr_should_poll = False
+
+    def __init__(self, coordinator, key, value, summary_size=DEFAULT_SUMMARY_SIZE):
         self.coordinator = coordinator
         self._key = key
+        self._summary_size = summary_size
         self._attr_name = f"Ampster {key}"
         self._attr_unique_id = f"ampster_{key}"
         # Only set the state to a short value (max 255 chars)
-        if isinstance(value, (str, int, float)) and len(str(value)) <= 255:
-            self._attr_native_value = value
-        else:
-            # For long or complex values, set a summary or count
-            if isinstance(value, dict):
-                self._attr_native_value = f"dict ({len(value)})"
-            elif isinstance(value, list):
-                self._attr_native_value = f"list ({len(value)})"
-            else:
-                self._attr_native_value = str(value)[:255]
-        self._attr_extra_state_attributes = {"full_value": value} if isinstance(value, (dict, list)) else {}
+        self._attr_native_value = summarize_value(value)
+        self._attr_extra_state_attributes = project_value(value, summary_size)
+
+    async def async_added_to_hass(self) -> None:
+        """Only write state when this sensor's key changed in the payload, or the price list rolls over."""
+        self.async_on_remove(
+            self.coordinator.async_add_key_listener(self._key, self._handle_update)
+        )
+        self.async_on_remove(self._cancel_rollover)
+        self._update_attributes()
+
+    @callback
+    def _handle_update(self):
+        self._update_attributes()
+        self.async_write_ha_state()
+
+    @callback
+    def _update_attributes(self):
+        """Project the payload value; the price list's "next" starts at the current period of the series."""
+        value = (self.coordinator.data or {}).get(self._key)
+        start, next_period = 0, None
+        series = self.coordinator.series
+        # The series has one period per price entry, in order, unless some entries were unparseable
+        if self._key == PRICE_SERIES_KEY and isinstance(value, list) and len(series) == len(value):
+            now = dt_util.utcnow()
+            start = series.start_index(now)
+            next_period = series.next(now)
+        self._schedule_rollover(next_period.start if next_period is not None else None)
+        self._attr_extra_state_attributes = project_value(value, self._summary_size, start)
 
     @property
     def available(self) -> bool:
-        """Return if entity is available."""
-        return self.coordinator.last_update_success
+        """Unavailable while the update failed or the key is missing from the payload."""
+        return self.coordinator.last_update_success and self._key in (self.coordinator.data or {})
 
     @property
     def native_value(self):
-        value = self.coordinator.data.get(self._key)
-        if isinstance(value, (str, int, float)) and len(str(value)) <= 255:
-            return value
-        elif isinstance(value, dict):
-            return f"dict ({len(value)})"
-        elif isinstance(value, list):
-            return f"list ({len(value)})"
-        else:
-            return str(value)[:255]
+        # Summarized once per payload by the coordinator
+        return self.coordinator.values.get(self._key)
 
-    @property
-    def extra_state_attributes(self):
-        value = self.coordinator.data.get(self._key)
-        if isinstance(value, (dict, list)):
-            return {"full_value": value}
-        return {}
+class AmpsterPriceSeriesSensor(PeriodRolloverMixin, SensorEntity):
+    """Base for sensors derived from the price series and the category thresholds.
 
-class AmpsterHoardingPeriodsRemainingSensor(SensorEntity):
-    _attr_name = "Ampster Hoarding Periods Remaining"
-    _attr_unique_id = "ampster_hoarding_periods_remaining"
+    Recalculates on coordinator updates, threshold changes and at every period rollover.
+    """
     _attr_should_poll = False
 
-    def __init__(self, hass, coordinator):
+    def __init__(self, hass, coordinator, thresholds):
         self.hass = hass
         self.coordinator = coordinator
+        self.thresholds = thresholds
         self._attr_device_info = {
             "identifiers": {(DOMAIN, coordinator.country_prefix)},
             "name": "Ampster",
@@ -82,21 +243,117 @@ class AmpsterHoardingPeriodsRemainingSensor(SensorEntity):
         }
 
     async def async_added_to_hass(self) -> None:
-        """Connect to coordinator for updates."""
         self.async_on_remove(
-            self.coordinator.async_add_listener(self.async_write_ha_state)
+            self.coordinator.async_add_listener(self._handle_update)
+        )
+        self.async_on_remove(
+            self.thresholds.async_add_listener(self._handle_update)
         )
+        self.async_on_remove(self._cancel_rollover)
+        self._recalculate_and_schedule_rollover()
 
     @property
     def available(self) -> bool:
         """Return if entity is available."""
         return self.coordinator.last_update_success
 
-    async def async_update(self):
-        from .automation import calculate_hoarding_periods_remaining
-        # Make sure to pass hass to the calculation function if it needs it
-        # and potentially other data from the coordinator if required
-        self._attr_native_value = await calculate_hoarding_periods_remaining(self.hass)
+    @callback
+    def _handle_update(self):
+        self._recalculate_and_schedule_rollover()
+        self.async_write_ha_state()
+
+    @callback
+    def _recalculate_and_schedule_rollover(self):
+        series = self.coordinator.series
+        now = dt_util.utcnow()
+        self._recalculate(series, now, COUNTRY_TZ.get(self.coordinator.country_prefix, DEFAULT_TZ))
+        next_period = series.next(now)
+        self._schedule_rollover(next_period.start if next_period is not None else None)
+
+    def _recalculate(self, series, now, tz):
+        """Update the state and attributes from the series; subclasses override this."""
+
+class AmpsterHoardingPeriodsRemainingSensor(AmpsterPriceSeriesSensor):
+    _attr_name = "Ampster Hoarding Periods Remaining"
+    _attr_unique_id = "ampster_hoarding_periods_remaining"
+
+    def _recalculate(self, series, now, tz):
+        self._attr_native_value = calculate_hoarding_periods_remaining(series, self.thresholds, now, tz)
+
+class AmpsterPriceCategorySensor(AmpsterPriceSeriesSensor):
+    """Category of the current price, with the categories of the upcoming periods."""
+    _attr_name = "Ampster Price Category"
+    _attr_unique_id = "ampster_price_category"
+
+    def __init__(self, hass, coordinator, thresholds, summary_size=DEFAULT_SUMMARY_SIZE):
+        super().__init__(hass, coordinator, thresholds)
+        self._summary_size = summary_size
+
+    def _recalculate(self, series, now, tz):
+        periods = series.upcoming(now, len(series))
+        categories = self.thresholds.categorise_many([period.price for period in periods])
+        self._attr_native_value = categories[0] if categories else None
+        counts = {}
+        for category in categories:
+            counts[category] = counts.get(category, 0) + 1
+        self._attr_extra_state_attributes = {
+            "counts": counts,
+            "next": [
+                {"start": period.start_datetime(tz).isoformat(), "category": category}
+                for period, category in zip(periods[:self._summary_size], categories)
+            ],
+        }
+
+class AmpsterPriceWindowSensor(AmpsterPriceSeriesSensor):
+    """Mean price of the next N periods, with their min and max (replaces max/mean template sensors)."""
+
+    def __init__(self, hass, coordinator, thresholds, analytics, size):
+        super().__init__(hass, coordinator, thresholds)
+        self._analytics = analytics
+        self._size = size
+        self._attr_name = f"Ampster Next {size} Periods"
+        self._attr_unique_id = f"ampster_next_{size}_periods"
+
+    def _recalculate(self, series, now, tz):
+        stats = self._analytics.get(series).window(series.start_index(now), self._size)
+        if stats is None:
+            self._attr_native_value = None
+            self._attr_extra_state_attributes = {}
+            return
+        self._attr_native_value = round(stats["mean"], 5)
+        self._attr_extra_state_attributes = {
+            "min": stats["min"],
+            "min_start": series.period(stats["min_index"]).start_datetime(tz).isoformat(),
+            "max": stats["max"],
+            "max_start": series.period(stats["max_index"]).start_datetime(tz).isoformat(),
+        }
+
+class AmpsterCheapestBlockSensor(AmpsterPriceSeriesSensor):
+    """Start of the cheapest block of N consecutive periods ahead, with the most expensive block as attributes."""
+    _attr_device_class = SensorDeviceClass.TIMESTAMP
+
+    def __init__(self, hass, coordinator, thresholds, analytics, size):
+        super().__init__(hass, coordinator, thresholds)
+        self._analytics = analytics
+        self._size = size
+        self._attr_name = f"Ampster Cheapest {size} Period Block"
+        self._attr_unique_id = f"ampster_cheapest_{size}_period_block"
+
+    def _recalculate(self, series, now, tz):
+        analytics = self._analytics.get(series)
+        index = series.start_index(now)
+        cheapest = analytics.block(index, self._size)
+        dearest = analytics.block(index, self._size, cheapest=False)
+        self._attr_native_value = series.period(cheapest["start_index"]).start_datetime(tz) if cheapest else None
+        attributes = {}
+        if cheapest:
+            attributes["mean"] = round(cheapest["mean"], 5)
+            last = series.period(cheapest["start_index"] + self._size - 1)
+            attributes["end"] = datetime.datetime.fromtimestamp(last.end, tz).isoformat()
+        if dearest:
+            attributes["most_expensive_start"] = series.period(dearest["start_index"]).start_datetime(tz).isoformat()
+            attributes["most_expensive_mean"] = round(dearest["mean"], 5)
+        self._attr_extra_state_attributes = attributes
 
 class AmpsterStatic42Sensor(SensorEntity):
     _attr_name = "Ampster Static 42"
@@ -127,4 +384,82 @@ class AmpsterStatic42Sensor(SensorEntity):
         # In the future, you can access other states via self.hass.states.get(...)
         self._attr_native_value = 42
 
+class AmpsterFeedStatusSensor(SensorEntity):
+    """Circuit breaker state of the price feed fetches (closed, open or half_open)."""
+    _attr_name = "Ampster Feed Status"
+    _attr_unique_id = "ampster_feed_status"
+    _attr_should_poll = False
+
+    def __init__(self, coordinator):
+        self.coordinator = coordinator
+        self._attr_device_info = {
+            "identifiers": {(DOMAIN, coordinator.country_prefix)},
+            "name": "Ampster",
+            "manufacturer": "Ampster",
+            "entry_type": "service",
+        }
+
+    async def async_added_to_hass(self) -> None:
+        self.async_on_remove(
+            self.coordinator.async_add_listener(self.async_write_ha_state)
+        )
+
+    @property
+    def native_value(self):
+        return self.coordinator.circuit_breaker.state
+
+    @property
+    def extra_state_attributes(self):
+        breaker = self.coordinator.circuit_breaker
+        return {
+            "consecutive_failures": breaker.consecutive_failures,
+            "retry_in": round(breaker.retry_in),
+            "last_fetched": self.coordinator.last_fetched.isoformat() if self.coordinator.last_fetched else None,
+            "fetch_second": self.coordinator.second,
+            "payload_bytes": self.coordinator.last_payload_bytes,
+            "decode_ms": self.coordinator.last_decode_ms,
+        }
+
+class AmpsterCountryPriceSensor(PeriodRolloverMixin, SensorEntity):
+    """Current all-in price of one country, read from its price series at every period rollover."""
+    _attr_should_poll = False
+
+    def __init__(self, coordinator, country):
+        self.coordinator = coordinator
+        self._country = country
+        self._attr_name = f"Ampster {country} current_period_all_in_price"
+        self._attr_unique_id = f"ampster_{country.lower()}_current_period_all_in_price"
+        self._attr_extra_state_attributes = {"country": country}
+
+    async def async_added_to_hass(self) -> None:
+        self.async_on_remove(
+            self.coordinator.async_add_key_listener(self._country, self._handle_update)
+        )
+        self.async_on_remove(self._cancel_rollover)
+        self._recalculate_and_schedule_rollover()
+
+    @callback
+    def _handle_update(self):
+        self._recalculate_and_schedule_rollover()
+        self.async_write_ha_state()
+
+    @callback
+    def _recalculate_and_schedule_rollover(self):
+        series = self.coordinator.series_by_country.get(self._country)
+        now = dt_util.utcnow()
+        period = series.current(now) if series is not None else None
+        payload = (self.coordinator.data or {}).get(self._country) or {}
+        self._attr_native_value = period.price if period is not None else None
+        self._attr_extra_state_attributes = {
+            "country": self._country,
+            "timestamp": payload.get("timestamp"),
+            "current_period": period.start_datetime(COUNTRY_TZ.get(self._country, DEFAULT_TZ)).isoformat() if period is not None else None,
+        }
+        next_period = series.next(now) if series is not None else None
+        self._schedule_rollover(next_period.start if next_period is not None else None)
+
+    @property
+    def available(self) -> bool:
+        return self.coordinator.last_update_success and self._country in (self.coordinator.data or {})
+
 # To disable exposing sensors, remove or comment out this file and its setup in __init__.py
\ No newline at end of file
@@ -0,0 +1,142 @@
+"""
+Ampster services.
+
+ampster.get_value returns the full value of a payload key on demand, so large
+lists and dicts don't have to live in sensor attributes (and the recorder).
+
+ampster.plan_battery returns an optimal charge/idle/discharge schedule over the
+price horizon. Results are cached until the prices, the current period or the
+inputs change.
+"""
+import logging
+from functools import partial
+import time
+import weakref
+import voluptuous as vol
+from homeassistant.core import HomeAssistant, ServiceCall, SupportsResponse
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN, PLAN_MAX_HORIZON, PLAN_MAX_SOC_STEPS
+from .coordinator import COUNTRY_TZ, DEFAULT_TZ
+from .optimizer import plan_battery
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_GET_VALUE = "get_value"
+SERVICE_PLAN_BATTERY = "plan_battery"
+
+GET_VALUE_SCHEMA = vol.Schema({
+    vol.Required("key"): cv.string,
+    vol.Optional("entry_id"): cv.string,
+})
+
+PLAN_BATTERY_SCHEMA = vol.Schema({
+    vol.Required("capacity_kwh"): vol.All(vol.Coerce(float), vol.Range(min=0.1)),
+    vol.Required("max_charge_kw"): vol.All(vol.Coerce(float), vol.Range(min=0)),
+    vol.Required("max_discharge_kw"): vol.All(vol.Coerce(float), vol.Range(min=0)),
+    vol.Required("soc"): vol.All(vol.Coerce(float), vol.Range(min=0, max=100)),
+    vol.Optional("efficiency", default=0.9): vol.All(vol.Coerce(float), vol.Range(min=0.1, max=1)),
+    vol.Optional("min_soc", default=0): vol.All(vol.Coerce(float), vol.Range(min=0, max=100)),
+    vol.Optional("max_soc", default=100): vol.All(vol.Coerce(float), vol.Range(min=0, max=100)),
+    vol.Optional("soc_steps", default=20): vol.All(vol.Coerce(int), vol.Range(min=2, max=PLAN_MAX_SOC_STEPS)),
+    vol.Optional("horizon"): vol.All(vol.Coerce(int), vol.Range(min=1, max=PLAN_MAX_HORIZON)),
+    vol.Optional("entry_id"): cv.string,
+})
+
+def _get_coordinator(hass: HomeAssistant, entry_id=None):
+    """Coordinator of the given config entry, or of the first loaded one."""
+    domain_data = hass.data.get(DOMAIN, {})
+    entry_ids = [entry_id] if entry_id else [entry.entry_id for entry in hass.config_entries.async_entries(DOMAIN)]
+    for candidate in entry_ids:
+        coordinator = domain_data.get(candidate)
+        if coordinator is not None:
+            return coordinator
+    raise ServiceValidationError(f"No loaded Ampster config entry {entry_id or ''}".strip())
+
+async def async_setup_services(hass: HomeAssistant):
+    """Register the Ampster services (once per Home Assistant instance)."""
+    if hass.services.has_service(DOMAIN, SERVICE_GET_VALUE):
+        return
+
+    async def async_get_value(call: ServiceCall):
+        coordinator = _get_coordinator(hass, call.data.get("entry_id"))
+        key = call.data["key"]
+        data = coordinator.data or {}
+        if key not in data:
+            raise ServiceValidationError(f"Key '{key}' is not in the Ampster payload")
+        return {"key": key, "value": data[key]}
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_GET_VALUE, async_get_value,
+        schema=GET_VALUE_SCHEMA, supports_response=SupportsResponse.ONLY,
+    )
+
+    # Last plan per coordinator: (series, start index, inputs, response)
+    plan_cache = weakref.WeakKeyDictionary()
+
+    async def async_plan_battery(call: ServiceCall):
+        min_soc, max_soc, soc = call.data["min_soc"], call.data["max_soc"], call.data["soc"]
+        if max_soc <= min_soc:
+            raise ServiceValidationError(f"max_soc ({max_soc}) must be higher than min_soc ({min_soc})")
+        coordinator = _get_coordinator(hass, call.data.get("entry_id"))
+        series = coordinator.series
+        index = series.start_index(dt_util.utcnow())
+        # The plan starts from the SoC level nearest to soc (clamped to min_soc..max_soc), so
+        # callers whose soc differs by less than a step share the cached plan
+        steps = call.data["soc_steps"]
+        start_level = min(steps, max(0, round((soc - min_soc) / (max_soc - min_soc) * steps)))
+        inputs = tuple(sorted(
+            (key, start_level if key == "soc" else value) for key, value in call.data.items() if key != "entry_id"
+        ))
+        cached = plan_cache.get(coordinator)
+        if cached and cached[0] is series and cached[1] == index and cached[2] == inputs:
+            return cached[3]
+
+        horizon = call.data.get("horizon") or PLAN_MAX_HORIZON
+        periods = [series.period(i) for i in range(index, min(index + horizon, len(series)))]
+        if not periods:
+            raise ServiceValidationError("No upcoming prices to plan over")
+        capacity = call.data["capacity_kwh"]
+        started = time.perf_counter()
+        # The DP can take a noticeable fraction of a second at the upper limits, so keep it off the event loop
+        plan = await hass.async_add_executor_job(partial(
+            plan_battery,
+            [period.price for period in periods],
+            series.period_seconds / 3600,
+            capacity,
+            capacity * call.data["soc"] / 100,
+            call.data["max_charge_kw"],
+            call.data["max_discharge_kw"],
+            efficiency=call.data["efficiency"],
+            min_soc_kwh=capacity * call.data["min_soc"] / 100,
+            max_soc_kwh=capacity * call.data["max_soc"] / 100,
+            steps=call.data["soc_steps"],
+        ))
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        _LOGGER.debug(f"[Ampster] Battery plan over {len(periods)} periods solved in {elapsed_ms:.1f} ms")
+
+        tz = COUNTRY_TZ.get(coordinator.country_prefix, DEFAULT_TZ)
+        period_hours = series.period_seconds / 3600
+        response = {
+            "cost": round(plan["cost"], 4),
+            "solve_ms": round(elapsed_ms, 2),
+            "schedule": [
+                {
+                    "start": period.start_datetime(tz).isoformat(),
+                    "price": period.price,
+                    "action": action,
+                    "power_kw": round(grid_kwh / period_hours, 3),
+                    "soc": round(100 * soc_kwh / capacity, 1),
+                }
+                for period, (action, grid_kwh, soc_kwh) in zip(periods, plan["actions"])
+            ],
+        }
+        plan_cache[coordinator] = (series, index, inputs, response)
+        return response
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_PLAN_BATTERY, async_plan_battery,
+        schema=PLAN_BATTERY_SCHEMA, supports_response=SupportsResponse.ONLY,
+    )
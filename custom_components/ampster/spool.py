@@ -0,0 +1,232 @@
+"""
+Durable on-disk queue for upload batches that could not be delivered.
+
+Batches are appended as JSON lines to numbered segment files and fsync'd in the
+executor, several pending batches per write. Segment names carry the time of
+their first batch ("<seq>-<epoch>.jsonl"). The spool is bounded in total size
+and age (the oldest segments are dropped first) and is replayed in order; the
+delivery cursor is persisted so a restart does not resend what already went out.
+Delivery is at-least-once: a batch can be resent if HA stops mid-replay.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".jsonl"
+CURSOR_FILE = "cursor"
+
+
+class _Segment:
+    __slots__ = ("seq", "size", "created")
+
+    def __init__(self, seq: int, size: int, created: float):
+        self.seq = seq
+        self.size = size
+        # When the first batch was written; the segment's age is measured from here, not its mtime
+        self.created = created
+
+    @property
+    def name(self) -> str:
+        return f"{self.seq:010d}-{int(self.created)}{SEGMENT_SUFFIX}"
+
+
+class SegmentLog:
+    """Append-only segment files in one directory. Blocking IO: call from the executor."""
+
+    def __init__(self, directory: str, segment_bytes: int, max_bytes: int, max_age: float):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.segments = []
+        # Bytes of the oldest segment already delivered
+        self.offset = 0
+        self.dropped = 0
+        # Bumped whenever segments are evicted, so a replay in flight does not commit stale offsets
+        self.evictions = 0
+        self._rotate = False
+
+    def _path(self, segment: _Segment) -> str:
+        return os.path.join(self.directory, segment.name)
+
+    @property
+    def pending_bytes(self) -> int:
+        return sum(segment.size for segment in self.segments) - self.offset
+
+    def load(self):
+        """Scan the directory, restore the cursor and evict what is too old or too large."""
+        os.makedirs(self.directory, exist_ok=True)
+        self.segments = []
+        for name in os.listdir(self.directory):
+            seq, _, created = name[:-len(SEGMENT_SUFFIX)].partition("-")
+            if name.endswith(SEGMENT_SUFFIX) and seq.isdigit() and created.isdigit():
+                size = os.path.getsize(os.path.join(self.directory, name))
+                self.segments.append(_Segment(int(seq), size, int(created)))
+        self.segments.sort(key=lambda segment: segment.seq)
+        self.offset = 0
+        try:
+            with open(os.path.join(self.directory, CURSOR_FILE)) as cursor:
+                seq, offset = (int(part) for part in cursor.read().split())
+            if self.segments and self.segments[0].seq == seq:
+                self.offset = min(offset, self.segments[0].size)
+        except (OSError, ValueError):
+            pass
+        # Never append behind a possibly torn last line from before the restart
+        self._rotate = True
+        self.evict(time.time())
+
+    def append(self, lines):
+        """Append JSON lines (without newline) and fsync them."""
+        now = time.time()
+        if not self.segments or self._rotate or self.segments[-1].size >= self.segment_bytes:
+            seq = self.segments[-1].seq + 1 if self.segments else 0
+            self.segments.append(_Segment(seq, 0, now))
+            self._rotate = False
+        segment = self.segments[-1]
+        data = "".join(line + "\n" for line in lines).encode()
+        with open(self._path(segment), "ab") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        segment.size += len(data)
+        self.evict(now)
+
+    def read(self, count: int):
+        """The next count undelivered lines (raw bytes, newline included), oldest first."""
+        lines = []
+        skip = self.offset
+        for segment in self.segments:
+            with open(self._path(segment), "rb") as file:
+                file.seek(skip)
+                for line in file:
+                    lines.append(line)
+                    if len(lines) == count:
+                        return lines
+            skip = 0
+        return lines
+
+    def commit(self, lines):
+        """Mark lines returned by read as delivered and delete fully delivered segments."""
+        self.offset += sum(len(line) for line in lines)
+        while self.segments and self.offset >= self.segments[0].size:
+            self.offset -= self.segments[0].size
+            self._remove_oldest()
+        self._save_cursor()
+
+    def evict(self, now: float):
+        """Drop the oldest segments while the spool is over its size or age limit."""
+        evicted = False
+        while self.segments and (
+            self.pending_bytes > self.max_bytes or now - self.segments[0].created > self.max_age
+        ):
+            self.dropped += self.segments[0].size - self.offset
+            self.offset = 0
+            self._remove_oldest()
+            evicted = True
+        if evicted:
+            self.evictions += 1
+            self._save_cursor()
+
+    def _remove_oldest(self):
+        segment = self.segments.pop(0)
+        try:
+            os.remove(self._path(segment))
+        except FileNotFoundError:
+            pass
+
+    def _save_cursor(self):
+        path = os.path.join(self.directory, CURSOR_FILE)
+        seq = self.segments[0].seq if self.segments else 0
+        with open(path + ".tmp", "w") as cursor:
+            cursor.write(f"{seq} {self.offset}")
+        os.replace(path + ".tmp", path)
+
+
+class UploadSpool:
+    """Async front for a SegmentLog: batches appends and replays in order off the event loop."""
+
+    def __init__(self, hass, directory: str, segment_bytes: int, max_bytes: int, max_age: float):
+        self.hass = hass
+        self._log = SegmentLog(directory, segment_bytes, max_bytes, max_age)
+        self._pending = []
+        self._pending_bytes = 0
+        self._lock = asyncio.Lock()
+        self._replaying = False
+
+    @property
+    def replaying(self) -> bool:
+        return self._replaying
+
+    @property
+    def backlog(self) -> int:
+        """Undelivered bytes on disk plus batches waiting to be written."""
+        return self._log.pending_bytes + self._pending_bytes
+
+    async def async_load(self):
+        async with self._lock:
+            await self.hass.async_add_executor_job(self._log.load)
+        if self._log.pending_bytes:
+            _LOGGER.info(f"[Ampster] Upload spool has {self._log.pending_bytes} bytes to replay")
+
+    async def async_append(self, payload):
+        """Queue a batch on disk. Appends made while a write is running go out in the next write."""
+        line = json.dumps(payload, separators=(",", ":"), default=str)
+        self._pending.append(line)
+        self._pending_bytes += len(line.encode()) + 1
+        async with self._lock:
+            if not self._pending:
+                return
+            lines, self._pending = self._pending, []
+            self._pending_bytes = 0
+            dropped = self._log.dropped
+            await self.hass.async_add_executor_job(self._log.append, lines)
+            if self._log.dropped > dropped:
+                _LOGGER.warning(f"[Ampster] Upload spool full, dropped {self._log.dropped - dropped} bytes of the oldest batches")
+
+    async def async_replay(self, send, batch_size: int) -> int:
+        """Send spooled batches one at a time, in order, until one fails.
+
+        Lines are read from disk batch_size at a time. send is an async callable
+        taking the decoded payload and returning True on success. Returns the number
+        of batches delivered.
+        """
+        if self._replaying:
+            return 0
+        self._replaying = True
+        delivered = 0
+        try:
+            while True:
+                async with self._lock:
+                    evictions = self._log.evictions
+                    lines = await self.hass.async_add_executor_job(self._log.read, batch_size)
+                if not lines:
+                    break
+                # Sequential, so the server receives batches in spool order and nothing after a failure
+                ok = 0
+                while ok < len(lines) and await self._send_line(send, lines[ok]):
+                    ok += 1
+                async with self._lock:
+                    if self._log.evictions != evictions:
+                        # The spool overflowed while sending; start over from the new oldest batch
+                        continue
+                    await self.hass.async_add_executor_job(self._log.commit, lines[:ok])
+                delivered += ok
+                if ok < len(lines):
+                    break
+        finally:
+            self._replaying = False
+        if delivered:
+            _LOGGER.info(f"[Ampster] Replayed {delivered} spooled upload batches")
+        return delivered
+
+    async def _send_line(self, send, line: bytes) -> bool:
+        try:
+            payload = json.loads(line)
+        except ValueError:
+            _LOGGER.warning("[Ampster] Dropping unreadable spooled upload batch")
+            return True
+        return await send(payload)
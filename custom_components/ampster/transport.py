@@ -0,0 +1,330 @@
+"""
+Upload transport for one endpoint.
+
+Owns the endpoint's pooled keep-alive session, body encoding/compression and
+on-disk spool. Every request has a deadline. Failures, 429 and 5xx responses put
+the endpoint in backoff (jittered exponential, at least the server's Retry-After);
+while backing off no requests are made, new batches go to the spool, and the
+spool is replayed once the backoff has passed.
+
+The uploader can fan one batch out to several endpoints, one transport each; the
+body is encoded once per (encoding, compression) and handed to every transport
+that uses it.
+"""
+import asyncio
+import email.utils
+import logging
+import time
+
+import aiohttp
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_call_later
+
+from .backoff import backoff_delay
+from .const import (
+    UPLOAD_CONNECT_TIMEOUT,
+    UPLOAD_READ_TIMEOUT,
+    UPLOAD_REQUEST_DEADLINE,
+    UPLOAD_CONNECTION_LIMIT,
+    UPLOAD_CONCURRENCY,
+    UPLOAD_KEEPALIVE_TIMEOUT,
+    UPLOAD_RETRY_BASE_DELAY,
+    UPLOAD_RETRY_MAX_DELAY,
+    UPLOAD_RETRY_AFTER_MAX,
+    UPLOAD_ENCODINGS,
+    UPLOAD_COMPRESSIONS,
+    SPOOL_SEGMENT_BYTES,
+    SPOOL_MAX_BYTES,
+    SPOOL_MAX_AGE,
+    SPOOL_REPLAY_BATCH,
+    DEFAULT_UPLOAD_ENCODING,
+    DEFAULT_UPLOAD_COMPRESSION,
+    COMPRESS_EXECUTOR_THRESHOLD,
+)
+from .encoding import compress, compression_available, encode_payload
+from .spool import UploadSpool
+
+_LOGGER = logging.getLogger(__name__)
+
+# Response header with the server's preferred upload slot: seconds into the upload interval
+SLOT_HINT_HEADER = "X-Ampster-Upload-Slot"
+
+# Rejected batches that would fail again on every replay; they are dropped instead of spooled
+DROP_STATUSES = {400, 413, 422}
+
+
+def parse_retry_after(value, now: float = None):
+    """Seconds to wait from a Retry-After header (delta seconds or HTTP date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - (time.time() if now is None else now))
+
+
+def parse_endpoints(text: str, encoding: str = DEFAULT_UPLOAD_ENCODING, compression: str = DEFAULT_UPLOAD_COMPRESSION):
+    """Parse "url|api_key[|encoding[|compression]]" entries (comma separated) into tuples.
+
+    Missing encoding/compression fields default to the given ones; entries without
+    an API key are skipped.
+    """
+    endpoints = []
+    for entry in (text or "").split(","):
+        fields = [field.strip() for field in entry.split("|")]
+        if not fields[0]:
+            continue
+        if len(fields) < 2 or not fields[1]:
+            _LOGGER.warning(f"[Ampster] Ignoring upload endpoint {fields[0]}: no API key")
+            continue
+        endpoint_encoding = fields[2] if len(fields) > 2 and fields[2] else encoding
+        endpoint_compression = fields[3] if len(fields) > 3 and fields[3] else compression
+        if endpoint_encoding not in UPLOAD_ENCODINGS:
+            _LOGGER.warning(f"[Ampster] Unknown encoding {endpoint_encoding} for {fields[0]}, using {encoding}")
+            endpoint_encoding = encoding
+        if endpoint_compression not in UPLOAD_COMPRESSIONS:
+            _LOGGER.warning(f"[Ampster] Unknown compression {endpoint_compression} for {fields[0]}, using {compression}")
+            endpoint_compression = compression
+        endpoints.append((fields[0], fields[1], endpoint_encoding, endpoint_compression))
+    return endpoints
+
+
+class UploadTransport:
+    """Sends upload batches to one endpoint."""
+
+    def __init__(self, hass, url: str, api_key: str, encoding: str = DEFAULT_UPLOAD_ENCODING,
+                 compression: str = DEFAULT_UPLOAD_COMPRESSION, concurrency: int = UPLOAD_CONCURRENCY):
+        self.hass = hass
+        self.url = url
+        self.api_key = api_key
+        self.encoding = encoding
+        if not compression_available(compression):
+            _LOGGER.warning(f"[Ampster] {compression} compression is not available (zstandard not installed), using gzip")
+        self.compression = compression
+        self.concurrency = concurrency
+        self.stats = {
+            "requests": 0,
+            "connections_created": 0,
+            "connections_reused": 0,
+            "bytes_sent": 0,
+            "failures": 0,
+            "throttled": 0,
+        }
+        # One pooled keep-alive session, created on first use and closed in async_close
+        self._session = None
+        self._spool = None
+        self._semaphore = asyncio.Semaphore(concurrency)
+        # Serializes async_send so batches reach the endpoint (or its spool) in order
+        self._send_lock = asyncio.Lock()
+        self._failures = 0
+        self._not_before = 0.0
+        self._unsub_replay = None
+        self._replay_task = None
+        # Set by async_close; a closed transport makes no more requests
+        self._closed = False
+        # Latest slot suggested by the server, if any
+        self.slot_hint = None
+
+    @property
+    def backoff_remaining(self) -> float:
+        """Seconds until the endpoint may be called again (0 when not backing off)."""
+        return max(0.0, self._not_before - time.monotonic())
+
+    def _get_session(self):
+        """Return the pooled upload session, creating it if needed."""
+        if self._closed:
+            raise RuntimeError(f"Upload transport for {self.url} is closed")
+        if self._session is None or self._session.closed:
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_request_start.append(self._on_request_start)
+            trace_config.on_connection_create_end.append(self._on_connection_created)
+            trace_config.on_connection_reuseconn.append(self._on_connection_reused)
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=UPLOAD_CONNECTION_LIMIT,
+                    keepalive_timeout=UPLOAD_KEEPALIVE_TIMEOUT,
+                ),
+                timeout=aiohttp.ClientTimeout(
+                    total=UPLOAD_REQUEST_DEADLINE,
+                    connect=UPLOAD_CONNECT_TIMEOUT,
+                    sock_read=UPLOAD_READ_TIMEOUT,
+                ),
+                trace_configs=[trace_config],
+            )
+        return self._session
+
+    async def _on_request_start(self, session, context, params):
+        self.stats["requests"] += 1
+
+    async def _on_connection_created(self, session, context, params):
+        self.stats["connections_created"] += 1
+
+    async def _on_connection_reused(self, session, context, params):
+        self.stats["connections_reused"] += 1
+
+    async def async_open(self, spool_dir: str):
+        """Open the session and the endpoint's spool."""
+        self._get_session()
+        self._spool = UploadSpool(self.hass, spool_dir, SPOOL_SEGMENT_BYTES, SPOOL_MAX_BYTES, SPOOL_MAX_AGE)
+        await self._spool.async_load()
+        self.stats["spool_backlog_bytes"] = self._spool.backlog
+
+    async def async_close(self):
+        """Cancel a pending or running replay and close the session."""
+        self._closed = True
+        if self._unsub_replay:
+            self._unsub_replay()
+            self._unsub_replay = None
+        if self._replay_task is not None:
+            self._replay_task.cancel()
+            try:
+                await self._replay_task
+            except asyncio.CancelledError:
+                pass
+            self._replay_task = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+            _LOGGER.debug(f"[Ampster] Upload session for {self.url} closed, stats: {self.stats}")
+
+    @property
+    def encoding_key(self):
+        """Transports with the same key can share an encoded body."""
+        return self.encoding, self.compression
+
+    async def async_encode(self, data):
+        """Encode and compress a batch for this endpoint. Returns (body, headers)."""
+        body, headers = encode_payload(data, self.encoding)
+        raw_size = len(body)
+        if len(body) > COMPRESS_EXECUTOR_THRESHOLD:
+            body, content_encoding = await self.hass.async_add_executor_job(compress, body, self.compression)
+        else:
+            body, content_encoding = compress(body, self.compression)
+        if content_encoding:
+            headers["Content-Encoding"] = content_encoding
+        _LOGGER.debug(f"[Ampster] Request body: {raw_size} bytes {self.encoding}, {len(body)} bytes on the wire")
+        return body, headers
+
+    async def async_send(self, data, encoded=None) -> bool:
+        """Deliver data, or queue it in the spool. Returns True if it was delivered or spooled.
+
+        encoded is the (body, headers) from async_encode of a transport with the same
+        encoding_key, if the caller already has it. While the spool has a backlog new
+        batches are queued behind it so the server receives them in order.
+        """
+        async with self._send_lock:
+            if self._spool is None:
+                return await self.async_post(data, encoded)
+            try:
+                if self._spool.backlog:
+                    await self._spool.async_append(data)
+                    self._schedule_replay()
+                elif not await self.async_post(data, encoded):
+                    await self._spool.async_append(data)
+                    self._schedule_replay()
+            except Exception as e:
+                _LOGGER.error(f"[Ampster] Failed to spool upload batch for {self.url}: {e}", exc_info=True)
+                return False
+            self.stats["spool_backlog_bytes"] = self._spool.backlog
+            return True
+
+    def _schedule_replay(self):
+        """Replay the spool once the backoff has passed (unless a replay is already scheduled)."""
+        if self._unsub_replay is None and not self._closed:
+            self._unsub_replay = async_call_later(self.hass, self.backoff_remaining, self._replay_later)
+
+    @callback
+    def _replay_later(self, _now):
+        self._unsub_replay = None
+        if self._replay_task is None or self._replay_task.done():
+            self._replay_task = self.hass.async_create_background_task(self._async_replay(), "ampster_upload_replay")
+
+    async def _async_replay(self):
+        """Replay the spool in order; stops at the first batch that fails again."""
+        if self._spool.replaying:
+            # The running replay reschedules itself if it leaves a backlog
+            return
+        await self._spool.async_replay(self.async_post, SPOOL_REPLAY_BATCH)
+        self.stats["spool_backlog_bytes"] = self._spool.backlog
+        if self._spool.backlog:
+            self._schedule_replay()
+
+    async def async_post(self, data, encoded=None) -> bool:
+        """POST one batch. Returns False without making a request while backing off or once closed."""
+        if self._closed:
+            return False
+        remaining = self.backoff_remaining
+        if remaining > 0:
+            _LOGGER.debug(f"[Ampster] Not uploading to {self.url}, backing off for another {remaining:.0f}s")
+            return False
+        async with self._semaphore:
+            return await self._async_post(data, encoded)
+
+    def _record_failure(self, retry_after=None):
+        self._failures += 1
+        self.stats["failures"] += 1
+        delay = backoff_delay(self._failures - 1, UPLOAD_RETRY_BASE_DELAY, UPLOAD_RETRY_MAX_DELAY)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, UPLOAD_RETRY_AFTER_MAX))
+        self._not_before = time.monotonic() + delay
+        _LOGGER.info(f"[Ampster] Backing off uploads to {self.url} for {delay:.0f}s ({self._failures} consecutive failures)")
+
+    def _record_slot_hint(self, value):
+        if value is None:
+            return
+        try:
+            hint = float(value)
+        except (TypeError, ValueError):
+            return
+        if hint >= 0 and hint != self.slot_hint:
+            _LOGGER.info(f"[Ampster] {self.url} suggests uploading {hint:.0f}s into each upload interval")
+            self.slot_hint = hint
+
+    async def _async_post(self, data, encoded=None) -> bool:
+        _LOGGER.info(f"[Ampster] Making HTTP POST to: {self.url}")
+        _LOGGER.debug(f"[Ampster] Request payload: {data}")
+
+        if encoded is None:
+            try:
+                encoded = await self.async_encode(data)
+            except Exception as e:
+                # A local serialization bug: drop the batch without backing off a healthy endpoint
+                _LOGGER.error(f"[Ampster] Failed to encode upload batch for {self.url}, dropping it: {e}", exc_info=True)
+                return True
+        try:
+            body, headers = encoded
+            headers = {**headers, "X-API-Key": self.api_key}
+            self.stats["bytes_sent"] += len(body)
+            session = self._get_session()
+            async with session.post(self.url, data=body, headers=headers) as response:
+                _LOGGER.info(f"[Ampster] HTTP Response status: {response.status}")
+                _LOGGER.debug(f"[Ampster] Response headers: {dict(response.headers)}")
+
+                response_text = await response.text()
+                _LOGGER.debug(f"[Ampster] Response body: {response_text}")
+
+                if response.status == 200:
+                    _LOGGER.info(f"[Ampster] Successfully uploaded data for {len(data.get('sensors', {}))} sensors")
+                    self._failures = 0
+                    self._record_slot_hint(response.headers.get(SLOT_HINT_HEADER))
+                    return True
+                if response.status in DROP_STATUSES:
+                    _LOGGER.error(f"[Ampster] Upload rejected with status {response.status}, dropping batch: {response_text}")
+                    return True
+                _LOGGER.error(f"[Ampster] Upload failed with status {response.status}: {response_text}")
+                if response.status in (429, 503):
+                    self.stats["throttled"] += 1
+                self._record_failure(parse_retry_after(response.headers.get("Retry-After")))
+                return False
+        except Exception as e:
+            _LOGGER.error(f"[Ampster] Upload failed with exception: {e}", exc_info=True)
+            self._record_failure()
+            return False
+        finally:
+            _LOGGER.debug(f"[Ampster] Upload session stats: {self.stats}")
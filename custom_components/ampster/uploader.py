@@ -4,130 +4,447 @@ Handles posting sensor data to remote server on a schedule.
 """
 import logging
 import asyncio
-import aiohttp
+import hashlib
+import math
+import time
 from datetime import datetime, timedelta
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.entity_registry import EVENT_ENTITY_REGISTRY_UPDATED
+from homeassistant.helpers.event import (
+    async_track_point_in_utc_time,
+    async_track_state_change_event,
+    async_track_time_interval,
+)
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DOMAIN,
+    UPLOAD_MODE_DELTA,
+    DEFAULT_UPLOAD_MODE,
+    DELTA_FLUSH_SIZE,
+    DELTA_KEYFRAME_INTERVAL,
+    DEFAULT_UPLOAD_ENCODING,
+    DEFAULT_UPLOAD_COMPRESSION,
+    DEFAULT_UPLOAD_SAMPLE_INTERVAL,
+    MAX_SAMPLES_PER_UPLOAD,
+    DEFAULT_UPLOAD_ATTRIBUTES,
+    DEFAULT_UPLOAD_EXCLUDE_ATTRIBUTES,
+    DEFAULT_UPLOAD_VALUES_ONLY,
+    DEFAULT_UPLOAD_ATTRIBUTE_MAX_BYTES,
+    DEFAULT_UPLOAD_EXTRA_ENDPOINTS,
+)
+from .backoff import next_slot, stable_offset
+from .projection import AttributeProjection
+from .sampling import NAN, SampleBuffer, numeric_state
+from .transport import UploadTransport, parse_endpoints
 
 _LOGGER = logging.getLogger(__name__)
 
+
+def entity_candidates(sensor_name: str):
+    """Entity ids tried, in order, for a configured upload sensor name."""
+    if sensor_name.startswith("sensor."):
+        # Full entity ID provided
+        return [sensor_name]
+    return [
+        sensor_name,  # Try as-is first (for non-sensor entities)
+        f"sensor.{sensor_name}",  # Try with sensor. prefix
+        f"sensor.ampster_{sensor_name}",  # Try with ampster_ prefix
+    ]
+
 class AmpsterDataUploader:
     """Handles uploading sensor data to remote server."""
     
     def __init__(self, hass: HomeAssistant, upload_url: str, api_key: str, 
-                 upload_sensors: str, upload_interval: int):
+                 upload_sensors: str, upload_interval: int, upload_mode: str = DEFAULT_UPLOAD_MODE,
+                 encoding: str = DEFAULT_UPLOAD_ENCODING, compression: str = DEFAULT_UPLOAD_COMPRESSION,
+                 sample_interval: int = DEFAULT_UPLOAD_SAMPLE_INTERVAL, attributes: str = DEFAULT_UPLOAD_ATTRIBUTES,
+                 exclude_attributes: str = DEFAULT_UPLOAD_EXCLUDE_ATTRIBUTES, values_only: bool = DEFAULT_UPLOAD_VALUES_ONLY,
+                 attribute_max_bytes: int = DEFAULT_UPLOAD_ATTRIBUTE_MAX_BYTES, slot_seed: str = None,
+                 extra_endpoints: str = DEFAULT_UPLOAD_EXTRA_ENDPOINTS):
         self.hass = hass
         self.upload_url = upload_url
         self.api_key = api_key
         self.upload_sensors = [s.strip() for s in upload_sensors.split(",") if s.strip()]
         self.upload_interval = upload_interval
+        self.upload_mode = upload_mode
+        # Session, encoding, backoff and spool for the primary endpoint
+        self.transport = UploadTransport(hass, upload_url, api_key, encoding, compression)
+        # Every batch is also sent to the extra endpoints, each with its own transport (and spool, keyed by URL)
+        self.transports = [self.transport]
+        for url, key, endpoint_encoding, endpoint_compression in parse_endpoints(extra_endpoints, encoding, compression):
+            if any(transport.url == url for transport in self.transports):
+                _LOGGER.warning(f"[Ampster] Ignoring duplicate upload endpoint {url}")
+                continue
+            self.transports.append(UploadTransport(hass, url, key, endpoint_encoding, endpoint_compression))
+        self._fanout_tasks = set()
+        # Attribute rules, compiled in async_start (or on first use)
+        self.attributes = attributes
+        self.exclude_attributes = exclude_attributes
+        self.values_only = values_only
+        self.attribute_max_bytes = attribute_max_bytes
+        self._projection = None
+        # Numeric samples taken every sample_interval seconds and shipped with each upload
+        self.sample_interval = sample_interval
+        self._samples = None
+        self._unsub_sampler = None
+        if sample_interval:
+            capacity = min(MAX_SAMPLES_PER_UPLOAD, math.ceil(upload_interval * 60 / sample_interval) + 1)
+            self._samples = SampleBuffer(self.upload_sensors, capacity)
+            self._sample_rows = {name: row for row, name in enumerate(self.upload_sensors)}
         self._unsub_timer = None
-        
+        self._scheduled_offset = None
+        # Uploads run at a fixed, per-install offset into each wall-clock interval so a
+        # fleet restarted at the same time does not upload in lockstep
+        self.slot_offset = stable_offset(slot_seed, upload_interval * 60) if slot_seed else 0
+        # Set while an upload runs; triggers arriving meanwhile wait for it instead of starting another
+        self._upload_done = None
+        self._running_full = False
+        # A full upload requested while a delta was in flight; it runs right after
+        self._full_requested = False
+        # Names are resolved to entity ids once; only names marked dirty (by an entity
+        # appearing, disappearing or being renamed) are resolved again, lazily on the next upload
+        self._candidate_names = {}
+        for sensor_name in self.upload_sensors:
+            for candidate in entity_candidates(sensor_name):
+                self._candidate_names.setdefault(candidate, set()).add(sensor_name)
+        self._resolved = {}
+        self._dirty = set(self.upload_sensors)
+        self._entities = []
+        self._names_by_entity = {}
+        self._unsub_listeners = []
+        # Delta mode: changed sensor name -> whether its attributes changed, flushed at the interval
+        self._changes = {}
+        self._flush_pending = False
+        self._last_keyframe = None
+        # Called after every upload attempt, e.g. so the Upload Now button shows current statistics
+        self._listeners = []
+
+    @callback
+    def async_add_listener(self, update_callback):
+        """Listen for finished uploads. Returns a function that removes the listener."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def remove_listener():
+            self._listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def _async_update_listeners(self, *_):
+        for update_callback in list(self._listeners):
+            update_callback()
+
+    @property
+    def stats(self):
+        """Transport statistics (requests, connections, bytes, failures, spool backlog).
+
+        With extra endpoints their statistics are listed by URL under "endpoints".
+        """
+        if len(self.transports) == 1:
+            return self.transport.stats
+        return {
+            **self.transport.stats,
+            "endpoints": {transport.url: dict(transport.stats) for transport in self.transports[1:]},
+        }
+
+    def _compile_projection(self) -> AttributeProjection:
+        return AttributeProjection(
+            self.upload_sensors, self.attributes, self.exclude_attributes,
+            self.values_only, self.attribute_max_bytes,
+        )
+
+    @property
+    def projection(self) -> AttributeProjection:
+        if self._projection is None:
+            self._projection = self._compile_projection()
+        return self._projection
+
+    def _resolve_entities(self):
+        """Resolve dirty sensor names and rebuild the (name, entity_id) upload list."""
+        for sensor_name in self._dirty:
+            candidates = entity_candidates(sensor_name)
+            entity_id = next((c for c in candidates if self.hass.states.get(c) is not None), None)
+            if entity_id:
+                if self.upload_mode == UPLOAD_MODE_DELTA and self._resolved.get(sensor_name) != entity_id:
+                    # Newly resolved entities are sent in full with the next delta
+                    self._changes[sensor_name] = True
+                self._resolved[sensor_name] = entity_id
+            else:
+                self._resolved.pop(sensor_name, None)
+                _LOGGER.warning(f"[Ampster] Entity '{sensor_name}' not found for upload (tried: {', '.join(candidates)})")
+        self._dirty.clear()
+        self._entities = [(name, self._resolved[name]) for name in self.upload_sensors if name in self._resolved]
+        self._names_by_entity = {}
+        for sensor_name, entity_id in self._entities:
+            self._names_by_entity.setdefault(entity_id, []).append(sensor_name)
+
+    @callback
+    def _async_candidate_changed(self, event):
+        """Mark names dirty when a candidate entity is added or removed; buffer changes in delta mode."""
+        entity_id = event.data.get("entity_id")
+        old_state = event.data.get("old_state")
+        new_state = event.data.get("new_state")
+        if old_state is None or new_state is None:
+            self._dirty.update(self._candidate_names.get(entity_id, ()))
+            return
+        if self.upload_mode != UPLOAD_MODE_DELTA:
+            return
+        for sensor_name in self._names_by_entity.get(entity_id, ()):
+            attributes_changed = self.projection.attributes_changed(sensor_name, old_state.attributes, new_state.attributes)
+            if not attributes_changed and old_state.state == new_state.state:
+                continue
+            self._changes[sensor_name] = self._changes.get(sensor_name, False) or attributes_changed
+        if len(self._changes) >= DELTA_FLUSH_SIZE and not self._flush_pending:
+            self._flush_pending = True
+            self.hass.async_create_task(self._async_upload_data())
+
+    @callback
+    def _async_registry_updated(self, event):
+        """Mark names dirty when one of their candidate entities is renamed or removed."""
+        for key in ("entity_id", "old_entity_id"):
+            self._dirty.update(self._candidate_names.get(event.data.get(key), ()))
+
+    @callback
+    def _async_sample(self, now=None):
+        """Record the numeric state of every resolved entity in the sample buffer."""
+        if self._dirty:
+            self._resolve_entities()
+        values = [NAN] * len(self.upload_sensors)
+        for sensor_name, entity_id in self._entities:
+            state = self.hass.states.get(entity_id)
+            if state is not None:
+                values[self._sample_rows[sensor_name]] = numeric_state(state.state)
+        self._samples.add(time.time(), values)
+
     async def async_start(self):
-        """Start the periodic upload timer."""
+        """Open the upload session and start the periodic upload timer."""
         if self.upload_url and self.api_key and self.upload_sensors:
-            interval = timedelta(minutes=self.upload_interval)
-            self._unsub_timer = async_track_time_interval(
-                self.hass,
-                self._async_upload_data,
-                interval
-            )
-            _LOGGER.info(f"[Ampster] Data uploader started - will upload every {self.upload_interval} minutes")
+            self._projection = self._compile_projection()
+            for transport in self.transports:
+                await transport.async_open(self.hass.config.path(
+                    ".storage", f"{DOMAIN}_upload_spool_{hashlib.sha1(transport.url.encode()).hexdigest()[:12]}"
+                ))
+            self._resolve_entities()
+            self._unsub_listeners = [
+                async_track_state_change_event(self.hass, list(self._candidate_names), self._async_candidate_changed),
+                self.hass.bus.async_listen(EVENT_ENTITY_REGISTRY_UPDATED, self._async_registry_updated),
+            ]
+            self._schedule_next_upload()
+            if self._samples is not None:
+                self._unsub_sampler = async_track_time_interval(
+                    self.hass,
+                    self._async_sample,
+                    timedelta(seconds=self.sample_interval)
+                )
+            _LOGGER.info(f"[Ampster] Data uploader started - will upload every {self.upload_interval} minutes at {self._current_offset():.0f}s into the interval ({self.upload_mode} mode, {len(self.transports)} endpoints)")
         else:
             _LOGGER.info("[Ampster] Data uploader not started - missing configuration")
     
+    def _current_offset(self) -> float:
+        """Offset into the interval: the server's slot hint if it sent one, else the per-install offset."""
+        interval = self.upload_interval * 60
+        hint = self.transport.slot_hint
+        return hint % interval if hint is not None else self.slot_offset
+
+    def _schedule_next_upload(self):
+        self._scheduled_offset = self._current_offset()
+        when = next_slot(time.time(), self.upload_interval * 60, self._scheduled_offset)
+        self._unsub_timer = async_track_point_in_utc_time(
+            self.hass, self._async_slot_upload, dt_util.utc_from_timestamp(when)
+        )
+
+    async def _async_slot_upload(self, now):
+        """Upload for this slot; the next slot is scheduled first so a slow upload cannot shift it."""
+        self._schedule_next_upload()
+        await self._async_upload_data(now)
+
+    def _reschedule_if_slot_moved(self):
+        """Move the pending timer when the server suggested a different slot."""
+        if self._unsub_timer is None or self._current_offset() == self._scheduled_offset:
+            return
+        self._unsub_timer()
+        self._schedule_next_upload()
+        _LOGGER.info(f"[Ampster] Upload slot moved to {self._scheduled_offset:.0f}s into the interval")
+
     async def async_stop(self):
-        """Stop the periodic upload timer."""
+        """Stop the periodic upload timer and close the upload session."""
         if self._unsub_timer:
             self._unsub_timer()
             self._unsub_timer = None
             _LOGGER.info("[Ampster] Data uploader stopped")
+        if self._unsub_sampler:
+            self._unsub_sampler()
+            self._unsub_sampler = None
+        for unsub in self._unsub_listeners:
+            unsub()
+        self._unsub_listeners = []
+        for task in self._fanout_tasks:
+            task.cancel()
+        for transport in self.transports:
+            await transport.async_close()
     
-    async def _async_upload_data(self, now=None):
-        """Upload sensor data to remote server."""
+    def _collect_snapshot(self):
+        """Value and projected attributes of every resolved entity."""
+        projection = self.projection
+        sensors = {}
+        for sensor_name, entity_id in self._entities:
+            state = self.hass.states.get(entity_id)
+            if state is None:
+                # Removed since it was resolved; resolve again on the next upload
+                self._dirty.add(sensor_name)
+                continue
+            sensors[sensor_name] = {"value": state.state}
+            attributes = projection.project(sensor_name, state.attributes)
+            if attributes is not None:
+                sensors[sensor_name]["attributes"] = attributes
+        return sensors
+
+    def _collect_delta(self, changes):
+        """Current value of the changed entities; attributes only where they changed."""
+        sensors = {}
+        for sensor_name, attributes_changed in changes.items():
+            state = self.hass.states.get(self._resolved.get(sensor_name, ""))
+            if state is None:
+                self._dirty.add(sensor_name)
+                continue
+            sensors[sensor_name] = {"value": state.state}
+            if attributes_changed:
+                attributes = self.projection.project(sensor_name, state.attributes)
+                if attributes is not None:
+                    sensors[sensor_name]["attributes"] = attributes
+        return sensors
+
+    def _keyframe_due(self):
+        return self._last_keyframe is None or time.monotonic() - self._last_keyframe >= DELTA_KEYFRAME_INTERVAL
+
+    async def _async_upload_data(self, now=None, full=False):
+        """Upload sensor data to remote server.
+
+        Only one upload runs at a time: a timer tick, size-triggered flush or button
+        press arriving while one is in flight waits for it instead of posting again.
+        A full upload requested while a delta is in flight runs right after it.
+        """
         _LOGGER.info(f"[Ampster] _async_upload_data called with now={now}")
+        if self._upload_done is not None:
+            _LOGGER.debug("[Ampster] Upload already in progress, joining it")
+            if full and not self._running_full and self.upload_mode == UPLOAD_MODE_DELTA:
+                self._full_requested = True
+            await self._upload_done
+            return
+        self._upload_done = asyncio.get_running_loop().create_future()
+        try:
+            self._running_full = full
+            await self._async_run_upload(full)
+            while self._full_requested:
+                self._full_requested = False
+                self._running_full = True
+                await self._async_run_upload(True)
+        finally:
+            self._reschedule_if_slot_moved()
+            self._running_full = False
+            self._upload_done.set_result(None)
+            self._upload_done = None
+            self._async_update_listeners()
+
+    async def _async_run_upload(self, full):
+        """Collect and send one batch.
+
+        In delta mode only the entities that changed since the last upload are sent,
+        with a full keyframe every DELTA_KEYFRAME_INTERVAL (or when full is set).
+        """
+        self._flush_pending = False
         
         if not self.upload_url or not self.api_key or not self.upload_sensors:
             _LOGGER.warning("[Ampster] Upload skipped - missing configuration")
             _LOGGER.debug(f"[Ampster] Config check: url={bool(self.upload_url)}, key={bool(self.api_key)}, sensors={bool(self.upload_sensors)}")
             return
             
+        changes = {}
         try:
             # Collect sensor data
             _LOGGER.info(f"[Ampster] Starting data collection for sensors: {self.upload_sensors}")
-            data = {
-                "timestamp": datetime.now().isoformat(),
-                "sensors": {}
-            }
+            if self._dirty:
+                self._resolve_entities()
+            delta = self.upload_mode == UPLOAD_MODE_DELTA
+            keyframe = full or not delta or self._keyframe_due()
+            # A keyframe covers all buffered changes
+            changes, self._changes = self._changes, {}
+            sensors = self._collect_snapshot() if keyframe else self._collect_delta(changes)
+            samples = self._samples.drain() if self._samples is not None and len(self._samples) else None
             
-            for sensor_name in self.upload_sensors:
-                # Try to find the sensor with different approaches
-                entity_id = None
-                state = None
-                
-                if sensor_name.startswith("sensor."):
-                    # Full entity ID provided
-                    entity_id = sensor_name
-                    state = self.hass.states.get(entity_id)
-                else:
-                    # Try different prefixes in order
-                    candidates = [
-                        sensor_name,  # Try as-is first (for non-sensor entities)
-                        f"sensor.{sensor_name}",  # Try with sensor. prefix
-                        f"sensor.ampster_{sensor_name}",  # Try with ampster_ prefix
-                    ]
-                    
-                    for candidate in candidates:
-                        state = self.hass.states.get(candidate)
-                        if state:
-                            entity_id = candidate
-                            break
-                
-                if state:
-                    data["sensors"][sensor_name] = {
-                        "value": state.state,
-                        "attributes": dict(state.attributes)
-                    }
+            if not sensors and not samples:
+                if keyframe:
+                    _LOGGER.warning("[Ampster] No sensor data found to upload")
                 else:
-                    _LOGGER.warning(f"[Ampster] Entity '{sensor_name}' not found for upload (tried: {', '.join([sensor_name, f'sensor.{sensor_name}', f'sensor.ampster_{sensor_name}'])})")
-            
-            if not data["sensors"]:
-                _LOGGER.warning("[Ampster] No sensor data found to upload")
+                    _LOGGER.debug("[Ampster] No changed sensors to upload")
                 return
             
-            _LOGGER.info(f"[Ampster] Collected data for {len(data['sensors'])} sensors: {list(data['sensors'].keys())}")
-            
-            # Upload data
-            headers = {
-                "X-API-Key": self.api_key,
-                "Content-Type": "application/json"
+            data = {
+                "timestamp": datetime.now().isoformat(),
+                "sensors": sensors
             }
+            if delta:
+                data["type"] = "keyframe" if keyframe else "delta"
+            if samples:
+                data["samples"] = samples
+            _LOGGER.info(f"[Ampster] Collected data for {len(sensors)} sensors: {list(sensors.keys())}")
             
-            _LOGGER.info(f"[Ampster] Making HTTP POST to: {self.upload_url}")
-            _LOGGER.debug(f"[Ampster] Request headers: {headers}")
-            _LOGGER.debug(f"[Ampster] Request payload: {data}")
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.upload_url, json=data, headers=headers) as response:
-                    _LOGGER.info(f"[Ampster] HTTP Response status: {response.status}")
-                    _LOGGER.debug(f"[Ampster] Response headers: {dict(response.headers)}")
-                    
-                    response_text = await response.text()
-                    _LOGGER.debug(f"[Ampster] Response body: {response_text}")
-                    
-                    if response.status == 200:
-                        _LOGGER.info(f"[Ampster] Successfully uploaded data for {len(data['sensors'])} sensors")
-                    else:
-                        _LOGGER.error(f"[Ampster] Upload failed with status {response.status}: {response_text}")
+            if await self._async_send(data):
+                if keyframe:
+                    self._last_keyframe = time.monotonic()
+            else:
+                # Without a spool keep the failed changes for the next upload, which may be a delta
+                # even if this was a (forced) keyframe
+                self._restore_changes(changes)
                         
         except Exception as e:
             _LOGGER.error(f"[Ampster] Upload failed with exception: {e}", exc_info=True)
-    
+            self._restore_changes(changes)
+
+    def _restore_changes(self, changes):
+        """Merge changes taken for a failed upload back into the buffer."""
+        for sensor_name, attributes_changed in changes.items():
+            self._changes[sensor_name] = self._changes.get(sensor_name, False) or attributes_changed
+
+    async def _async_send(self, data) -> bool:
+        """Send a batch to every endpoint, encoding it once per (encoding, compression).
+
+        Extra endpoints are sent to in the background, each queued behind its own
+        previous batches, so a slow or failing endpoint holds up neither the others
+        nor the next upload. Returns the primary endpoint's result.
+
+        A batch that cannot be encoded is dropped for the endpoints using that
+        encoding: retrying would fail the same way, and it says nothing about the
+        endpoint's health, so it does not count towards their backoff.
+        """
+        encoded = {}
+        for transport in self.transports:
+            if transport.encoding_key not in encoded:
+                try:
+                    encoded[transport.encoding_key] = await transport.async_encode(data)
+                except Exception as e:
+                    _LOGGER.error(f"[Ampster] Failed to encode upload batch as {transport.encoding_key}, dropping it: {e}", exc_info=True)
+                    encoded[transport.encoding_key] = None
+        for transport in self.transports[1:]:
+            if encoded[transport.encoding_key] is None:
+                continue
+            task = self.hass.async_create_background_task(
+                transport.async_send(data, encoded[transport.encoding_key]), f"ampster_upload_{transport.url}"
+            )
+            self._fanout_tasks.add(task)
+            task.add_done_callback(self._fanout_tasks.discard)
+            task.add_done_callback(self._async_update_listeners)
+        if encoded[self.transport.encoding_key] is None:
+            return True
+        return await self.transport.async_send(data, encoded[self.transport.encoding_key])
+
     async def async_upload_now(self):
-        """Manually trigger an upload now."""
+        """Manually trigger a full upload now."""
         _LOGGER.info("[Ampster] Manual upload triggered via async_upload_now()")
         try:
-            await self._async_upload_data()
+            await self._async_upload_data(full=True)
             _LOGGER.info("[Ampster] Manual upload completed")
         except Exception as e:
             _LOGGER.error(f"[Ampster] Manual upload failed: {e}", exc_info=True)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the hoarding calculation.
+
+Times parsing a payload into a PriceSeries (done once per fetch) and the
+calculation itself (done once per coordinator update or period rollover).
+Requires the same environment as the tests (homeassistant installed).
+
+Usage:
+  python scripts/bench_hoarding.py
+"""
+import datetime
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'custom_components'))
+
+from ampster.automation import calculate_hoarding_periods_remaining
+from ampster.coordinator import COUNTRY_TZ
+from ampster.prices import PriceSeries
+
+PERIODS = 96  # one day at 15-minute resolution
+ITERATIONS = 10000
+
+def make_payload(start):
+    return {
+        "country": "NL",
+        "current_period": start.isoformat(),
+        "hourly_prices": [
+            {
+                "period": (start + datetime.timedelta(minutes=15 * i)).isoformat(),
+                "price": {"all_in_price": 0.20 + 0.10 * ((i * 7) % 13) / 13},
+            }
+            for i in range(PERIODS)
+        ],
+    }
+
+def main():
+    tz = COUNTRY_TZ["NL"]
+    start = tz.localize(datetime.datetime(2025, 6, 20, 8, 0))
+    payload = make_payload(start)
+    thresholds = (0.0, 0.18, 0.22, 0.26, 0.28)  # negative, very_low, low, high, very_high
+    now = start + datetime.timedelta(minutes=7)
+
+    series = PriceSeries.from_payload(payload, tz)
+    parse = timeit.timeit(lambda: PriceSeries.from_payload(payload, tz), number=ITERATIONS // 10) / (ITERATIONS // 10)
+    calc = timeit.timeit(lambda: calculate_hoarding_periods_remaining(series, thresholds, now, tz), number=ITERATIONS) / ITERATIONS
+
+    print(f"Periods:                 {len(series)}")
+    print(f"Result:                  {calculate_hoarding_periods_remaining(series, thresholds, now, tz)}")
+    print(f"PriceSeries.from_payload: {parse * 1e6:8.1f} us/call (once per fetch)")
+    print(f"hoarding calculation:     {calc * 1e6:8.1f} us/call (once per update/rollover)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark for upload payload encodings and compression.
+
+Builds a realistic upload batch (a mix of plain sensors and Ampster sensors with
+a day of 15-minute prices in their attributes) and prints the body size and
+encode + compress time for every encoding/compression combination.
+Requires the same environment as the tests (homeassistant installed).
+
+Usage:
+  python scripts/bench_upload_encoding.py [plain_sensors]
+"""
+import datetime
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'custom_components'))
+
+from ampster.encoding import compress, encode_payload, zstandard
+
+PERIODS = 96  # one day at 15-minute resolution
+ITERATIONS = 200
+
+def make_batch(plain_sensors):
+    start = datetime.datetime(2025, 6, 20, 0, 0)
+    prices = [
+        {
+            "period": (start + datetime.timedelta(minutes=15 * i)).isoformat(),
+            "price": {"all_in_price": round(0.20 + 0.10 * ((i * 7) % 13) / 13, 5)},
+        }
+        for i in range(PERIODS)
+    ]
+    sensors = {
+        f"sensor.power_{i}": {
+            "value": f"{100 + i * 3.7:.1f}",
+            "attributes": {
+                "unit_of_measurement": "W",
+                "device_class": "power",
+                "state_class": "measurement",
+                "friendly_name": f"Power meter {i}",
+            },
+        }
+        for i in range(plain_sensors)
+    }
+    sensors["hourly_prices"] = {
+        "value": f"list ({PERIODS})",
+        "attributes": {"count": PERIODS, "full_value": prices, "friendly_name": "Ampster hourly prices"},
+    }
+    sensors["current_period_all_in_price"] = {
+        "value": "0.25",
+        "attributes": {"unit_of_measurement": "€/kWh", "friendly_name": "Ampster current price"},
+    }
+    return {"timestamp": start.isoformat(), "sensors": sensors}
+
+def main():
+    plain_sensors = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    batch = make_batch(plain_sensors)
+    compressions = ["none", "gzip"] + (["zstd"] if zstandard is not None else [])
+    print(f"Batch: {len(batch['sensors'])} sensors")
+    print(f"{'encoding':10} {'compression':12} {'bytes':>9} {'ms/encode':>10}")
+    for encoding in ("json", "columnar"):
+        for compression in compressions:
+            def run():
+                body, _ = encode_payload(batch, encoding)
+                return compress(body, compression)[0]
+            size = len(run())
+            elapsed = timeit.timeit(run, number=ITERATIONS) / ITERATIONS
+            print(f"{encoding:10} {compression:12} {size:9d} {elapsed * 1000:10.3f}")
+    if zstandard is None:
+        print("(zstd skipped: zstandard is not installed)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import random
+from custom_components.ampster.analytics import AnalyticsCache, PriceAnalytics
+from custom_components.ampster.prices import PriceSeries
+
+def make_series(prices):
+    return PriceSeries([i * 3600 for i in range(len(prices))], prices)
+
+def test_window_and_block_match_brute_force():
+    rng = random.Random(42)
+    prices = [round(rng.uniform(-0.05, 0.45), 3) for _ in range(96)]
+    series = make_series(prices)
+    analytics = PriceAnalytics(series, windows=[12], block_sizes=[3])
+    for index in range(len(prices)):
+        window = prices[index:index + 12]
+        stats = analytics.window(index, 12)
+        assert stats["min"] == min(window)
+        assert stats["max"] == max(window)
+        assert abs(stats["mean"] - sum(window) / len(window)) < 1e-9
+
+        blocks = [sum(prices[start:start + 3]) / 3 for start in range(index, len(prices) - 2)]
+        cheapest = analytics.block(index, 3)
+        dearest = analytics.block(index, 3, cheapest=False)
+        if blocks:
+            assert abs(cheapest["mean"] - min(blocks)) < 1e-9
+            assert abs(dearest["mean"] - max(blocks)) < 1e-9
+        else:
+            assert cheapest is None and dearest is None
+
+def test_cheapest_block_position():
+    series = make_series([0.30, 0.10, 0.05, 0.08, 0.40, 0.02, 0.50])
+    analytics = PriceAnalytics(series, windows=[], block_sizes=[3])
+    assert analytics.block(0, 3)["start_index"] == 1
+    assert analytics.block(2, 3)["start_index"] == 3
+    assert analytics.block(5, 3) is None
+
+def test_cache_rebuilds_only_for_new_series():
+    cache = AnalyticsCache([12], [3])
+    series = make_series([0.1] * 24)
+    first = cache.get(series)
+    assert cache.get(series) is first
+    assert cache.get(make_series([0.2] * 24)) is not first
@@ -12,6 +12,8 @@ import pytest
 import aiohttp
 import asyncio
 from custom_components.ampster import automation
+from custom_components.ampster.coordinator import COUNTRY_TZ, DEFAULT_TZ
+from custom_components.ampster.prices import PriceSeries
 from homeassistant.core import HomeAssistant
 from homeassistant.config_entries import ConfigEntry
 
@@ -21,6 +23,7 @@ class DummyCoordinator:
         self.url = url
         self.country_prefix = country_prefix
         self.minute = minute
+        self.series = PriceSeries.from_payload(data, COUNTRY_TZ.get(country_prefix, DEFAULT_TZ))
         self._listeners = []
     def async_add_listener(self, listener):
         self._listeners.append(listener)
@@ -67,3 +70,45 @@ async def test_handle_data_update_triggers_log(monkeypatch, caplog):
 
     # Check that log contains expected info
     assert any("Data fetched" in record.message for record in caplog.records)
+
+def test_calculate_hoarding_periods_remaining_from_series():
+    """The hoarding calculation reads the price series directly, without sensor string parsing."""
+    import datetime
+    from custom_components.ampster.automation import calculate_hoarding_periods_remaining
+
+    tz = COUNTRY_TZ["NL"]
+    start = tz.localize(datetime.datetime(2025, 6, 20, 10, 0))
+    prices = [0.20, 0.20, 0.20, 0.20, 0.20, 0.35, 0.40, 0.20, 0.20, 0.20, 0.20, 0.20]
+    payload = {"hourly_prices": [
+        {"period": (start + datetime.timedelta(hours=i)).isoformat(), "price": {"all_in_price": p}}
+        for i, p in enumerate(prices)
+    ]}
+    series = PriceSeries.from_payload(payload, tz)
+    thresholds = (None, None, None, 0.30, 0.38)  # negative, very_low, low, high, very_high
+    now = start + datetime.timedelta(minutes=30)
+
+    # First High period after 12:00 starts at 15:00, 4.5 hours from now
+    assert calculate_hoarding_periods_remaining(series, thresholds, now, tz) == 4.5
+    # Without thresholds it falls back to the most expensive period (16:00)
+    assert calculate_hoarding_periods_remaining(series, (None,) * 5, now, tz) == 5.5
+
+def test_threshold_snapshot_categorise_many_matches_categorise():
+    """Batch categorisation gives the same result as the per-price macro and caches the lookups."""
+    from unittest.mock import MagicMock
+    from custom_components.ampster.automation import ThresholdSnapshot, categorise_with
+
+    values = {"negative": "0", "very_low": "0.10", "low": "0.18", "high": "0.30", "very_high": "0.40"}
+    hass = MagicMock()
+    hass.states.get.side_effect = lambda entity_id: MagicMock(state=values[entity_id.split(".", 1)[1]])
+    snapshot = ThresholdSnapshot(hass)
+
+    prices = [-0.05, 0.05, 0.15, 0.25, 0.35, 0.45, 0.30, 0.40]
+    expected = [categorise_with(snapshot.thresholds, price) for price in prices]
+    assert snapshot.categorise_many(prices) == expected
+    assert expected == ["Negative", "Very Low", "Low", "Average", "High", "Very High", "Average", "High"]
+    assert hass.states.get.call_count == 5
+
+    # A state change of one of the helpers invalidates the snapshot
+    snapshot._handle_state_change(None)
+    values["high"] = "0.20"
+    assert snapshot.categorise_many([0.25]) == ["High"]
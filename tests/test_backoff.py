@@ -0,0 +1,43 @@
+from custom_components.ampster.backoff import CircuitBreaker, backoff_delay, next_slot, stable_offset
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    def __call__(self):
+        return self.now
+
+def test_backoff_delay_is_jittered_and_capped():
+    for attempt in range(10):
+        delay = backoff_delay(attempt, base=30, cap=900)
+        upper = min(900, 30 * 2 ** attempt)
+        assert upper / 2 <= delay <= upper
+
+def test_stable_offset_is_deterministic_and_in_range():
+    assert stable_offset("install-a", 60) == stable_offset("install-a", 60)
+    assert all(0 <= stable_offset(f"install-{i}", 60) < 60 for i in range(100))
+
+def test_circuit_breaker_opens_and_recovers():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=100, clock=clock)
+    for _ in range(3):
+        assert breaker.allow_request()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+    clock.now = 100
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now = 200
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.consecutive_failures == 0
+
+def test_next_slot():
+    """Slots are aligned to the interval and shifted by the offset."""
+    assert next_slot(1000, 900, 60) == 1860
+    assert next_slot(1860, 900, 60) == 2760
+    assert next_slot(1859, 900, 60) == 1860
+    assert next_slot(50, 900, 60) == 60
@@ -0,0 +1,291 @@
+import datetime
+import inspect
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from homeassistant.config_entries import current_entry
+from homeassistant.helpers.update_coordinator import UpdateFailed
+from custom_components.ampster.coordinator import (
+    AmpsterCoordinatorRegistry,
+    AmpsterDataUpdateCoordinator,
+    AmpsterMultiCountryCoordinator,
+)
+
+class DummyCoordinator:
+    def __init__(self, feed_key, minute=5):
+        self.feed_key = feed_key
+        self.minute = minute
+        self.initialized = 0
+        self.shut_down = 0
+        self.release = None
+    async def async_initialize(self, require_data=True):
+        self.initialized += 1
+        if self.release is not None:
+            await self.release.wait()
+    async def async_shutdown(self):
+        self.shut_down += 1
+
+@pytest.mark.asyncio
+async def test_registry_shares_coordinator_for_same_feed():
+    """Entries with the same feed URL get one coordinator, shut down with the last user."""
+    registry = AmpsterCoordinatorRegistry()
+    built = []
+    def factory(key):
+        def build():
+            built.append(key)
+            return DummyCoordinator(key)
+        return build
+    nl, be = "https://example.com/NL.json", "https://example.com/BE.json"
+    first = await registry.async_acquire(nl, factory(nl))
+    second = await registry.async_acquire(nl, factory(nl), minute=7)
+    other = await registry.async_acquire(be, factory(be))
+
+    assert first is second
+    assert other is not first
+    assert first.initialized == 1
+    # The factory only runs for a feed that has no coordinator yet
+    assert built == [nl, be]
+
+    await registry.async_release(first)
+    assert first.shut_down == 0
+    await registry.async_release(second)
+    assert first.shut_down == 1
+    assert other.shut_down == 0
+
+@pytest.mark.asyncio
+async def test_registry_first_refresh_does_not_block_other_feeds():
+    """A slow first refresh only holds up entries for the same feed."""
+    import asyncio
+
+    registry = AmpsterCoordinatorRegistry()
+    slow = DummyCoordinator("slow")
+    slow.release = asyncio.Event()
+    first = asyncio.ensure_future(registry.async_acquire("slow", lambda: slow))
+    await asyncio.sleep(0)
+    shared = asyncio.ensure_future(registry.async_acquire("slow", lambda: DummyCoordinator("slow")))
+
+    fast = await asyncio.wait_for(registry.async_acquire("fast", lambda: DummyCoordinator("fast")), 1)
+    assert fast.initialized == 1
+    assert not first.done() and not shared.done()
+
+    slow.release.set()
+    assert await first is slow
+    assert await shared is slow
+    assert slow.initialized == 1
+
+@pytest.mark.asyncio
+async def test_registry_failed_first_refresh_fails_waiters():
+    import asyncio
+
+    registry = AmpsterCoordinatorRegistry()
+    broken = DummyCoordinator("feed")
+    broken.release = asyncio.Event()
+    async def fail(require_data=True):
+        await broken.release.wait()
+        raise RuntimeError("not ready")
+    broken.async_initialize = fail
+    first = asyncio.ensure_future(registry.async_acquire("feed", lambda: broken))
+    await asyncio.sleep(0)
+    waiter = asyncio.ensure_future(registry.async_acquire("feed", lambda: DummyCoordinator("feed")))
+    await asyncio.sleep(0)
+    broken.release.set()
+    for task in (first, waiter):
+        with pytest.raises(RuntimeError):
+            await task
+    assert broken.shut_down == 1
+
+    # The next setup attempt builds a fresh coordinator
+    retry = await registry.async_acquire("feed", lambda: DummyCoordinator("feed"))
+    assert retry is not broken
+
+class DummyResponse:
+    def __init__(self, payload, status=200, headers=None):
+        self.status = status
+        self.headers = headers or {}
+        self._body = json.dumps(payload).encode()
+        self.content_length = len(self._body)
+        self.content = self
+    async def iter_chunked(self, size):
+        yield self._body
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise RuntimeError(f"HTTP {self.status}")
+    async def __aenter__(self):
+        return self
+    async def __aexit__(self, *args):
+        return False
+
+class DummySession:
+    """Serves payloads (or raises exceptions) per URL."""
+    def __init__(self, responses):
+        self.responses = responses
+        self.requested = []
+    def get(self, url, headers=None):
+        self.requested.append(url)
+        response = self.responses[url]
+        if isinstance(response, Exception):
+            raise response
+        return DummyResponse(response)
+
+def make_coordinator(cls, session, **kwargs):
+    hass = MagicMock()
+    hass.config.language = "nl"
+    with patch("custom_components.ampster.coordinator.async_get_clientsession", return_value=session), \
+            patch("custom_components.ampster.coordinator.Store"):
+        return cls(hass, **kwargs)
+
+class DummyEntry:
+    def __init__(self):
+        self.on_unload = []
+    def async_on_unload(self, func):
+        self.on_unload.append(func)
+
+@pytest.mark.asyncio
+async def test_shared_coordinator_survives_unload_of_one_entry():
+    """Unloading one of two entries sharing a real coordinator keeps its refresh timer running."""
+    url = "https://example.com/NL.json"
+    hass = MagicMock()
+    hass.config.language = "nl"
+    registry = AmpsterCoordinatorRegistry()
+    entries = [DummyEntry(), DummyEntry()]
+    unsub_timer = MagicMock()
+    with patch("custom_components.ampster.coordinator.async_get_clientsession", return_value=DummySession({url: {"country": "NL"}})), \
+            patch("custom_components.ampster.coordinator.Store"), \
+            patch("custom_components.ampster.coordinator.instance_id.async_get", AsyncMock(return_value="install")), \
+            patch("custom_components.ampster.coordinator.async_track_time_change", return_value=unsub_timer), \
+            patch("custom_components.ampster.coordinator.async_call_later"):
+        coordinators = []
+        for entry in entries:
+            token = current_entry.set(entry)
+            try:
+                coordinators.append(await registry.async_acquire(
+                    url, lambda: AmpsterDataUpdateCoordinator(hass, country_prefix="NL", base_url="https://example.com/")
+                ))
+            finally:
+                current_entry.reset(token)
+        assert coordinators[0] is coordinators[1]
+
+        # Unload the first entry as Home Assistant does: its unload callbacks, then async_unload_entry
+        for func in entries[0].on_unload:
+            result = func()
+            if inspect.isawaitable(result):
+                await result
+        await registry.async_release(coordinators[0])
+        unsub_timer.assert_not_called()
+        assert coordinators[1]._unsub_timer is unsub_timer
+
+        await registry.async_release(coordinators[1])
+        unsub_timer.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_coordinator_fetches_and_parses_feed():
+    """The real coordinator builds with a mocked hass and parses a fetched payload."""
+    url = "https://example.com/NL.json"
+    payload = {"country": "NL", "timestamp": "2025-06-21T10:00:00", "static_42": 42}
+    coordinator = make_coordinator(AmpsterDataUpdateCoordinator, DummySession({url: payload}), country_prefix="NL", base_url="https://example.com/")
+
+    assert coordinator.feed_key == url
+    with patch("custom_components.ampster.coordinator.async_call_later"):
+        data = await coordinator._async_update_data()
+
+    assert data == payload
+    assert coordinator.values["static_42"] == 42
+    assert coordinator.schedulers[url].publications
+    assert coordinator.circuit_breaker.consecutive_failures == 0
+
+@pytest.mark.asyncio
+async def test_multi_country_learns_publications_per_url():
+    """Each country feed gets its own publication history instead of one mixed cadence."""
+    urls = {"NL": "https://example.com/NL.json", "BE": "https://example.com/BE.json"}
+    session = DummySession({
+        urls["NL"]: {"country": "NL", "timestamp": "2025-06-21T10:00:00"},
+        urls["BE"]: {"country": "BE", "timestamp": "2025-06-21T10:20:00"},
+    })
+    coordinator = make_coordinator(AmpsterMultiCountryCoordinator, session, countries=["NL", "BE"], base_url="https://example.com/")
+
+    with patch("custom_components.ampster.coordinator.async_call_later"):
+        await coordinator._async_update_data()
+
+    assert set(coordinator.schedulers) == set(urls.values())
+    assert coordinator.schedulers[urls["BE"]].publications[0] - coordinator.schedulers[urls["NL"]].publications[0] == 1200
+
+def hourly_prices(start, count):
+    return [
+        {"period": (start + datetime.timedelta(hours=i)).isoformat(), "price": {"all_in_price": 0.1 * i}}
+        for i in range(count)
+    ]
+
+@pytest.mark.asyncio
+async def test_restored_snapshot_stays_available_until_it_expires():
+    """A failed fetch after a restore keeps the cached data while it still covers the current period."""
+    url = "https://example.com/NL.json"
+    now = datetime.datetime.now(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0)
+    coordinator = make_coordinator(AmpsterDataUpdateCoordinator, DummySession({url: RuntimeError("offline")}), country_prefix="NL", base_url="https://example.com/")
+    snapshot = {"feed": url, "data": {"country": "NL", "hourly_prices": hourly_prices(now - datetime.timedelta(hours=2), 6)}}
+    coordinator._store.async_load = AsyncMock(return_value=snapshot)
+
+    assert await coordinator.async_load_snapshot()
+    with patch("custom_components.ampster.coordinator.async_call_later"):
+        assert await coordinator._async_update_data() is snapshot["data"]
+
+        # Once the cached prices no longer cover now the failure is reported
+        snapshot["data"]["hourly_prices"] = hourly_prices(now - datetime.timedelta(hours=10), 6)
+        assert await coordinator.async_load_snapshot()
+        with pytest.raises(UpdateFailed):
+            await coordinator._async_update_data()
+
+@pytest.mark.asyncio
+async def test_multi_country_keeps_previous_payload_for_failed_country():
+    """One failing country keeps its last payload while the others are updated."""
+    urls = {"NL": "https://example.com/NL.json", "BE": "https://example.com/BE.json"}
+    session = DummySession({
+        urls["NL"]: {"country": "NL", "static_42": 1},
+        urls["BE"]: {"country": "BE", "static_42": 1},
+    })
+    coordinator = make_coordinator(AmpsterMultiCountryCoordinator, session, countries=["NL", "BE"], base_url="https://example.com/")
+
+    with patch("custom_components.ampster.coordinator.async_call_later"):
+        first = await coordinator._async_update_data()
+        coordinator.data = first
+        session.responses[urls["NL"]] = RuntimeError("offline")
+        session.responses[urls["BE"]] = {"country": "BE", "static_42": 2}
+        data = await coordinator._async_update_data()
+
+        assert data["NL"] is first["NL"]
+        assert data["BE"] == {"country": "BE", "static_42": 2}
+
+        # Every country failing fails the update, even with previous payloads to fall back on
+        coordinator.data = data
+        session.responses[urls["BE"]] = RuntimeError("offline")
+        with pytest.raises(UpdateFailed):
+            await coordinator._async_update_data()
+        assert coordinator.circuit_breaker.consecutive_failures == 1
+
+        coordinator.data = None
+        with pytest.raises(UpdateFailed):
+            await coordinator._async_update_data()
+
+@pytest.mark.asyncio
+async def test_key_listeners_only_fire_for_changed_keys():
+    url = "https://example.com/NL.json"
+    session = DummySession({url: {"country": "NL", "a": [1, 2], "b": {"x": 1}}})
+    coordinator = make_coordinator(AmpsterDataUpdateCoordinator, session, country_prefix="NL", base_url="https://example.com/")
+    fired = []
+    for key in ("a", "b", "c"):
+        coordinator.async_add_key_listener(key, lambda key=key: fired.append(key))
+
+    with patch("custom_components.ampster.coordinator.async_call_later"):
+        await coordinator.async_refresh()
+        assert sorted(fired) == ["a", "b"]
+
+        fired.clear()
+        session.responses[url] = {"country": "NL", "a": [1, 3], "b": {"x": 1}, "c": 1}
+        await coordinator.async_refresh()
+        assert coordinator.changed_keys == set()
+        assert sorted(fired) == ["a", "c"]
+
+        # A failed fetch flips availability, so every keyed listener writes its state
+        fired.clear()
+        session.responses[url] = RuntimeError("offline")
+        await coordinator.async_refresh()
+        assert sorted(fired) == ["a", "b", "c"]
@@ -0,0 +1,34 @@
+import pytest
+from custom_components.ampster.decoder import PayloadTooLarge, async_read_body, loads
+
+class DummyContent:
+    def __init__(self, chunks):
+        self._chunks = chunks
+    async def iter_chunked(self, size):
+        for chunk in self._chunks:
+            yield chunk
+
+class DummyResponse:
+    def __init__(self, chunks, content_length=None):
+        self.content = DummyContent(chunks)
+        self.content_length = content_length
+
+def test_loads_decodes_bytes():
+    assert loads(b'{"country": "NL", "hourly_prices": [1, 2]}') == {"country": "NL", "hourly_prices": [1, 2]}
+
+@pytest.mark.asyncio
+async def test_read_body_within_limit():
+    response = DummyResponse([b'{"a":', b' 1}'])
+    assert await async_read_body(response, max_bytes=100) == b'{"a": 1}'
+
+@pytest.mark.asyncio
+async def test_read_body_rejects_oversized_content_length():
+    response = DummyResponse([b"x" * 10], content_length=1000)
+    with pytest.raises(PayloadTooLarge):
+        await async_read_body(response, max_bytes=100)
+
+@pytest.mark.asyncio
+async def test_read_body_rejects_oversized_stream():
+    response = DummyResponse([b"x" * 60, b"x" * 60])
+    with pytest.raises(PayloadTooLarge):
+        await async_read_body(response, max_bytes=100)
@@ -0,0 +1,37 @@
+import gzip
+import json
+from custom_components.ampster.encoding import compress, encode_payload, to_columnar
+
+BATCH = {
+    "timestamp": "2025-06-20T10:15:00",
+    "type": "delta",
+    "sensors": {
+        "price": {"value": "0.25", "attributes": {"unit_of_measurement": "€/kWh"}},
+        "count": {"value": "42"},
+        "country": {"value": "NL"},
+    },
+}
+
+def test_to_columnar():
+    """Columnar batches carry parallel arrays, numeric states as numbers and the extra keys."""
+    columnar = to_columnar(BATCH)
+    assert columnar["entities"] == ["price", "count", "country"]
+    assert columnar["values"] == [0.25, 42, "NL"]
+    assert columnar["attributes"] == [{"unit_of_measurement": "€/kWh"}, None, None]
+    assert isinstance(columnar["ts"], float)
+    assert columnar["type"] == "delta"
+
+def test_encode_and_compress():
+    """Encoded bodies decode back to the batch and gzip bodies decompress to the same bytes."""
+    body, headers = encode_payload(BATCH, "json")
+    assert json.loads(body) == BATCH
+    assert headers["Content-Type"] == "application/json"
+
+    body, headers = encode_payload(BATCH, "columnar")
+    assert headers["X-Ampster-Encoding"] == "columnar"
+    assert json.loads(body)["entities"] == ["price", "count", "country"]
+
+    compressed, content_encoding = compress(body, "gzip")
+    assert content_encoding == "gzip"
+    assert gzip.decompress(compressed) == body
+    assert compress(body, "none") == (body, None)
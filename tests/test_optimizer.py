@@ -0,0 +1,34 @@
+import itertools
+from custom_components.ampster.optimizer import ACTION_CHARGE, ACTION_DISCHARGE, ACTION_IDLE, plan_battery
+
+def test_charges_cheap_and_discharges_expensive():
+    plan = plan_battery([0.10, 0.10, 0.40, 0.40], period_hours=1, capacity_kwh=10, soc_kwh=0,
+                        max_charge_kw=5, max_discharge_kw=5, efficiency=1.0, steps=10, terminal_price=0)
+    assert [action for action, _, _ in plan["actions"]] == [ACTION_CHARGE, ACTION_CHARGE, ACTION_DISCHARGE, ACTION_DISCHARGE]
+    assert plan["actions"][1][2] == 10
+    assert abs(plan["cost"] - (-3.0)) < 1e-9
+
+def test_flat_prices_keep_battery_idle():
+    plan = plan_battery([0.25] * 8, period_hours=1, capacity_kwh=10, soc_kwh=5,
+                        max_charge_kw=5, max_discharge_kw=5, efficiency=0.9, steps=10)
+    assert all(action == ACTION_IDLE for action, _, _ in plan["actions"])
+
+def test_matches_brute_force_on_small_problem():
+    prices = [0.30, 0.05, 0.45, 0.10, 0.50]
+    steps, step_kwh, eff = 4, 1.0, 0.81
+    one_way = eff ** 0.5
+    plan = plan_battery(prices, period_hours=1, capacity_kwh=4, soc_kwh=2, max_charge_kw=2,
+                        max_discharge_kw=2, efficiency=eff, steps=steps, terminal_price=0)
+
+    best = None
+    for moves in itertools.product(range(-2, 3), repeat=len(prices)):
+        level, cost, feasible = 2, 0.0, True
+        for price, move in zip(prices, moves):
+            if not 0 <= level + move <= steps or (move > 0 and move / one_way > 2) or (move < 0 and -move * one_way > 2):
+                feasible = False
+                break
+            level += move
+            cost += price * (move * step_kwh / one_way if move > 0 else move * step_kwh * one_way)
+        if feasible and (best is None or cost < best):
+            best = cost
+    assert abs(plan["cost"] - best) < 1e-9
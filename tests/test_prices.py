@@ -0,0 +1,33 @@
+import datetime
+from custom_components.ampster.prices import PriceSeries
+
+TZ = datetime.timezone(datetime.timedelta(hours=2))
+
+def make_payload():
+    # Deliberately unsorted, with naive local timestamps like the live feed
+    return {
+        "current_period": "2025-06-20T10:00:00",
+        "hourly_prices": [
+            {"period": f"2025-06-20T{hour:02d}:00:00", "price": {"all_in_price": hour / 100}}
+            for hour in (12, 9, 11, 10)
+        ],
+    }
+
+def test_price_series_lookup():
+    series = PriceSeries.from_payload(make_payload(), TZ)
+    assert len(series) == 4
+    assert list(series.prices) == [0.09, 0.10, 0.11, 0.12]
+    assert series.period_seconds == 3600
+
+    now = datetime.datetime(2025, 6, 20, 10, 30, tzinfo=TZ)
+    assert series.price_at(now) == 0.10
+    assert series.current(now).start == series.current_period_start
+    assert series.next(now).price == 0.11
+    assert [p.price for p in series.upcoming(now, 5)] == [0.10, 0.11, 0.12]
+    assert series.price_at(datetime.datetime(2025, 6, 20, 13, 0, tzinfo=TZ)) is None
+
+def test_price_series_ignores_malformed_entries():
+    payload = {"hourly_prices": [{"period": "not a date", "price": 1}, {"period": "2025-06-20T09:00:00"}, "x"]}
+    series = PriceSeries.from_payload(payload, TZ)
+    assert len(series) == 0
+    assert series.current_period_start is None
@@ -0,0 +1,42 @@
+from custom_components.ampster.projection import AttributeProjection, parse_attribute_rules
+
+ATTRIBUTES = {
+    "unit_of_measurement": "€/kWh",
+    "friendly_name": "Price",
+    "icon": "mdi:cash",
+    "full_value": [{"period": "2025-06-20T10:00:00", "price": 0.25}] * 50,
+}
+
+def test_parse_attribute_rules():
+    assert parse_attribute_rules("icon, price:count ,") == ({"icon"}, {"price": {"count"}})
+
+def test_allow_and_deny_lists():
+    """Per-entity allow-lists replace the global one; deny-lists always apply."""
+    projection = AttributeProjection(
+        ["price", "power"],
+        allow="unit_of_measurement,friendly_name,price:full_value,price:icon",
+        deny="friendly_name,price:icon",
+    )
+    assert projection.project("price", ATTRIBUTES) == {"full_value": ATTRIBUTES["full_value"]}
+    assert projection.project("power", ATTRIBUTES) == {"unit_of_measurement": "€/kWh"}
+
+    deny_only = AttributeProjection(["price"], deny="icon,full_value")
+    assert deny_only.project("price", ATTRIBUTES) == {"unit_of_measurement": "€/kWh", "friendly_name": "Price"}
+
+def test_values_only_and_size_cap():
+    assert AttributeProjection(["price"], values_only=True).project("price", ATTRIBUTES) is None
+
+    capped = AttributeProjection(["price"], max_bytes=4)
+    projected = capped.project("price", ATTRIBUTES)
+    assert projected["friendly_name"] == "Pric"
+    assert "full_value" not in projected
+    assert projected["_omitted"] == ["full_value"]
+    # The cap counts UTF-8 bytes and never splits a character: "€" is 3 bytes
+    assert projected["unit_of_measurement"] == "€/"
+    assert AttributeProjection(["price"], max_bytes=2).project("price", ATTRIBUTES)["unit_of_measurement"] == ""
+
+def test_attributes_changed_ignores_filtered_attributes():
+    projection = AttributeProjection(["price"], deny="icon")
+    changed_icon = dict(ATTRIBUTES, icon="mdi:currency-eur")
+    assert not projection.attributes_changed("price", ATTRIBUTES, changed_icon)
+    assert projection.attributes_changed("price", ATTRIBUTES, dict(ATTRIBUTES, friendly_name="Other"))
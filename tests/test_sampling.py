@@ -0,0 +1,24 @@
+import math
+from custom_components.ampster.sampling import SampleBuffer, numeric_state
+
+def test_numeric_state():
+    assert numeric_state("1.5") == 1.5
+    assert math.isnan(numeric_state("unavailable"))
+    assert math.isnan(numeric_state(None))
+    assert math.isnan(numeric_state("inf"))
+
+def test_sample_buffer_overwrites_oldest_and_drains():
+    """A full buffer drops the oldest sample; drain returns samples oldest first and empties it."""
+    buffer = SampleBuffer(["a", "b"], 3)
+    for i in range(5):
+        buffer.add(1000.0 + i, [float(i), float("nan") if i == 3 else 10.0 * i])
+    assert len(buffer) == 3
+    assert buffer.overwritten == 2
+
+    samples = buffer.drain()
+    assert samples["timestamps"] == [1002.0, 1003.0, 1004.0]
+    assert samples["values"] == {"a": [2.0, 3.0, 4.0], "b": [20.0, None, 40.0]}
+    assert len(buffer) == 0
+
+    buffer.add(2000.0, [1.0, 2.0])
+    assert buffer.drain()["timestamps"] == [2000.0]
@@ -0,0 +1,37 @@
+from custom_components.ampster.scheduler import PublicationScheduler
+
+DAY = 86400
+PUBLISHED = 13 * 3600  # day-ahead prices appear around 13:00
+
+def make_scheduler():
+    scheduler = PublicationScheduler(window=1800, dense_interval=60, idle_interval=3 * 3600, grace=30)
+    for day in range(3):
+        assert scheduler.record(day * DAY + PUBLISHED)
+    return scheduler
+
+def test_unknown_cadence_keeps_fixed_schedule():
+    scheduler = PublicationScheduler()
+    scheduler.record(PUBLISHED)
+    assert scheduler.interval is None
+    assert scheduler.next_poll(PUBLISHED + 60) is None
+
+def test_record_ignores_repeated_publication():
+    scheduler = make_scheduler()
+    assert not scheduler.record(2 * DAY + PUBLISHED)
+    assert scheduler.interval == DAY
+
+def test_polls_rarely_then_densely_around_publication():
+    scheduler = make_scheduler()
+    expected = 3 * DAY + PUBLISHED
+    # Far from the publication: capped by the idle interval
+    now = expected - 10 * 3600
+    assert scheduler.next_poll(now) == now + 3 * 3600
+    # Shortly before: first poll just after the expected publication
+    now = expected - 600
+    assert scheduler.next_poll(now) == expected + 30
+    # Inside the window without a new file yet: poll every minute
+    now = expected + 300
+    assert scheduler.next_poll(now) == now + 60
+    # Window passed without a publication: back to rare polls until the next cycle
+    now = expected + 3600
+    assert scheduler.next_poll(now) == now + 3 * 3600
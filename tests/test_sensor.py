@@ -0,0 +1,88 @@
+import datetime
+import pytest
+from unittest.mock import MagicMock, patch
+from custom_components.ampster.const import KEY_SENSOR_REMOVE_AFTER
+from custom_components.ampster.prices import PriceSeries
+from custom_components.ampster.sensor import AmpsterCountryPriceSensor, AmpsterSensor, KeySensorManager, project_value
+
+class DummyCoordinator:
+    last_update_success = True
+    def __init__(self, data):
+        self.data = data
+        self.values = dict(data)
+
+@pytest.mark.asyncio
+async def test_key_sensors_follow_payload_keys():
+    """New keys get a sensor; a missing key is unavailable and only removed after several payloads."""
+    coordinator = DummyCoordinator({"a": 1, "b": 2})
+    added = []
+    registry = MagicMock()
+    registry.async_get_entity_id.return_value = "sensor.ampster_b"
+    manager = KeySensorManager(MagicMock(), coordinator, added.extend)
+    assert set(manager.sensors) == {"a", "b"}
+
+    with patch("custom_components.ampster.sensor.er.async_get", return_value=registry):
+        coordinator.data = {"a": 1, "c": 3}
+        manager.async_sync()
+        assert [sensor._key for sensor in added] == ["c"]
+        assert not manager.sensors["b"].available
+        assert manager.sensors["a"].available
+
+        # The same payload again (e.g. a 304) does not count
+        manager.async_sync()
+        for i in range(KEY_SENSOR_REMOVE_AFTER - 2):
+            coordinator.data = {"a": i, "c": 3}
+            manager.async_sync()
+        registry.async_remove.assert_not_called()
+
+        coordinator.data = {"a": 1, "c": 3}
+        manager.async_sync()
+        registry.async_remove.assert_called_once_with("sensor.ampster_b")
+        assert set(manager.sensors) == {"a", "c"}
+
+@pytest.mark.asyncio
+async def test_key_sensor_returning_resets_the_count():
+    coordinator = DummyCoordinator({"a": 1, "b": 2})
+    registry = MagicMock()
+    manager = KeySensorManager(MagicMock(), coordinator, lambda entities: None)
+
+    with patch("custom_components.ampster.sensor.er.async_get", return_value=registry):
+        for i in range(KEY_SENSOR_REMOVE_AFTER * 2):
+            coordinator.data = {"a": i} if i % 2 == 0 else {"a": i, "b": 2}
+            manager.async_sync()
+    registry.async_remove.assert_not_called()
+    assert manager.sensors["b"].available
+
+def test_project_value_summarizes_lists_and_dicts():
+    assert project_value([5, 6, 7, 8], 2) == {"count": 4, "min": 5, "max": 8, "next": [5, 6]}
+    assert project_value([5, 6, 7, 8], 2, 3)["next"] == [8]
+    assert project_value({"a": 1, "b": 2}, 1) == {"count": 2, "keys": ["a"]}
+
+def test_price_list_next_starts_at_current_period():
+    """The hourly_prices sensor slices "next" from the series' current period and schedules the rollover."""
+    start = datetime.datetime.now(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0) - datetime.timedelta(hours=10)
+    prices = [{"period": (start + datetime.timedelta(hours=i)).isoformat(), "price": {"all_in_price": i}} for i in range(24)]
+    coordinator = DummyCoordinator({"hourly_prices": prices})
+    coordinator.series = PriceSeries.from_payload(coordinator.data)
+    sensor = AmpsterSensor(coordinator, "hourly_prices", prices, 3)
+    sensor.hass = MagicMock()
+
+    with patch("custom_components.ampster.sensor.async_track_point_in_utc_time") as track:
+        sensor._handle_update()
+    attributes = sensor.extra_state_attributes
+    assert [item["price"]["all_in_price"] for item in attributes["next"]] == [10, 11, 12]
+    assert (attributes["count"], attributes["min"], attributes["max"]) == (24, 0, 23)
+    assert track.call_args[0][2] == start + datetime.timedelta(hours=11)
+
+def test_country_price_follows_the_series():
+    """The country sensor reads the current period from the series and schedules the next rollover."""
+    start = datetime.datetime.now(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0).timestamp() - 3600
+    coordinator = DummyCoordinator({"BE": {"timestamp": "2025-01-01T00:00:00"}})
+    coordinator.series_by_country = {"BE": PriceSeries([start + 3600 * i for i in range(3)], [0.1, 0.2, 0.3])}
+    sensor = AmpsterCountryPriceSensor(coordinator, "BE")
+    sensor.hass = MagicMock()
+
+    with patch("custom_components.ampster.sensor.async_track_point_in_utc_time") as track:
+        sensor._recalculate_and_schedule_rollover()
+    assert sensor.native_value == 0.2
+    assert track.call_args[0][2].timestamp() == start + 7200
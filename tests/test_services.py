@@ -0,0 +1,80 @@
+import time
+import types
+import pytest
+import voluptuous as vol
+from unittest.mock import AsyncMock, MagicMock
+from homeassistant.exceptions import ServiceValidationError
+from custom_components.ampster.const import DOMAIN, PLAN_MAX_HORIZON, PLAN_MAX_SOC_STEPS
+from custom_components.ampster.prices import PriceSeries
+from custom_components.ampster.services import PLAN_BATTERY_SCHEMA, SERVICE_GET_VALUE, SERVICE_PLAN_BATTERY, async_setup_services
+
+class DummyServices:
+    def __init__(self):
+        self.handlers = {}
+        self.schemas = {}
+    def has_service(self, domain, service):
+        return service in self.handlers
+    def async_register(self, domain, service, handler, schema=None, supports_response=None):
+        self.handlers[service] = handler
+        self.schemas[service] = schema
+
+class DummyCoordinator:
+    country_prefix = "NL"
+    def __init__(self, prices):
+        start = time.time() // 3600 * 3600
+        self.series = PriceSeries([start + 3600 * i for i in range(len(prices))], prices)
+        self.data = {}
+
+async def setup(coordinator):
+    hass = MagicMock()
+    hass.services = DummyServices()
+    hass.data = {DOMAIN: {"entry": coordinator}}
+    hass.config_entries.async_entries.return_value = [types.SimpleNamespace(entry_id="entry")]
+    hass.async_add_executor_job = AsyncMock(side_effect=lambda func, *args: func(*args))
+    await async_setup_services(hass)
+    async def call(service, **data):
+        schema = hass.services.schemas[service]
+        return await hass.services.handlers[service](types.SimpleNamespace(data=schema(data)))
+    call.hass = hass
+    return call
+
+@pytest.mark.asyncio
+async def test_get_value_returns_the_full_value():
+    coordinator = DummyCoordinator([0.1])
+    coordinator.data = {"hourly_prices": list(range(48))}
+    call = await setup(coordinator)
+    assert await call(SERVICE_GET_VALUE, key="hourly_prices") == {"key": "hourly_prices", "value": list(range(48))}
+    with pytest.raises(ServiceValidationError):
+        await call(SERVICE_GET_VALUE, key="missing", entry_id="entry")
+
+@pytest.mark.asyncio
+async def test_plan_battery_rejects_empty_soc_range():
+    call = await setup(DummyCoordinator([0.1, 0.3]))
+    with pytest.raises(ServiceValidationError):
+        await call(SERVICE_PLAN_BATTERY, entry_id="entry", capacity_kwh=10, max_charge_kw=5,
+                   max_discharge_kw=5, soc=50, min_soc=80, max_soc=80)
+
+@pytest.mark.asyncio
+async def test_plan_battery_cache_shares_soc_steps():
+    """Socs within the same step reuse the cached plan; out-of-range socs plan from the nearest limit."""
+    call = await setup(DummyCoordinator([0.1, 0.4, 0.1, 0.4]))
+    base = dict(entry_id="entry", capacity_kwh=10, max_charge_kw=5, max_discharge_kw=5, soc_steps=10)
+    first = await call(SERVICE_PLAN_BATTERY, soc=50, **base)
+    assert await call(SERVICE_PLAN_BATTERY, soc=51, **base) is first
+    assert await call(SERVICE_PLAN_BATTERY, soc=60, **base) is not first
+
+    clamped = await call(SERVICE_PLAN_BATTERY, soc=5, min_soc=20, **base)
+    assert await call(SERVICE_PLAN_BATTERY, soc=20, min_soc=20, **base) is clamped
+    assert PLAN_BATTERY_SCHEMA({**base, "soc": 5})["min_soc"] == 0
+
+@pytest.mark.asyncio
+async def test_plan_battery_solves_in_the_executor_within_limits():
+    call = await setup(DummyCoordinator([0.1, 0.4] * 150))
+    base = dict(entry_id="entry", capacity_kwh=10, max_charge_kw=5, max_discharge_kw=5, soc=50)
+    plan = await call(SERVICE_PLAN_BATTERY, **base)
+    call.hass.async_add_executor_job.assert_awaited_once()
+    assert len(plan["schedule"]) == PLAN_MAX_HORIZON
+
+    for key, value in (("soc_steps", PLAN_MAX_SOC_STEPS + 1), ("horizon", PLAN_MAX_HORIZON + 1)):
+        with pytest.raises(vol.Invalid):
+            PLAN_BATTERY_SCHEMA({**base, key: value})
@@ -0,0 +1,85 @@
+import os
+import pytest
+from unittest.mock import patch
+from custom_components.ampster.spool import UploadSpool
+
+class DummyHass:
+    async def async_add_executor_job(self, func, *args):
+        return func(*args)
+
+@pytest.mark.asyncio
+async def test_spool_replays_in_order_and_survives_restart(tmp_path):
+    """Batches replay in order, stop at the first failure and resume after a reload."""
+    spool = UploadSpool(DummyHass(), str(tmp_path), 100, 10000, 3600)
+    await spool.async_load()
+    for i in range(10):
+        await spool.async_append({"i": i, "pad": "x" * 20})
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".jsonl")]) > 1
+
+    sent = []
+    async def send(payload):
+        sent.append(payload["i"])
+        return payload["i"] != 4
+
+    assert await spool.async_replay(send, 3) == 4
+    assert sent == [0, 1, 2, 3, 4]
+
+    reloaded = UploadSpool(DummyHass(), str(tmp_path), 100, 10000, 3600)
+    await reloaded.async_load()
+    sent.clear()
+    assert await reloaded.async_replay(send, 3) == 0
+    assert sent == [4]
+
+    async def send_ok(payload):
+        sent.append(payload["i"])
+        return True
+
+    sent.clear()
+    assert await reloaded.async_replay(send_ok, 3) == 6
+    assert sent == [4, 5, 6, 7, 8, 9]
+    assert reloaded.backlog == 0
+
+@pytest.mark.asyncio
+async def test_spool_backlog_counts_bytes(tmp_path):
+    """The backlog is the byte size of the undelivered batches."""
+    spool = UploadSpool(DummyHass(), str(tmp_path), 1000, 10000, 3600)
+    await spool.async_load()
+    for i in range(3):
+        await spool.async_append({"i": i})
+    on_disk = sum(os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path) if name.endswith(".jsonl"))
+    assert spool.backlog == on_disk == 3 * len('{"i":0}\n')
+
+@pytest.mark.asyncio
+async def test_spool_evicts_oldest_when_full(tmp_path):
+    """The oldest segments are dropped once the spool exceeds its size limit."""
+    spool = UploadSpool(DummyHass(), str(tmp_path), 50, 120, 3600)
+    await spool.async_load()
+    for i in range(10):
+        await spool.async_append({"i": i, "pad": "x" * 20})
+    assert spool.backlog <= 120
+
+    sent = []
+    async def send(payload):
+        sent.append(payload["i"])
+        return True
+
+    await spool.async_replay(send, 5)
+    assert sent == sorted(sent)
+    assert sent[-1] == 9
+    assert 0 not in sent
+
+@pytest.mark.asyncio
+async def test_spool_age_counts_from_first_batch(tmp_path):
+    """A segment that keeps receiving batches still expires max_age after its first one, also after a reload."""
+    spool = UploadSpool(DummyHass(), str(tmp_path), 10000, 10000, 3600)
+    now = [1750000000.0]
+    with patch("custom_components.ampster.spool.time.time", lambda: now[0]):
+        await spool.async_load()
+        for i in range(4):
+            await spool.async_append({"i": i})
+            now[0] += 1000
+        assert spool.backlog > 0
+
+        reloaded = UploadSpool(DummyHass(), str(tmp_path), 10000, 10000, 3600)
+        await reloaded.async_load()
+        assert reloaded.backlog == 0
@@ -0,0 +1,74 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from custom_components.ampster.transport import UploadTransport, parse_endpoints, parse_retry_after
+
+def test_parse_retry_after():
+    assert parse_retry_after("120") == 120
+    assert parse_retry_after("Sat, 21 Jun 2025 10:02:00 GMT", now=1750500000) == 120
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+def test_parse_endpoints():
+    endpoints = parse_endpoints(
+        "https://a.example/api|key-a, https://b.example/api|key-b|columnar|zstd, https://c.example/api, "
+        "https://d.example/api|key-d|xml",
+        "json", "gzip",
+    )
+    assert endpoints == [
+        ("https://a.example/api", "key-a", "json", "gzip"),
+        ("https://b.example/api", "key-b", "columnar", "zstd"),
+        ("https://d.example/api", "key-d", "json", "gzip"),
+    ]
+    assert parse_endpoints("") == []
+
+@pytest.mark.asyncio
+async def test_transport_honors_retry_after():
+    """A 429 with Retry-After backs the endpoint off; no requests are made until it has passed."""
+    transport = UploadTransport(MagicMock(), "https://example.com/api", "test-key")
+
+    with patch('aiohttp.ClientSession') as mock_session:
+        session = mock_session.return_value
+        session.closed = False
+        mock_response = AsyncMock()
+        mock_response.status = 429
+        mock_response.headers = {"Retry-After": "600"}
+        session.post.return_value.__aenter__.return_value = mock_response
+
+        assert await transport.async_post({"sensors": {}}) is False
+        assert transport.backoff_remaining > 590
+        assert transport.stats["throttled"] == 1
+
+        assert await transport.async_post({"sensors": {}}) is False
+        assert session.post.call_count == 1
+
+class DummyHass:
+    async def async_add_executor_job(self, func, *args):
+        return func(*args)
+    def async_create_background_task(self, coro, name):
+        return asyncio.ensure_future(coro)
+
+@pytest.mark.asyncio
+async def test_close_cancels_a_running_replay(tmp_path):
+    """Closing the transport stops a replay in flight and no new session is opened afterwards."""
+    transport = UploadTransport(DummyHass(), "https://example.com/api", "test-key")
+    with patch('aiohttp.ClientSession') as mock_session:
+        await transport.async_open(str(tmp_path))
+        mock_session.return_value.closed = False
+        mock_session.return_value.close = AsyncMock()
+        await transport._spool.async_append({"sensors": {}})
+
+        started = asyncio.Event()
+        async def slow_post(data, encoded=None):
+            started.set()
+            await asyncio.sleep(3600)
+        with patch.object(transport, "_async_post", slow_post):
+            transport._replay_later(None)
+            await started.wait()
+            await transport.async_close()
+
+        assert transport._replay_task is None
+        assert await transport.async_post({"sensors": {}}) is False
+        with pytest.raises(RuntimeError):
+            transport._get_session()
+        assert mock_session.call_count == 1
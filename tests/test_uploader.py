@@ -1,3 +1,4 @@
+import time
 import pytest
 import aiohttp
 from unittest.mock import AsyncMock, MagicMock, patch
@@ -56,3 +57,379 @@ async def test_ampster_data_uploader_manual_upload():
         
         # Verify the session was used
         mock_session.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_ampster_data_uploader_reuses_session():
+    """The pooled session is created once, reused across uploads and closed on stop."""
+    hass = DummyHass()
+    mock_state = MagicMock()
+    mock_state.state = "42"
+    mock_state.attributes = {}
+    hass.states.get.return_value = mock_state
+
+    uploader = AmpsterDataUploader(
+        hass=hass,
+        upload_url="https://example.com/api",
+        api_key="test-key",
+        upload_sensors="test_sensor",
+        upload_interval=15
+    )
+
+    with patch('aiohttp.ClientSession') as mock_session:
+        session = mock_session.return_value
+        session.closed = False
+        session.close = AsyncMock()
+        mock_response = AsyncMock()
+        mock_response.status = 200
+        mock_response.headers = {}
+        session.post.return_value.__aenter__.return_value = mock_response
+
+        await uploader.async_upload_now()
+        await uploader.async_upload_now()
+        mock_session.assert_called_once()
+        assert session.post.call_count == 2
+
+        await uploader.async_stop()
+        session.close.assert_awaited_once()
+        assert uploader.transport._session is None
+
+@pytest.mark.asyncio
+async def test_ampster_data_uploader_resolves_names_once():
+    """Names are resolved once and only re-resolved after a candidate entity appears."""
+    hass = DummyHass()
+    states = {"sensor.ampster_price": MagicMock(state="0.25", attributes={})}
+    hass.states.get.side_effect = states.get
+
+    uploader = AmpsterDataUploader(
+        hass=hass,
+        upload_url="https://example.com/api",
+        api_key="test-key",
+        upload_sensors="price",
+        upload_interval=15
+    )
+
+    with patch('aiohttp.ClientSession'):
+        await uploader.async_upload_now()
+        assert uploader._entities == [("price", "sensor.ampster_price")]
+        # Three candidate probes plus the state read
+        assert hass.states.get.call_count == 4
+
+        await uploader.async_upload_now()
+        assert hass.states.get.call_count == 5
+
+        # A higher priority candidate shows up
+        states["sensor.price"] = MagicMock(state="0.30", attributes={})
+        event = MagicMock()
+        event.data = {"entity_id": "sensor.price", "old_state": None, "new_state": states["sensor.price"]}
+        uploader._async_candidate_changed(event)
+        await uploader.async_upload_now()
+        assert uploader._entities == [("price", "sensor.price")]
+
+@pytest.mark.asyncio
+async def test_ampster_data_uploader_delta_mode():
+    """Delta mode sends a keyframe first, then only the entities that changed."""
+    hass = DummyHass()
+    old_state = MagicMock(state="1", attributes={"unit": "kW"})
+    states = {
+        "sensor.power": MagicMock(state="2", attributes={"unit": "kW"}),
+        "sensor.energy": MagicMock(state="10", attributes={"unit": "kWh"}),
+    }
+    hass.states.get.side_effect = states.get
+
+    uploader = AmpsterDataUploader(
+        hass=hass,
+        upload_url="https://example.com/api",
+        api_key="test-key",
+        upload_sensors="sensor.power,sensor.energy",
+        upload_interval=15,
+        upload_mode="delta"
+    )
+    uploader.transport.async_send = AsyncMock(return_value=True)
+
+    await uploader._async_upload_data()
+    data = uploader.transport.async_send.call_args[0][0]
+    assert data["type"] == "keyframe"
+    assert set(data["sensors"]) == {"sensor.power", "sensor.energy"}
+
+    # Nothing changed: nothing is sent
+    await uploader._async_upload_data()
+    assert uploader.transport.async_send.call_count == 1
+
+    event = MagicMock()
+    event.data = {"entity_id": "sensor.power", "old_state": old_state, "new_state": states["sensor.power"]}
+    uploader._async_candidate_changed(event)
+    uploader.transport.async_send.return_value = False
+    await uploader._async_upload_data()
+    data = uploader.transport.async_send.call_args[0][0]
+    assert data["type"] == "delta"
+    assert data["sensors"] == {"sensor.power": {"value": "2"}}
+    # The failed delta is kept for the next upload
+    assert uploader._changes == {"sensor.power": False}
+
+@pytest.mark.asyncio
+async def test_ampster_data_uploader_ships_samples():
+    """Samples taken between uploads are shipped together with the next upload."""
+    hass = DummyHass()
+    power = MagicMock(state="100", attributes={})
+    hass.states.get.side_effect = {"sensor.power": power}.get
+
+    uploader = AmpsterDataUploader(
+        hass=hass,
+        upload_url="https://example.com/api",
+        api_key="test-key",
+        upload_sensors="sensor.power",
+        upload_interval=1,
+        sample_interval=10
+    )
+    uploader.transport.async_send = AsyncMock(return_value=True)
+    assert uploader._samples.capacity == 7
+
+    uploader._async_sample()
+    power.state = "unavailable"
+    uploader._async_sample()
+    await uploader._async_upload_data()
+
+    data = uploader.transport.async_send.call_args[0][0]
+    assert len(data["samples"]["timestamps"]) == 2
+    assert data["samples"]["values"] == {"sensor.power": [100.0, None]}
+    assert len(uploader._samples) == 0
+
+@pytest.mark.asyncio
+async def test_ampster_data_uploader_single_flight():
+    """A trigger arriving while an upload is in flight joins it instead of posting again."""
+    import asyncio
+
+    hass = DummyHass()
+    hass.states.get.return_value = MagicMock(state="42", attributes={})
+
+    uploader = AmpsterDataUploader(
+        hass=hass,
+        upload_url="https://example.com/api",
+        api_key="test-key",
+        upload_sensors="test_sensor",
+        upload_interval=15
+    )
+    release = asyncio.Event()
+
+    async def slow_send(data, encoded=None):
+        await release.wait()
+        return True
+
+    uploader.transport.async_send = AsyncMock(side_effect=slow_send)
+    tick = asyncio.ensure_future(uploader._async_upload_data())
+    await asyncio.sleep(0)
+    press = asyncio.ensure_future(uploader.async_upload_now())
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(tick, press)
+
+    assert uploader.transport.async_send.call_count == 1
+
+@pytest.mark.asyncio
+async def test_ampster_data_uploader_upload_now_during_delta_sends_keyframe():
+    """Upload Now pressed while a delta upload is in flight sends a keyframe right after it."""
+    import asyncio
+
+    hass = DummyHass()
+    hass.states.get.return_value = MagicMock(state="42", attributes={})
+
+    uploader = AmpsterDataUploader(
+        hass=hass,
+        upload_url="https://example.com/api",
+        api_key="test-key",
+        upload_sensors="test_sensor",
+        upload_interval=15,
+        upload_mode="delta"
+    )
+    uploader._last_keyframe = time.monotonic()
+    uploader._changes = {"test_sensor": False}
+    release = asyncio.Event()
+
+    async def slow_send(data, encoded=None):
+        await release.wait()
+        return True
+
+    uploader.transport.async_send = AsyncMock(side_effect=slow_send)
+    tick = asyncio.ensure_future(uploader._async_upload_data())
+    await asyncio.sleep(0)
+    press = asyncio.ensure_future(uploader.async_upload_now())
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(tick, press)
+
+    sent = [call[0][0]["type"] for call in uploader.transport.async_send.call_args_list]
+    assert sent == ["delta", "keyframe"]
+
+@pytest.mark.asyncio
+async def test_ampster_data_uploader_slot_offset():
+    """The upload offset is stable per entry id, within the interval, and a server hint overrides it."""
+    def make(seed):
+        return AmpsterDataUploader(
+            hass=DummyHass(),
+            upload_url="https://example.com/api",
+            api_key="test-key",
+            upload_sensors="test_sensor",
+            upload_interval=15,
+            slot_seed=seed
+        )
+
+    uploader = make("entry-1")
+    assert 0 <= uploader.slot_offset < 900
+    assert uploader.slot_offset == make("entry-1").slot_offset
+    assert len({make(f"entry-{i}").slot_offset for i in range(20)}) > 1
+
+    uploader.transport.slot_hint = 960
+    assert uploader._current_offset() == 60
+
+@pytest.mark.asyncio
+async def test_ampster_data_uploader_moves_timer_on_slot_hint():
+    """A slot hint received during an upload moves the already scheduled next upload."""
+    hass = DummyHass()
+    hass.states.get.return_value = MagicMock(state="42", attributes={})
+    uploader = AmpsterDataUploader(
+        hass=hass,
+        upload_url="https://example.com/api",
+        api_key="test-key",
+        upload_sensors="test_sensor",
+        upload_interval=15,
+        slot_seed="entry-1"
+    )
+
+    async def send(data, encoded=None):
+        uploader.transport.slot_hint = (uploader.slot_offset + 300) % 900
+        return True
+
+    uploader.transport.async_send = AsyncMock(side_effect=send)
+    with patch("custom_components.ampster.uploader.async_track_point_in_utc_time") as track:
+        await uploader._async_slot_upload(None)
+    assert track.call_count == 2
+    first, second = (call[0][2].timestamp() for call in track.call_args_list)
+    assert second % 900 == pytest.approx((uploader.slot_offset + 300) % 900)
+    assert first % 900 == pytest.approx(uploader.slot_offset)
+
+@pytest.mark.asyncio
+async def test_ampster_data_uploader_fans_out():
+    """Each batch is encoded once per encoding and sent to every endpoint; a slow extra endpoint does not hold up the upload."""
+    import asyncio
+
+    hass = DummyHass()
+    hass.states.get.return_value = MagicMock(state="42", attributes={})
+    hass.async_create_background_task = lambda coro, name: asyncio.ensure_future(coro)
+
+    uploader = AmpsterDataUploader(
+        hass=hass,
+        upload_url="https://example.com/api",
+        api_key="test-key",
+        upload_sensors="test_sensor",
+        upload_interval=15,
+        extra_endpoints="https://archive.example.com/api|archive-key, https://other.example.com/api|other-key|columnar"
+    )
+    primary, archive, other = uploader.transports
+    assert (archive.url, archive.api_key, archive.encoding) == ("https://archive.example.com/api", "archive-key", "json")
+    assert other.encoding == "columnar"
+
+    release = asyncio.Event()
+
+    async def slow_send(data, encoded=None):
+        await release.wait()
+        return True
+
+    for transport in uploader.transports:
+        transport.async_encode = AsyncMock(wraps=transport.async_encode)
+    primary.async_send = AsyncMock(return_value=True)
+    other.async_send = AsyncMock(return_value=True)
+    archive.async_send = AsyncMock(side_effect=slow_send)
+
+    await uploader._async_upload_data()
+
+    # json is encoded once for the primary and the archive endpoint, columnar once
+    assert primary.async_encode.call_count == 1
+    assert archive.async_encode.call_count == 0
+    assert other.async_encode.call_count == 1
+    assert primary.async_send.call_args[0][1] is archive.async_send.call_args[0][1]
+    for _ in range(3):
+        await asyncio.sleep(0)
+    # The columnar endpoint is done while the archive endpoint is still sending
+    assert other.async_send.call_count == 1
+    assert len(uploader._fanout_tasks) == 1
+    release.set()
+    for _ in range(3):
+        await asyncio.sleep(0)
+    assert not uploader._fanout_tasks
+
+@pytest.mark.asyncio
+async def test_ampster_data_uploader_endpoint_dedupe_and_encode_failure():
+    """Duplicate endpoint URLs are ignored; a batch that cannot be encoded is dropped without a backoff."""
+    hass = DummyHass()
+    hass.states.get.return_value = MagicMock(state="42", attributes={})
+    uploader = AmpsterDataUploader(
+        hass=hass,
+        upload_url="https://example.com/api",
+        api_key="test-key",
+        upload_sensors="test_sensor",
+        upload_interval=15,
+        extra_endpoints="https://example.com/api|other-key, https://archive.example.com/api|a, https://archive.example.com/api|b"
+    )
+    assert [transport.url for transport in uploader.transports] == ["https://example.com/api", "https://archive.example.com/api"]
+
+    uploader.transports = [uploader.transport]
+    uploader.transport.async_encode = AsyncMock(side_effect=ValueError("boom"))
+    uploader.transport.async_send = AsyncMock(return_value=True)
+    await uploader._async_upload_data()
+    uploader.transport.async_send.assert_not_called()
+    assert uploader.transport.backoff_remaining == 0
+
+    # Batches encoded by the transport itself (e.g. spool replays) are dropped the same way
+    assert await uploader.transport.async_post({"sensors": {}}) is True
+    assert uploader.transport.backoff_remaining == 0
+    assert uploader.transport.stats["failures"] == 0
+
+@pytest.mark.asyncio
+async def test_ampster_data_uploader_failed_forced_keyframe_keeps_changes():
+    """Changes buffered before a failed forced keyframe are still sent with the next delta."""
+    hass = DummyHass()
+    hass.states.get.return_value = MagicMock(state="42", attributes={})
+    uploader = AmpsterDataUploader(
+        hass=hass,
+        upload_url="https://example.com/api",
+        api_key="test-key",
+        upload_sensors="test_sensor",
+        upload_interval=15,
+        upload_mode="delta"
+    )
+    uploader._resolve_entities()
+    uploader._last_keyframe = time.monotonic()
+    uploader._changes = {"test_sensor": True}
+    uploader.transport.async_send = AsyncMock(return_value=False)
+
+    await uploader.async_upload_now()
+    assert uploader.transport.async_send.call_args[0][0]["type"] == "keyframe"
+    assert uploader._changes == {"test_sensor": True}
+
+    uploader.transport.async_send.return_value = True
+    await uploader._async_upload_data()
+    data = uploader.transport.async_send.call_args[0][0]
+    assert data["type"] == "delta"
+    assert "attributes" in data["sensors"]["test_sensor"]
+
+@pytest.mark.asyncio
+async def test_ampster_data_uploader_notifies_listeners_after_upload():
+    """Listeners (the Upload Now button) are called after every upload, not only on a press."""
+    hass = DummyHass()
+    hass.states.get.return_value = MagicMock(state="42", attributes={})
+    uploader = AmpsterDataUploader(
+        hass=hass,
+        upload_url="https://example.com/api",
+        api_key="test-key",
+        upload_sensors="test_sensor",
+        upload_interval=15
+    )
+    uploader.transport.async_send = AsyncMock(return_value=False)
+    updates = []
+    remove = uploader.async_add_listener(lambda: updates.append(dict(uploader.stats)))
+
+    await uploader._async_upload_data()
+    assert len(updates) == 1
+    remove()
+    await uploader._async_upload_data()
+    assert len(updates) == 1